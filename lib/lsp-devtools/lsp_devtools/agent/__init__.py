@@ -1,22 +1,32 @@
 import argparse
 import asyncio
+import pathlib
 import subprocess
 import sys
 from typing import List
 
 from .agent import Agent
+from .agent import CaptureQueue
+from .agent import MessageFramer
 from .agent import RPCMessage
 from .agent import logger
+from .agent import parse_rpc_headers
 from .agent import parse_rpc_message
+from .client import MB
 from .client import AgentClient
+from .client import MessageBuffer
 from .server import AgentServer
 
 __all__ = [
     "Agent",
     "AgentClient",
     "AgentServer",
+    "CaptureQueue",
+    "MessageBuffer",
+    "MessageFramer",
     "RPCMessage",
     "logger",
+    "parse_rpc_headers",
     "parse_rpc_message",
 ]
 
@@ -44,8 +54,22 @@ async def main(args, extra: List[str]):
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
     )
-    client = AgentClient()
-    agent = Agent(server, sys.stdin.buffer, sys.stdout.buffer, client.forward_message)
+    buffer = MessageBuffer(
+        max_size=args.buffer_size * MB,
+        spill_path=args.spill_file,
+        max_spill_size=args.spill_size * MB,
+    )
+    client = AgentClient(buffer=buffer)
+    agent = Agent(
+        server,
+        sys.stdin.buffer,
+        sys.stdout.buffer,
+        client.forward_message,
+        splice=args.splice,
+        queue_size=args.queue_size,
+        overflow_policy=args.overflow_policy,
+        drain_timeout=args.drain_timeout,
+    )
 
     await asyncio.gather(
         client.start_tcp(args.host, args.port),
@@ -108,4 +132,66 @@ majority of the lsp-devtools suite of tools.
         default=8765,
     )
 
+    capture = cmd.add_argument_group(
+        title="capture options",
+        description="control how messages are captured",
+    )
+    capture.add_argument(
+        "--splice",
+        action="store_true",
+        help=(
+            "forward messages between client and server immediately, capturing them "
+            "in the background so that the devtools never delay the LSP session"
+        ),
+    )
+    capture.add_argument(
+        "--queue-size",
+        type=int,
+        default=1024,
+        metavar="N",
+        help="the maximum number of captured messages waiting to be processed (--splice only)",
+    )
+    capture.add_argument(
+        "--overflow-policy",
+        default="drop-oldest",
+        choices=["drop-oldest", "drop-newest", "block"],
+        help="what to do with captured messages once the queue is full (--splice only)",
+    )
+    capture.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=2.0,
+        metavar="SECONDS",
+        help=(
+            "how long to wait for queued messages to be processed on exit, any left "
+            "after this are dropped (--splice only)"
+        ),
+    )
+
+    buffer = cmd.add_argument_group(
+        title="buffer options",
+        description="control how messages are buffered until a connection is made",
+    )
+    buffer.add_argument(
+        "--buffer-size",
+        type=int,
+        default=64,
+        metavar="MB",
+        help="the maximum size of messages to hold in memory",
+    )
+    buffer.add_argument(
+        "--spill-file",
+        type=pathlib.Path,
+        default=None,
+        metavar="FILE",
+        help="once the in-memory buffer is full, spill older messages to this file",
+    )
+    buffer.add_argument(
+        "--spill-size",
+        type=int,
+        default=1024,
+        metavar="MB",
+        help="the maximum size of the spill file",
+    )
+
     cmd.set_defaults(run=run_agent)
@@ -2,30 +2,39 @@ from __future__ import annotations
 
 import asyncio
 import inspect
-import json
 import logging
-import re
 import sys
 import typing
+from collections import deque
 from datetime import datetime
 from datetime import timezone
 from functools import partial
+from typing import Literal
 from uuid import uuid4
 
 import attrs
 
+from lsp_devtools import codec
+
 if typing.TYPE_CHECKING:
+    import threading
     from typing import Any
     from typing import BinaryIO
     from typing import Callable
     from typing import Coroutine
+    from typing import Deque
     from typing import Dict
+    from typing import List
     from typing import Optional
     from typing import Set
     from typing import Tuple
     from typing import Union
 
     MessageHandler = Callable[[bytes], Union[None, Coroutine[Any, Any, None]]]
+    CapturedMessage = Tuple[str, datetime, bytes]
+    CaptureHandler = Callable[..., Union[None, Coroutine[Any, Any, None]]]
+
+OverflowPolicy = Literal["drop-oldest", "drop-newest", "block"]
 
 UTC = timezone.utc
 logger = logging.getLogger("lsp_devtools.agent")
@@ -43,27 +52,15 @@ class RPCMessage:
         return self.headers[key]
 
 
-def parse_rpc_message(data: bytes) -> RPCMessage:
-    """Parse a JSON-RPC message from the given set of bytes."""
+HEADER_TERMINATOR = b"\r\n\r\n"
+
 
+def parse_headers(data: bytes) -> Dict[str, str]:
+    """Parse the given block of JSON-RPC headers."""
     headers: Dict[str, str] = {}
-    body: Optional[Dict[str, Any]] = None
-    headers_complete = False
 
     for line in data.split(b"\r\n"):
         if line == b"":
-            if "Content-Length" not in headers:
-                raise ValueError("Missing 'Content-Length' header")
-
-            headers_complete = True
-            continue
-
-        if headers_complete:
-            length = int(headers["Content-Length"])
-            if len(line) != length:
-                raise ValueError("Incorrect 'Content-Length'")
-
-            body = json.loads(line)
             continue
 
         if (idx := line.find(b":")) < 0:
@@ -72,49 +69,171 @@ def parse_rpc_message(data: bytes) -> RPCMessage:
         name, value = line[:idx], line[idx + 1 :]
         headers[name.decode("utf8").strip()] = value.decode("utf8").strip()
 
-    if body is None:
+    return headers
+
+
+def parse_content_length(headers: Dict[str, str]) -> int:
+    """Return the value of the ``Content-Length`` header.
+
+    Raises
+    ------
+    KeyError
+       If the header is missing
+
+    ValueError
+       If the header is not a non-negative integer
+    """
+    value = headers["Content-Length"]
+
+    # int() would also accept signs, underscores and surrounding whitespace.
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError(f"Invalid 'Content-Length': {value!r}")
+
+    return int(value)
+
+
+def parse_rpc_headers(data: bytes) -> Tuple[Dict[str, str], int]:
+    """Parse the headers of the JSON-RPC message in the given set of bytes.
+
+    Returns the headers along with the index at which the message body starts.
+    """
+
+    if (end := data.find(HEADER_TERMINATOR)) < 0:
         raise ValueError("Missing message body")
 
-    return RPCMessage(headers, body)
+    headers = parse_headers(data[:end])
+    if "Content-Length" not in headers:
+        raise ValueError("Missing 'Content-Length' header")
 
+    start = end + len(HEADER_TERMINATOR)
+    if len(data) - start != parse_content_length(headers):
+        raise ValueError("Incorrect 'Content-Length'")
 
-async def aio_readline(reader: asyncio.StreamReader, message_handler: MessageHandler):
-    CONTENT_LENGTH_PATTERN = re.compile(rb"^Content-Length: (\d+)\r\n$")
+    return headers, start
 
-    # Initialize message buffer
-    message = []
-    content_length = 0
 
-    while True:
-        # Read a header line
-        header = await reader.readline()
-        if not header:
-            break
-        message.append(header)
-
-        # Extract content length if possible
-        if not content_length:
-            match = CONTENT_LENGTH_PATTERN.fullmatch(header)
-            if match:
-                content_length = int(match.group(1))
-
-        # Check if all headers have been read (as indicated by an empty line \r\n)
-        if content_length and not header.strip():
-            # Read body
-            body = await reader.readexactly(content_length)
-            if not body:
+def parse_rpc_message(data: bytes) -> RPCMessage:
+    """Parse a JSON-RPC message from the given set of bytes."""
+    headers, start = parse_rpc_headers(data)
+    return RPCMessage(headers, codec.loads(data[start:]))
+
+
+class MessageFramer:
+    """Incrementally split a stream of bytes into individual JSON-RPC messages.
+
+    Incoming data is appended to a single buffer, the headers of each message are
+    parsed exactly once and complete messages are sliced directly out of the buffer.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+        self._start = 0
+        """Index of the start of the current message."""
+
+        self._scan = 0
+        """Index from which to resume the search for the end of the headers."""
+
+        self._body_end = -1
+        """Index of the end of the current message, if known."""
+
+    @property
+    def pending(self) -> int:
+        """The number of bytes required to complete the current message, if known."""
+        if self._body_end < 0:
+            return 0
+
+        return self._body_end - len(self._buffer)
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Feed the given data into the framer, returning any complete messages."""
+        buffer = self._buffer
+        buffer += data
+        messages: List[bytes] = []
+
+        while True:
+            if self._body_end < 0 and not self._parse_headers():
+                break
+
+            if len(buffer) < self._body_end:
                 break
-            message.append(body)
 
+            with memoryview(buffer) as view:
+                messages.append(bytes(view[self._start : self._body_end]))
+
+            self._start = self._scan = self._body_end
+            self._body_end = -1
+
+        self._compact()
+        return messages
+
+    def _parse_headers(self) -> bool:
+        """Attempt to parse the headers of the current message, returns ``True`` if
+        successful."""
+        buffer = self._buffer
+
+        while (end := buffer.find(HEADER_TERMINATOR, self._scan)) >= 0:
+            try:
+                headers = parse_headers(bytes(buffer[self._start : end]))
+                length = parse_content_length(headers)
+            except (KeyError, ValueError):
+                logger.debug(
+                    "Skipping invalid headers: %r", bytes(buffer[self._start : end])
+                )
+                self._start = self._scan = end + len(HEADER_TERMINATOR)
+                continue
+
+            self._body_end = end + len(HEADER_TERMINATOR) + length
+            return True
+
+        # The terminator may have been split across reads, so be sure to check the
+        # last few bytes again next time.
+        self._scan = max(self._start, len(buffer) - len(HEADER_TERMINATOR) + 1)
+        return False
+
+    def _compact(self):
+        """Discard any data belonging to messages that have already been returned."""
+        if self._start == 0:
+            return
+
+        if self._start == len(self._buffer):
+            self._buffer.clear()
+        else:
+            del self._buffer[: self._start]
+
+        self._scan -= self._start
+        if self._body_end >= 0:
+            self._body_end -= self._start
+
+        self._start = 0
+
+
+READ_SIZE = 2**16
+
+
+async def aio_readline(
+    reader: asyncio.StreamReader,
+    message_handler: MessageHandler,
+    stop_event: Optional[threading.Event] = None,
+):
+    """Read JSON-RPC messages from the given stream, passing each one to the given
+    message handler.
+
+    Reading stops at the end of the stream, or once the (optional) ``stop_event`` is
+    set.
+    """
+    framer = MessageFramer()
+
+    while stop_event is None or not stop_event.is_set():
+        if not (data := await reader.read(max(READ_SIZE, framer.pending))):
+            break
+
+        for message in framer.feed(data):
             # Pass message to protocol, optionally async
-            result = message_handler(b"".join(message))
+            result = message_handler(message)
             if inspect.isawaitable(result):
                 await result
 
-            # Reset the buffer
-            message = []
-            content_length = 0
-
 
 async def get_streams(
     stdin, stdout
@@ -133,6 +252,95 @@ async def get_streams(
     return reader, writer
 
 
+class CaptureQueue:
+    """A bounded queue of captured messages, waiting to be passed onto the message
+    handler in the background.
+
+    Each item in the queue is a tuple of arguments to pass to the handler.
+    """
+
+    def __init__(
+        self,
+        handler: CaptureHandler,
+        maxsize: int = 1024,
+        policy: OverflowPolicy = "drop-oldest",
+    ):
+        if maxsize < 1:
+            raise ValueError(f"Invalid queue size: {maxsize}")
+
+        self.handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+
+        self.captured = 0
+        """The number of messages passed to the queue."""
+
+        self.dropped = 0
+        """The number of messages dropped due to the queue being full."""
+
+        self._items: Deque[CapturedMessage] = deque()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def put(self, message: CapturedMessage):
+        """Add a message to the queue, applying the overflow policy if necessary."""
+        self.captured += 1
+
+        while len(self._items) >= self.maxsize:
+            if self.policy == "drop-newest":
+                self.dropped += 1
+                return
+
+            if self.policy == "drop-oldest":
+                self._items.popleft()
+                self.dropped += 1
+                continue
+
+            self._space.clear()
+            await self._space.wait()
+
+        self._items.append(message)
+        self._idle.clear()
+        self._ready.set()
+
+    async def run(self):
+        """Pass each queued message onto the handler, in the order they were
+        captured."""
+
+        while True:
+            await self._ready.wait()
+
+            while self._items:
+                message = self._items.popleft()
+                self._space.set()
+
+                try:
+                    result = self.handler(*message)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception:
+                    logger.debug("Error handling captured message", exc_info=True)
+
+            self._ready.clear()
+            self._idle.set()
+
+    async def drain(self, timeout: float):
+        """Wait up to ``timeout`` seconds for the queue to be emptied, any messages
+        still left in the queue are counted as dropped."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        self.dropped += len(self._items)
+        self._items.clear()
+
+
 class Agent:
     """The Agent sits between a language server and its client, listening to messages
     enabling them to be recorded."""
@@ -143,6 +351,11 @@ class Agent:
         stdin: BinaryIO,
         stdout: BinaryIO,
         handler: MessageHandler,
+        *,
+        splice: bool = False,
+        queue_size: int = 1024,
+        overflow_policy: OverflowPolicy = "drop-oldest",
+        drain_timeout: float = 2.0,
     ):
         self.stdin = stdin
         self.stdout = stdout
@@ -150,6 +363,19 @@ class Agent:
         self.handler = handler
         self.session_id = str(uuid4())
 
+        self.queue: Optional[CaptureQueue] = None
+        """When set, messages are spliced straight through to their destination,
+        with captured messages handed to the queue to be processed in the background.
+        """
+
+        self.drain_timeout = drain_timeout
+        """How long to wait for queued messages to be processed when stopping."""
+
+        if splice:
+            self.queue = CaptureQueue(
+                self.capture_message, maxsize=queue_size, policy=overflow_policy
+            )
+
         self._tasks: Set[asyncio.Task] = set()
         self.reader: Optional[asyncio.StreamReader] = None
         self.writer: Optional[asyncio.StreamWriter] = None
@@ -180,6 +406,9 @@ class Agent:
         )
         self._tasks.add(server_to_client)
 
+        if self.queue is not None:
+            self._tasks.add(asyncio.create_task(self.queue.run()))
+
         # Run both connections concurrently.
         await asyncio.gather(
             client_to_server,
@@ -196,20 +425,34 @@ class Agent:
         dest.write(message)
         await dest.drain()
 
+        now = datetime.now(tz=UTC)
+        if self.queue is not None:
+            await self.queue.put((source, now, message))
+            return
+
+        if inspect.iscoroutine(res := self.capture_message(source, now, message)):
+            task = asyncio.create_task(res)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def capture_message(self, source: str, timestamp: datetime, message: bytes):
+        """Pass the given message onto the devtool."""
+
+        # The size of the message's own headers, as sent over the wire. Together with
+        # the message's `Content-Length`, this gives the message's total size.
+        header_size = message.find(HEADER_TERMINATOR) + len(HEADER_TERMINATOR)
+
         # Include some additional metadata before passing it onto the devtool.
         # TODO: How do we make sure we choose the same encoding as `message`?
-        now = datetime.now(tz=UTC).isoformat()
         fields = [
             f"Message-Source: {source}\r\n".encode(),
             f"Message-Session: {self.session_id}\r\n".encode(),
-            f"Message-Timestamp: {now}\r\n".encode(),
+            f"Message-Timestamp: {timestamp.isoformat()}\r\n".encode(),
+            f"Message-Header-Size: {header_size}\r\n".encode(),
             message,
         ]
 
-        if inspect.iscoroutine(res := self.handler(b"".join(fields))):
-            task = asyncio.create_task(res)
-            self._tasks.add(task)
-            task.add_done_callback(self._tasks.discard)
+        return self.handler(b"".join(fields))
 
     async def _watch_server_process(self):
         """Once the server process exits, ensure that the agent is also shutdown."""
@@ -226,6 +469,17 @@ class Agent:
             except TimeoutError:
                 self.server.kill()
 
+        # Give the devtools a chance to receive any messages still in the queue.
+        if self.queue is not None:
+            await self.queue.drain(timeout=self.drain_timeout)
+
+            if self.queue.dropped > 0:
+                print(
+                    f"Dropped {self.queue.dropped}/{self.queue.captured} "
+                    "captured messages",
+                    file=sys.stderr,
+                )
+
         args = {}
         if sys.version_info >= (3, 9):
             args["msg"] = "lsp-devtools agent is stopping."
@@ -2,19 +2,26 @@ from __future__ import annotations
 
 import asyncio
 import typing
+from collections import deque
 
 import stamina
 from pygls.client import JsonRPCClient
-from pygls.client import aio_readline
 from pygls.protocol import default_converter
 
+from lsp_devtools.agent.agent import READ_SIZE
+from lsp_devtools.agent.agent import MessageFramer
+from lsp_devtools.agent.agent import aio_readline
 from lsp_devtools.agent.protocol import AgentProtocol
 
 if typing.TYPE_CHECKING:
+    import pathlib
     from typing import Any
-    from typing import List
+    from typing import BinaryIO
+    from typing import Deque
     from typing import Optional
 
+MB = 1024 * 1024
+
 # from websockets.client import WebSocketClientProtocol
 
 
@@ -35,17 +42,130 @@ if typing.TYPE_CHECKING:
 #         asyncio.ensure_future(self._ws.send(data))
 
 
+class MessageBuffer:
+    """A bounded buffer, used to hold messages until they can be sent.
+
+    Messages are held in memory up to ``max_size`` bytes, once full the oldest
+    messages are moved to the (optional) spill file. Messages are dropped once both
+    are full.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 64 * MB,
+        spill_path: Optional[pathlib.Path] = None,
+        max_spill_size: int = 1024 * MB,
+    ):
+        self.max_size = max_size
+        self.spill_path = spill_path
+        self.max_spill_size = max_spill_size
+
+        self.dropped = 0
+        """The number of messages dropped due to the buffer being full."""
+
+        self._messages: Deque[bytes] = deque()
+        self._size = 0
+
+        self._spill: Optional[BinaryIO] = None
+        self._spill_reader: Optional[BinaryIO] = None
+        self._spill_framer = MessageFramer()
+        self._spill_size = 0
+        self._spilled = 0
+        self._unspilled: Deque[bytes] = deque()
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._messages)
+
+    def append(self, message: bytes):
+        """Add a message to the buffer."""
+        self._messages.append(message)
+        self._size += len(message)
+
+        while self._size > self.max_size and len(self._messages) > 0:
+            oldest = self._messages.popleft()
+            self._size -= len(oldest)
+
+            if not self._spill_message(oldest):
+                self.dropped += 1
+
+    def popleft(self) -> Optional[bytes]:
+        """Remove and return the oldest message in the buffer, if any."""
+
+        if self._spilled > 0:
+            return self._unspill_message()
+
+        if len(self._messages) == 0:
+            return None
+
+        message = self._messages.popleft()
+        self._size -= len(message)
+        return message
+
+    def close(self):
+        """Close the spill file, if open."""
+        for file in [self._spill_reader, self._spill]:
+            if file is not None:
+                file.close()
+
+        self._spill = self._spill_reader = None
+
+    def _spill_message(self, message: bytes) -> bool:
+        """Append the given message to the spill file, returns ``True`` if
+        successful."""
+        if self.spill_path is None:
+            return False
+
+        if self._spill_size + len(message) > self.max_spill_size:
+            return False
+
+        if self._spill is None:
+            self._spill = open(self.spill_path, "wb")
+
+        self._spill.write(message)
+        self._spill_size += len(message)
+        self._spilled += 1
+        return True
+
+    def _unspill_message(self) -> bytes:
+        """Return the oldest message from the spill file."""
+        if self._spill is None:
+            raise RuntimeError("Spill file is not open")
+
+        if self._spill_reader is None:
+            self._spill_reader = open(self._spill.name, "rb")
+
+        while len(self._unspilled) == 0:
+            self._spill.flush()
+            if not (data := self._spill_reader.read(READ_SIZE)):
+                raise RuntimeError("Unexpected end of spill file")
+
+            self._unspilled.extend(self._spill_framer.feed(data))
+
+        message = self._unspilled.popleft()
+        self._spilled -= 1
+
+        # Once the spill file has been fully replayed, truncate it ready for reuse.
+        if self._spilled == 0:
+            self._spill_reader.close()
+            self._spill_reader = None
+            self._spill.seek(0)
+            self._spill.truncate()
+            self._spill_size = 0
+
+        return message
+
+
 class AgentClient(JsonRPCClient):
     """Client for connecting to an AgentServer instance."""
 
     protocol: AgentProtocol
 
-    def __init__(self):
+    def __init__(self, buffer: Optional[MessageBuffer] = None):
         super().__init__(
             protocol_cls=AgentProtocol, converter_factory=default_converter
         )
         self.connected = False
-        self._buffer: List[bytes] = []
+        self._buffer = buffer if buffer is not None else MessageBuffer()
 
     def _report_server_error(self, error, source):
         # Bail on error
@@ -73,11 +193,19 @@ class AgentClient(JsonRPCClient):
 
         self.protocol.connection_made(writer)  # type: ignore[arg-type]
         connection = asyncio.create_task(
-            aio_readline(self._stop_event, reader, self.protocol.data_received)
+            aio_readline(reader, self.protocol.data_received, self._stop_event)
         )
-        self.connected = True
         self._async_tasks.append(connection)
 
+        # Send any buffered messages, any messages that arrive in the meantime are
+        # added to the end of the buffer.
+        while (message := self._buffer.popleft()) is not None:
+            writer.write(message)
+            await writer.drain()
+
+        self._buffer.close()
+        self.connected = True
+
     def forward_message(self, message: bytes):
         """Forward the given message to the server instance."""
 
@@ -88,10 +216,6 @@ class AgentClient(JsonRPCClient):
         if self.protocol.transport is None:
             return
 
-        # Send any buffered messages
-        while len(self._buffer) > 0:
-            self.protocol.transport.write(self._buffer.pop(0))
-
         self.protocol.transport.write(message)
 
     # TODO: Upstream this... or at least something equivalent.
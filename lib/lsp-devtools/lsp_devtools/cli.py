@@ -1,10 +1,12 @@
 import argparse
 import importlib
 import logging
+import os
 import sys
 import traceback
 
 from lsp_devtools import __version__
+from lsp_devtools import codec
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +16,8 @@ BUILTIN_COMMANDS = [
     "lsp_devtools.client",
     "lsp_devtools.inspector",
     "lsp_devtools.record",
+    "lsp_devtools.replay",
+    "lsp_devtools.stats",
 ]
 
 
@@ -40,6 +44,16 @@ def main():
         prog="lsp-devtools", description="Developer tooling for language servers"
     )
     cli.add_argument("--version", action="version", version=f"%(prog)s v{__version__}")
+    cli.add_argument(
+        "--json-backend",
+        choices=["auto", *codec.BACKENDS],
+        default=os.environ.get(codec.BACKEND_ENV, "auto"),
+        help=(
+            "the library used to encode and decode JSON messages, "
+            f"can also be set with the {codec.BACKEND_ENV} environment variable. "
+            "(default: %(default)s)"
+        ),
+    )
     commands = cli.add_subparsers(title="commands")
 
     for mod in BUILTIN_COMMANDS:
@@ -53,6 +67,11 @@ def main():
 
     parsed_args = cli.parse_args(args)
 
+    try:
+        codec.set_backend(parsed_args.json_backend)
+    except ValueError as exc:
+        cli.error(str(exc))
+
     if hasattr(parsed_args, "run"):
         return parsed_args.run(parsed_args, extra)
 
@@ -13,7 +13,6 @@ from textual import events
 from textual import on
 from textual.app import App
 from textual.app import ComposeResult
-from textual.containers import ScrollableContainer
 from textual.containers import Vertical
 from textual.widgets import DirectoryTree
 from textual.widgets import Footer
@@ -22,6 +21,8 @@ from textual.widgets import Header
 from lsp_devtools.agent import logger
 from lsp_devtools.database import Database
 from lsp_devtools.database import DatabaseLogHandler
+from lsp_devtools.handlers.sql import STORAGE_MODES
+from lsp_devtools.inspector import FilterBar
 from lsp_devtools.inspector import MessagesTable
 from lsp_devtools.inspector import MessageViewer
 
@@ -54,13 +55,22 @@ class LSPClient(App):
     ]
 
     def __init__(
-        self, db: Database, server_command: List[str], session: str, *args, **kwargs
+        self,
+        db: Database,
+        server_command: List[str],
+        session: str,
+        *args,
+        refresh_rate: float = 10.0,
+        **kwargs,
     ):
         super().__init__(*args, **kwargs)
 
         self.db = db
         db.app = self
 
+        self.refresh_rate = refresh_rate
+        """The maximum number of times per second to refresh the messages table."""
+
         self.session = session
         self.server_command = server_command
         self.lsp_client = LanguageClient()
@@ -70,13 +80,16 @@ class LSPClient(App):
     def compose(self) -> ComposeResult:
         message_viewer = MessageViewer("")
         messages_table = MessagesTable(
-            self.db, message_viewer, session=self.lsp_client.session_id
+            self.db,
+            message_viewer,
+            session=self.lsp_client.session_id,
+            refresh_rate=self.refresh_rate,
         )
 
         yield Header()
         yield Explorer(".")
         yield EditorView(self.lsp_client)
-        devtools = Devtools(ScrollableContainer(messages_table), message_viewer)
+        devtools = Devtools(FilterBar(), messages_table, message_viewer)
         devtools.add_class("-hidden")
         yield devtools
         yield Footer()
@@ -129,9 +142,14 @@ class LSPClient(App):
         self.lsp_client.initialized(types.InitializedParams())
 
     @on(Database.Update)
-    async def update_table(self, event: Database.Update):
+    def update_table(self, event: Database.Update):
+        table = self.query_one(MessagesTable)
+        table.request_update(event.max_row)
+
+    @on(FilterBar.Search)
+    def search_table(self, event: FilterBar.Search):
         table = self.query_one(MessagesTable)
-        await table.update()
+        table.set_search(event.search)
 
     async def action_quit(self):
         await self.lsp_client.shutdown_async(None)
@@ -144,7 +162,7 @@ def client(args, extra: List[str]):
     if len(extra) == 0:
         raise ValueError("Missing server command.")
 
-    db = Database(args.dbpath)
+    db = Database(args.dbpath, storage=args.storage)
 
     session = str(uuid4())
     dbhandler = DatabaseLogHandler(db)
@@ -153,7 +171,9 @@ def client(args, extra: List[str]):
     logger.setLevel(logging.INFO)
     logger.addHandler(dbhandler)
 
-    app = LSPClient(db, session=session, server_command=extra)
+    app = LSPClient(
+        db, session=session, server_command=extra, refresh_rate=args.refresh_rate
+    )
     app.run()
 
     asyncio.run(db.close())
@@ -179,5 +199,19 @@ Open a simple text editor to drive a given language server.
         default=default_db,
         help="the database path to use",
     )
+    cmd.add_argument(
+        "--storage",
+        choices=STORAGE_MODES,
+        default="columns",
+        help="how to store new messages in the database. (default: %(default)s)",
+    )
+    cmd.add_argument(
+        "--refresh-rate",
+        type=float,
+        metavar="FPS",
+        default=10.0,
+        help="the maximum number of times per second to refresh the messages table. "
+        "(default: %(default)s)",
+    )
 
     cmd.set_defaults(run=client)
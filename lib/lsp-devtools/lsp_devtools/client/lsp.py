@@ -1,5 +1,4 @@
 import importlib.metadata
-import json
 from datetime import datetime
 from datetime import timezone
 from typing import Optional
@@ -10,11 +9,28 @@ from pygls.lsp.client import BaseLanguageClient
 from pygls.protocol import LanguageServerProtocol
 
 from lsp_devtools.agent import logger
+from lsp_devtools.agent import parse_rpc_headers
 
 UTC = timezone.utc
 VERSION = importlib.metadata.version("lsp-devtools")
 
 
+class RecordingTransport:
+    """Wraps the transport used to send messages to the server, so that each message
+    can be recorded exactly as it was sent."""
+
+    def __init__(self, transport, protocol: "RecordingLSProtocol"):
+        self._transport = transport
+        self._protocol = protocol
+
+    def write(self, data: bytes):
+        self._protocol.record_message("client", data)
+        self._transport.write(data)
+
+    def __getattr__(self, name: str):
+        return getattr(self._transport, name)
+
+
 class RecordingLSProtocol(LanguageServerProtocol):
     """A version of the LanguageServerProtocol that also records all the traffic."""
 
@@ -22,29 +38,33 @@ class RecordingLSProtocol(LanguageServerProtocol):
         super().__init__(server, converter)
         self.session_id = ""
 
-    def _procedure_handler(self, message):
-        logger.info(
-            "%s",
-            json.dumps(message, default=self._serialize_message),
-            extra={
-                "Message-Source": "server",
-                "Message-Session": self.session_id,
-                "Message-Timestamp": datetime.now(tz=UTC).isoformat(),
-            },
-        )
-        return super()._procedure_handler(message)
+    def connection_made(self, transport):
+        super().connection_made(RecordingTransport(transport, self))  # type: ignore[arg-type]
+
+    def data_received(self, data: bytes):
+        # The client passes each message to the protocol in full, headers included.
+        self.record_message("server", data)
+        super().data_received(data)
+
+    def record_message(self, source: str, data: bytes):
+        """Record the given message, as it was sent over the wire."""
+        try:
+            _, start = parse_rpc_headers(data)
+            header_size: Optional[int] = start
+        except ValueError:
+            # Not a single, complete message; record it as-is.
+            start, header_size = 0, None
 
-    def _send_data(self, data):
         logger.info(
             "%s",
-            json.dumps(data, default=self._serialize_message),
+            data[start:].decode("utf8"),
             extra={
-                "Message-Source": "client",
+                "Message-Source": source,
                 "Message-Session": self.session_id,
                 "Message-Timestamp": datetime.now(tz=UTC).isoformat(),
+                "Message-Header-Size": header_size,
             },
         )
-        return super()._send_data(data)
 
 
 class LanguageClient(BaseLanguageClient):
@@ -0,0 +1,303 @@
+"""JSON encoding and decoding.
+
+All of the places lsp-devtools encodes or decodes JSON go through this module, so that
+a faster implementation (``orjson`` or ``msgspec``) can be used when available.
+The backend can be chosen with the ``--json-backend`` command line option, or the
+``LSP_DEVTOOLS_JSON_BACKEND`` environment variable.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import typing
+
+import attrs
+
+if typing.TYPE_CHECKING:
+    from typing import Any
+    from typing import Callable
+    from typing import Dict
+    from typing import Optional
+    from typing import Set
+    from typing import Union
+
+    Default = Optional[Callable[[Any], Any]]
+    Indent = Union[str, int, None]
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ENV = "LSP_DEVTOOLS_JSON_BACKEND"
+"""The environment variable used to select the JSON backend."""
+
+
+@attrs.define(frozen=True)
+class JsonBackend:
+    """An implementation of JSON encoding and decoding."""
+
+    name: str
+    """The name of the backend."""
+
+    loads: Callable[[Union[str, bytes]], Any]
+    """Decode the given JSON document, raising a ``ValueError`` if it is invalid."""
+
+    dumps: Callable[..., str]
+    """Encode the given object, accepts ``default`` and ``indent`` arguments with the
+    same meaning as :func:`json.dumps`."""
+
+
+def _stdlib_backend() -> JsonBackend:
+    def dumps(obj: Any, *, default: Default = None, indent: Indent = None) -> str:
+        return json.dumps(obj, default=default, indent=indent)
+
+    return JsonBackend(name="json", loads=json.loads, dumps=dumps)
+
+
+def _orjson_backend() -> JsonBackend:
+    import orjson
+
+    def dumps(obj: Any, *, default: Default = None, indent: Indent = None) -> str:
+        # orjson only supports indenting by 2 spaces.
+        if indent not in {None, 2}:
+            return json.dumps(obj, default=default, indent=indent)
+
+        option = orjson.OPT_NON_STR_KEYS
+        if indent is not None:
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(obj, default=default, option=option).decode("utf8")
+
+    return JsonBackend(name="orjson", loads=orjson.loads, dumps=dumps)
+
+
+def _msgspec_backend() -> JsonBackend:
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+
+    def loads(data: Union[str, bytes]) -> Any:
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as exc:
+            raise ValueError(str(exc)) from exc
+
+    def dumps(obj: Any, *, default: Default = None, indent: Indent = None) -> str:
+        if isinstance(indent, str):
+            return json.dumps(obj, default=default, indent=indent)
+
+        if default is None:
+            data = encoder.encode(obj)
+        else:
+            data = msgspec.json.encode(obj, enc_hook=default)
+
+        if indent is not None:
+            data = msgspec.json.format(data, indent=indent)
+
+        return data.decode("utf8")
+
+    return JsonBackend(name="msgspec", loads=loads, dumps=dumps)
+
+
+BACKENDS: Dict[str, Callable[[], JsonBackend]] = {
+    "orjson": _orjson_backend,
+    "msgspec": _msgspec_backend,
+    "json": _stdlib_backend,
+}
+"""The available backends, in order of preference."""
+
+
+def load_backend(name: str = "auto") -> JsonBackend:
+    """Load the JSON backend with the given name.
+
+    Parameters
+    ----------
+    name
+       The name of the backend to load. If ``auto``, the first backend in
+       :data:`BACKENDS` that is installed is used.
+
+    Raises
+    ------
+    ValueError
+       If the requested backend is unknown or not installed.
+    """
+    if name == "auto":
+        for factory in BACKENDS.values():
+            try:
+                return factory()
+            except ImportError:
+                continue
+
+    if (load := BACKENDS.get(name)) is None:
+        raise ValueError(f"Unknown JSON backend: {name!r}")
+
+    try:
+        return load()
+    except ImportError as exc:
+        raise ValueError(f"JSON backend {name!r} is not installed") from exc
+
+
+def _default_backend() -> JsonBackend:
+    name = os.environ.get(BACKEND_ENV, "auto")
+
+    try:
+        return load_backend(name)
+    except ValueError as exc:
+        logger.warning("%s, falling back to 'auto'", exc)
+        return load_backend()
+
+
+_backend = _default_backend()
+
+
+def get_backend() -> JsonBackend:
+    """Return the JSON backend currently in use."""
+    return _backend
+
+
+def set_backend(name: str):
+    """Set the JSON backend to use, see :func:`load_backend`."""
+    global _backend  # noqa: PLW0603
+    _backend = load_backend(name)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Decode the given JSON document using the current backend."""
+    return _backend.loads(data)
+
+
+def dumps(obj: Any, *, default: Default = None, indent: Indent = None) -> str:
+    """Encode the given object as JSON using the current backend."""
+    return _backend.dumps(obj, default=default, indent=indent)
+
+
+@attrs.define
+class MessagePeek:
+    """The fields of a message that could be extracted without fully decoding it."""
+
+    fields: Dict[str, Any] = attrs.field(factory=dict)
+    """The values of any top-level scalar fields."""
+
+    keys: Set[str] = attrs.field(factory=set)
+    """The names of all the top-level fields seen."""
+
+    complete: bool = attrs.field(default=False)
+    """If ``True``, all the top-level fields in the message have been seen."""
+
+    has_id: Optional[bool] = attrs.field(default=None)
+    """If known, whether the message has an ``id`` field."""
+
+    @property
+    def message_type(self) -> Optional[str]:
+        """The type of the message, if it can be determined."""
+        keys = self.keys
+
+        if "error" in keys:
+            return "error" if "id" in self.fields else None
+
+        if "result" in keys:
+            return "result" if "id" in self.fields else None
+
+        if "method" not in self.fields:
+            return None
+
+        if "id" in self.fields:
+            return "request"
+
+        if self.complete or self.has_id is False:
+            return "notification"
+
+        return None
+
+
+OBJECT_START = re.compile(rb"\s*{")
+MEMBER = re.compile(
+    rb"""\s*"(?P<key>[^"\\]*)"\s*:\s*(?:"""
+    rb"""(?P<string>"(?:[^"\\]|\\.)*")"""
+    rb"""|(?P<scalar>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null)"""
+    rb"""|(?P<compound>[\[{]))"""
+)
+MEMBER_END = re.compile(rb"\s*([,}])")
+
+# An unterminated string runs to the end of the search window, so that truncating the
+# window cannot cause the contents of a string to be mistaken for brackets.
+NESTED_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"?|[\[\]{}]')
+
+SKIP_LIMIT = 4096
+"""The largest object or array (in bytes) :func:`peek_message` will skip over."""
+
+
+def skip_compound(data: bytes, start: int, limit: int = SKIP_LIMIT) -> Optional[int]:
+    """Return the index just after the object or array starting at index ``start``
+    of ``data``, or ``None`` if it does not end within ``limit`` bytes."""
+    depth = 0
+
+    # Only brackets need to be tracked, strings are matched to skip over any brackets
+    # they contain.
+    for match in NESTED_TOKEN.finditer(data, start, start + limit):
+        token = match.group()
+        if token in {b"[", b"{"}:
+            depth += 1
+        elif token in {b"]", b"}"}:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+
+    return None
+
+
+def peek_message(data: bytes, start: int = 0) -> MessagePeek:
+    """Extract the top-level fields of the JSON object starting at index ``start``
+    of ``data``.
+
+    Only the values of scalar fields are extracted. Scanning stops as soon as the
+    type of the message is known, so the (potentially large) ``params``, ``result``
+    or ``error`` values are never looked at. Any other objects or arrays that come
+    first are skipped over, unless they are larger than :data:`SKIP_LIMIT`.
+    """
+    peek = MessagePeek()
+    fields = peek.fields
+
+    if (match := OBJECT_START.match(data, start)) is None:
+        return peek
+
+    pos = match.end()
+    while (match := MEMBER.match(data, pos)) is not None:
+        key = match.group("key").decode("utf8")
+        peek.keys.add(key)
+
+        if match.group("compound") is None:
+            value = match.group("string") or match.group("scalar")
+            fields[key] = loads(value)
+            pos = match.end()
+
+        elif "id" in fields and key in {"result", "error"}:
+            return peek
+
+        elif "method" in fields and data.find(b'"id"', pos) == -1:
+            # There is nothing else we need to find.
+            peek.has_id = False
+            return peek
+
+        elif (end := skip_compound(data, match.start("compound"))) is not None:
+            pos = end
+
+        else:
+            return peek
+
+        if "id" in fields and ("method" in fields or peek.keys & {"result", "error"}):
+            return peek
+
+        if (match := MEMBER_END.match(data, pos)) is None:
+            return peek
+
+        if match.group(1) == b"}":
+            peek.complete = True
+            peek.has_id = "id" in fields
+            return peek
+
+        pos = match.end()
+
+    return peek
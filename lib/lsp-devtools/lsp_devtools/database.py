@@ -1,43 +1,88 @@
 import asyncio
-import json
 import logging
 import pathlib
-import sys
+import typing
+from collections import Counter
 from contextlib import asynccontextmanager
 from typing import Any
 from typing import Dict
 from typing import List
 from typing import Optional
-from typing import Set
+from typing import Tuple
 
 import aiosqlite
 from textual.app import App
 from textual.message import Message
 
-from lsp_devtools.handlers import LspMessage
-
-if sys.version_info < (3, 9):
-    import importlib_resources as resources
-else:
-    from importlib import resources  # type: ignore[no-redef]
+from lsp_devtools import codec
+from lsp_devtools.handlers import LazyLspMessage
+from lsp_devtools.handlers import message_sizes
+from lsp_devtools.handlers.sql import INSERT_MESSAGE
+from lsp_devtools.handlers.sql import RequestPairer
+from lsp_devtools.handlers.sql import StorageMode
+from lsp_devtools.handlers.sql import as_datetime
+from lsp_devtools.handlers.sql import get_migration_statements
+from lsp_devtools.handlers.sql import get_schema
+from lsp_devtools.handlers.sql import message_row
+from lsp_devtools.handlers.sql import raw_message_row
+from lsp_devtools.search import INDEX_BATCH_SIZE
+from lsp_devtools.search import INDEX_MESSAGES
+from lsp_devtools.search import SEARCH_INDEX_RANGE
+from lsp_devtools.search import UPDATE_INDEXED_ROWID
+from lsp_devtools.search import MessageQuery
+from lsp_devtools.stats import LatencyStats
+
+logger = logging.getLogger(__name__)
 
 
 class Database:
-    """Controls access to the backing sqlite database."""
+    """Controls access to the backing sqlite database.
+
+    New messages are queued and written to the database in batches, with a single
+    transaction per batch.
+    """
 
     class Update(Message):
         """Sent when there are updates to the database"""
 
-    def __init__(self, dbpath: Optional[pathlib.Path] = None):
+        def __init__(self, max_row: int = 0):
+            super().__init__()
+
+            self.max_row = max_row
+            """The largest row id in the database at the time of the update."""
+
+    def __init__(
+        self, dbpath: Optional[pathlib.Path] = None, storage: StorageMode = "columns"
+    ):
         self.dbpath = dbpath or ":memory:"
+        self.storage = storage
+        """How new messages are stored, see
+        :data:`~lsp_devtools.handlers.sql.StorageMode`."""
+
         self.db: Optional[aiosqlite.Connection] = None
         self.app: Optional[App] = None
         self._handlers: Dict[str, set] = {}
 
+        self._pairer = RequestPairer()
+
+        self.stats = LatencyStats()
+        """Latency statistics for the requests written to the database by this
+        instance."""
+        self._pending: List[Tuple[Any, ...]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+
     async def close(self):
+        await self.flush()
+
         if self.db:
             await self.db.close()
 
+    async def flush(self):
+        """Wait for any queued messages to be written to the database."""
+        while self._writer is not None:
+            await self._writer
+
     @asynccontextmanager
     async def cursor(self):
         """Get a connection to the database."""
@@ -49,50 +94,152 @@ class Database:
             ):
                 self.dbpath.parent.mkdir(parents=True)
 
-            resource = resources.files("lsp_devtools.handlers").joinpath("dbinit.sql")
-            schema = resource.read_text(encoding="utf8")
-
             self.db = await aiosqlite.connect(self.dbpath)
-            await self.db.executescript(schema)
-            await self.db.commit()
+            await self.db.executescript(get_schema())
+            await self.db.execute("BEGIN IMMEDIATE")
+
+            try:
+                async with self.db.execute(
+                    "SELECT version FROM schema_version"
+                ) as cursor:
+                    (version,) = await cursor.fetchone()  # type: ignore[misc]
+
+                for statement in get_migration_statements(version):
+                    await self.db.execute(statement)
+
+                await self.db.commit()
+            except BaseException:
+                await self.db.rollback()
+                raise
 
         cursor = await self.db.cursor()
         yield cursor
 
         await self.db.commit()
 
+    @asynccontextmanager
+    async def _transaction(self):
+        """Get a connection to the database, holding its write lock.
+
+        Since tasks share the same connection, they take turns to write to it. The
+        transaction is rolled back if an error is raised.
+        """
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+
+        async with self._write_lock:
+            try:
+                async with self.cursor() as cursor:
+                    await cursor.execute("BEGIN IMMEDIATE")
+                    yield cursor
+            except BaseException:
+                if self.db is not None:
+                    await self.db.rollback()
+
+                raise
+
     async def add_message(self, session: str, timestamp: str, source: str, rpc: dict):
         """Add a new rpc message to the database."""
+        self.queue_message(session, timestamp, source, rpc)
 
-        msg_id = rpc.get("id")
-        method = rpc.get("method")
-        params = rpc.get("params")
-        result = rpc.get("result")
-        error = rpc.get("error")
+    def queue_message(
+        self,
+        session: str,
+        timestamp: str,
+        source: str,
+        rpc: dict,
+        size: Optional[int] = None,
+        header_size: Optional[int] = None,
+    ):
+        """Queue a new rpc message to be written to the database.
 
-        async with self.cursor() as cursor:
-            await cursor.execute(
-                "INSERT INTO protocol VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    session,
-                    timestamp,
-                    source,
-                    msg_id,
-                    method,
-                    json.dumps(params) if params else None,
-                    json.dumps(result) if result else None,
-                    json.dumps(error) if error else None,
-                ),
+        Must be called from within a running event loop.
+        """
+
+        self._queue_row(message_row(session, timestamp, source, rpc, size, header_size))
+
+    def queue_raw_message(
+        self,
+        session: str,
+        timestamp: str,
+        source: str,
+        body: bytes,
+        header_size: Optional[int] = None,
+    ):
+        """Queue a new rpc message to be written to the database, given the message
+        body as it was received.
+
+        If the database is not storing message bodies, the body is decoded and the
+        message queued with :meth:`queue_message`. Must be called from within a
+        running event loop.
+        """
+        if self.storage == "columns":
+            self.queue_message(
+                session, timestamp, source, codec.loads(body), len(body), header_size
             )
+            return
+
+        self._queue_row(
+            raw_message_row(session, timestamp, source, body, self.storage, header_size)
+        )
 
-        if self.app is not None:
-            self.app.post_message(Database.Update())
+    def _queue_row(self, row: Tuple[Any, ...]):
+        self._pending.append(row)
+
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_messages())
+
+    async def _write_messages(self):
+        """Write queued messages to the database, until the queue is empty."""
+
+        try:
+            while len(self._pending) > 0:
+                rows, self._pending = self._pending, []
+
+                try:
+                    # Forget the requests in this batch if it cannot be written.
+                    with self._pairer.pending.transaction():
+                        # Take the write lock before choosing row ids, in case
+                        # another process is writing to the same database.
+                        async with self._transaction() as cursor:
+                            await cursor.execute(
+                                "SELECT COALESCE(MAX(rowid), 0) FROM protocol"
+                            )
+                            (max_row,) = await cursor.fetchone()
+
+                            rows = self._pairer.pair(max_row + 1, rows)
+                            await cursor.executemany(INSERT_MESSAGE, rows)
+                            max_row += len(rows)
+                except Exception:
+                    logger.error("Unable to write messages to database", exc_info=True)
+                    continue
+
+                self._update_stats(rows)
+
+                if self.app is not None:
+                    self.app.post_message(Database.Update(max_row))
+        finally:
+            self._writer = None
+
+    def _update_stats(self, rows: List[Tuple[Any, ...]]):
+        """Update the latency statistics with any responses in the given rows, see
+        :meth:`RequestPairer.pair` for the row layout."""
+        for row in rows:
+            if (duration := row[-1]) is not None:
+                timestamp = as_datetime(row[2]).timestamp()
+                self.stats.add(row[5], timestamp, duration)
+
+    def in_flight(self) -> typing.Counter[str]:
+        """Return the number of requests waiting for a response, by method."""
+        return Counter(method for _, method, _ in self._pairer.pending.values())
 
     async def get_messages(
         self,
         *,
         session: str = "",
         max_row: Optional[int] = None,
+        until_row: Optional[int] = None,
+        query: Optional[MessageQuery] = None,
     ):
         """Get messages from the database
 
@@ -101,11 +248,94 @@ class Database:
         session
            If set, only return messages with the given session id
 
+        query
+           If set, only return messages matching the given search
+
         max_row
            If set, only return messages with a row id greater than ``max_row``
+
+        until_row
+           If set, only return messages with a row id less than or equal to
+           ``until_row``
         """
 
-        base_query = "SELECT rowid, * FROM protocol"
+        if query is not None and query.text:
+            await self.update_search_index()
+
+        sql, parameters = self._build_query(
+            "rowid, session, timestamp, source, id, method, params, result, error, "
+            "body, body_encoding, size, header_size",
+            session=session,
+            max_row=max_row,
+            until_row=until_row,
+            query=query,
+        )
+
+        async with self.cursor() as cursor:
+            await cursor.execute(sql, parameters)
+
+            rows = await cursor.fetchall()
+            results = []
+            for row in rows:
+                message = LazyLspMessage(*row[1:])
+                results.append((row[0], message))
+
+            return results
+
+    async def get_rowids(
+        self,
+        *,
+        session: str = "",
+        max_row: Optional[int] = None,
+        query: Optional[MessageQuery] = None,
+    ) -> List[int]:
+        """Get the row ids of messages in the database, accepts the same arguments as
+        :meth:`get_messages`.
+
+        This is much cheaper than fetching the messages themselves, allowing callers
+        to fetch only the messages they need.
+        """
+        if query is not None and query.text:
+            await self.update_search_index()
+
+        sql, parameters = self._build_query(
+            "rowid", session=session, max_row=max_row, query=query
+        )
+
+        async with self.cursor() as cursor:
+            await cursor.execute(sql, parameters)
+            return [row[0] for row in await cursor.fetchall()]
+
+    async def update_search_index(self):
+        """Add any messages that are not yet in the full text search index to it, see
+        :func:`lsp_devtools.search.update_search_index`."""
+        while True:
+            async with self.cursor() as cursor:
+                await cursor.execute(SEARCH_INDEX_RANGE)
+                (start, end) = await cursor.fetchone()  # type: ignore[misc]
+
+            if start >= end:
+                return
+
+            async with self._transaction() as cursor:
+                # Another process may have updated the index in the meantime.
+                await cursor.execute(SEARCH_INDEX_RANGE)
+                (start, end) = await cursor.fetchone()  # type: ignore[misc]
+                stop = min(start + INDEX_BATCH_SIZE, end)
+
+                await cursor.execute(INDEX_MESSAGES, (start, stop))
+                await cursor.execute(UPDATE_INDEXED_ROWID, (stop,))
+
+    def _build_query(
+        self,
+        columns: str,
+        *,
+        session: str = "",
+        max_row: Optional[int] = None,
+        until_row: Optional[int] = None,
+        query: Optional[MessageQuery] = None,
+    ) -> Tuple[str, Tuple[Any, ...]]:
+        """Build the query used to select the given columns from the protocol table."""
         where: List[str] = []
         parameters: List[Any] = []
 
@@ -117,32 +347,21 @@ class Database:
             where.append("rowid > ?")
             parameters.append(max_row)
 
-        if where:
-            conditions = " AND ".join(where)
-            query = " ".join([base_query, "WHERE", conditions])
-        else:
-            query = base_query
+        if until_row is not None:
+            where.append("rowid <= ?")
+            parameters.append(until_row)
 
-        async with self.cursor() as cursor:
-            await cursor.execute(query, tuple(parameters))
+        if query is not None:
+            conditions, values = query.where()
+            where.extend(conditions)
+            parameters.extend(values)
 
-            rows = await cursor.fetchall()
-            results = []
-            for row in rows:
-                message = LspMessage(
-                    session=row[1],
-                    timestamp=row[2],
-                    source=row[3],
-                    id=row[4],
-                    method=row[5],
-                    params=row[6],
-                    result=row[7],
-                    error=row[8],
-                )
-
-                results.append((row[0], message))
+        sql = ["SELECT", columns, "FROM protocol"]
+        if where:
+            sql.extend(["WHERE", " AND ".join(where)])
 
-            return results
+        sql.append("ORDER BY rowid")
+        return " ".join(sql), tuple(parameters)
 
 
 class DatabaseLogHandler(logging.Handler):
@@ -151,18 +370,13 @@ class DatabaseLogHandler(logging.Handler):
     def __init__(self, db: Database, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.db = db
-        self._tasks: Set[asyncio.Task] = set()
 
     def emit(self, record: logging.LogRecord):
-        body = json.loads(record.args[0])  # type: ignore
-        task = asyncio.create_task(
-            self.db.add_message(
-                record.__dict__["Message-Session"],
-                record.__dict__["Message-Timestamp"],
-                record.__dict__["Message-Source"],
-                body,
-            )
+        body: str = record.args[0]  # type: ignore
+        self.db.queue_raw_message(
+            record.__dict__["Message-Session"],
+            record.__dict__["Message-Timestamp"],
+            record.__dict__["Message-Source"],
+            body.encode("utf8"),
+            header_size=message_sizes(record.__dict__)[1],
         )
-
-        self._tasks.add(task)
-        task.add_done_callback(self._tasks.discard)
@@ -1,24 +1,87 @@
 from __future__ import annotations
 
-import json
 import logging
+import time
 import typing
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Generic
+from typing import TypeVar
 
 import attrs
 
+from lsp_devtools import codec
+
 if typing.TYPE_CHECKING:
+    from typing import AbstractSet
     from typing import Any
+    from typing import Dict
+    from typing import Hashable
+    from typing import Iterator
+    from typing import List
     from typing import Literal
     from typing import Mapping
     from typing import Optional
+    from typing import Tuple
+    from typing import Union
 
     MessageSource = Literal["client", "server"]
 
+T = TypeVar("T")
+
+OTHER_SOURCE: Dict[str, MessageSource] = {"client": "server", "server": "client"}
+"""Maps the source of a request to the source of its response."""
+
+
+def get_message_type(message: Mapping[str, Any]) -> str:
+    """Return the type of the given JSON-RPC message, one of ``request``,
+    ``result``, ``error`` or ``notification``."""
+    if "id" in message:
+        if "error" in message:
+            return "error"
+        elif "method" in message:
+            return "request"
+        else:
+            return "result"
+    else:
+        return "notification"
+
+
+def message_matches_type(message_type: str, types: AbstractSet[str]) -> bool:
+    """Determine if the type of message is included in the given set of types, where
+    ``response`` matches both ``result`` and ``error`` messages."""
+
+    if message_type == "result":
+        return len({"result", "response"} & types) > 0
+
+    if message_type == "error":
+        return len({"error", "response"} & types) > 0
+
+    return message_type in types
+
+
+def message_sizes(headers: Mapping[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    """Return the size of a message's body and headers, in bytes.
+
+    The size of the body is given by its ``Content-Length`` header, the size of its
+    headers by the ``Message-Header-Size`` header added by the agent. Either size is
+    ``None`` if it is unknown.
+    """
+    sizes: List[Optional[int]] = []
+    for name in ["Content-Length", "Message-Header-Size"]:
+        try:
+            sizes.append(int(headers[name]))
+        except (KeyError, TypeError, ValueError):
+            sizes.append(None)
+
+    return sizes[0], sizes[1]
+
 
 def maybe_json(value):
     try:
-        return json.loads(value)
+        return codec.loads(value)
     except Exception:
         return value
 
@@ -52,9 +115,21 @@ class LspMessage:
     error: Optional[Any] = attrs.field(converter=maybe_json)
     """The ``error`` field, if it exists."""
 
+    size: Optional[int] = attrs.field(default=None)
+    """The size of the message body in bytes, if known."""
+
+    header_size: Optional[int] = attrs.field(default=None)
+    """The size of the message's headers in bytes, if known."""
+
     @classmethod
     def from_rpc(
-        cls, session: str, timestamp: str, source: str, message: Mapping[str, Any]
+        cls,
+        session: str,
+        timestamp: str,
+        source: str,
+        message: Mapping[str, Any],
+        size: Optional[int] = None,
+        header_size: Optional[int] = None,
     ):
         """Create an instance from a JSON-RPC message."""
         return cls(
@@ -66,8 +141,18 @@ class LspMessage:
             params=message.get("params", None),
             result=message.get("result", None),
             error=message.get("error", None),
+            size=size,
+            header_size=header_size,
         )
 
+    @property
+    def wire_size(self) -> Optional[int]:
+        """The total size of the message as it was sent, in bytes, if known."""
+        if self.size is None or self.header_size is None:
+            return None
+
+        return self.size + self.header_size
+
     @property
     def is_request(self) -> bool:
         return self.id is not None and self.params is not None
@@ -82,6 +167,211 @@ class LspMessage:
         return self.id is None and self.params is not None
 
 
+def decode_body(body: Union[str, bytes], encoding: Optional[str]) -> Dict[str, Any]:
+    """Decode a message body stored in the database.
+
+    Parameters
+    ----------
+    body
+       The body, as stored in the ``protocol.body`` column.
+
+    encoding
+       The value of the ``protocol.body_encoding`` column.
+    """
+    if encoding == "zlib":
+        body = zlib.decompress(body)  # type: ignore[arg-type]
+
+    return codec.loads(body)
+
+
+class LazyLspMessage:
+    """A variant of :class:`LspMessage` for messages read from the database.
+
+    The ``params``, ``result`` and ``error`` fields are held as the text they were
+    stored as and only decoded (and cached) the first time they are accessed.
+    """
+
+    __slots__ = (
+        "session",
+        "timestamp",
+        "source",
+        "id",
+        "method",
+        "_params",
+        "_result",
+        "_error",
+        "_body",
+        "_body_encoding",
+        "_decoded",
+        "size",
+        "header_size",
+    )
+
+    def __init__(
+        self,
+        session: str,
+        timestamp: Any,
+        source: MessageSource,
+        id: Optional[str],
+        method: Optional[str],
+        params: Optional[str] = None,
+        result: Optional[str] = None,
+        error: Optional[str] = None,
+        body: Union[str, bytes, None] = None,
+        body_encoding: Optional[str] = None,
+        size: Optional[int] = None,
+        header_size: Optional[int] = None,
+    ):
+        self.session = session
+        self.timestamp = timestamp
+        self.source = source
+        self.id = id
+        self.method = method
+
+        self._params = params
+        self._result = result
+        self._error = error
+
+        self._body = body
+        """If set, the full message body, which takes precedence over the individual
+        fields."""
+
+        self._body_encoding = body_encoding
+        self._decoded: Optional[Dict[str, Any]] = None
+
+        self.size = size
+        """The size of the message body in bytes, if known."""
+
+        self.header_size = header_size
+        """The size of the message's headers in bytes, if known."""
+
+    def __repr__(self) -> str:
+        return (
+            f"LazyLspMessage(session={self.session!r}, timestamp={self.timestamp!r}, "
+            f"source={self.source!r}, id={self.id!r}, method={self.method!r})"
+        )
+
+    @property
+    def params(self) -> Optional[Any]:
+        """The ``params`` field, if it exists."""
+        return self._decode("params")
+
+    @property
+    def result(self) -> Optional[Any]:
+        """The ``result`` field, if it exists."""
+        return self._decode("result")
+
+    @property
+    def error(self) -> Optional[Any]:
+        """The ``error`` field, if it exists."""
+        return self._decode("error")
+
+    is_request = LspMessage.is_request
+    is_response = LspMessage.is_response
+    is_notification = LspMessage.is_notification
+    wire_size = LspMessage.wire_size
+
+    def _decode(self, field: str) -> Optional[Any]:
+        if self._decoded is None:
+            self._decoded = {}
+
+        if field in self._decoded:
+            return self._decoded[field]
+
+        if self._body is not None:
+            body = decode_body(self._body, self._body_encoding)
+            self._body = None
+
+            for name in ["params", "result", "error"]:
+                self._decoded[name] = body.get(name)
+
+        else:
+            if (value := getattr(self, f"_{field}")) is not None:
+                value = maybe_json(value)
+                setattr(self, f"_{field}", None)
+
+            self._decoded[field] = value
+
+        return self._decoded[field]
+
+
+class PendingRequests(Generic[T]):
+    """Holds information on requests that are waiting for a response.
+
+    To prevent unanswered requests from accumulating forever, the oldest requests are
+    evicted once there are more than ``maxsize`` of them, or once they have been
+    waiting for longer than ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: Optional[float] = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self.evictions = 0
+        """The number of requests evicted without seeing a response."""
+
+        self._requests: OrderedDict[Hashable, Tuple[float, T]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def add(self, key: Hashable, value: T):
+        """Record a new pending request."""
+        now = time.monotonic()
+
+        self._requests.pop(key, None)
+        self._requests[key] = (now, value)
+        self._evict(now)
+
+    def get(self, key: Hashable) -> Optional[T]:
+        """Return the request with the given key, if it exists."""
+        if (item := self._requests.get(key, None)) is None:
+            return None
+
+        return item[1]
+
+    def pop(self, key: Hashable) -> Optional[T]:
+        """Remove and return the request with the given key, if it exists."""
+        if (item := self._requests.pop(key, None)) is None:
+            return None
+
+        return item[1]
+
+    def values(self) -> Iterator[T]:
+        """Iterate over the requests currently waiting for a response."""
+        return (value for _, value in self._requests.values())
+
+    @contextmanager
+    def transaction(self):
+        """Undo any changes made within the block, should it raise an exception."""
+        requests, evictions = self._requests.copy(), self.evictions
+
+        try:
+            yield self
+        except BaseException:
+            self._requests, self.evictions = requests, evictions
+            raise
+
+    def _evict(self, now: float):
+        """Evict any requests that have expired."""
+        requests = self._requests
+
+        while len(requests) > self.maxsize:
+            requests.popitem(last=False)
+            self.evictions += 1
+
+        if self.ttl is None:
+            return
+
+        while requests:
+            added, _ = next(iter(requests.values()))
+            if now - added < self.ttl:
+                break
+
+            requests.popitem(last=False)
+            self.evictions += 1
+
+
 class LspHandler(logging.Handler):
     """Base class for lsp log handlers."""
 
@@ -97,6 +387,7 @@ class LspHandler(logging.Handler):
 
         message = record.args
         source = record.__dict__["Message-Source"]
+        size, header_size = message_sizes(record.__dict__)
 
         self.handle_message(
             LspMessage.from_rpc(
@@ -104,5 +395,7 @@ class LspHandler(logging.Handler):
                 timestamp=record.__dict__["Message-Timestamp"],
                 source=source,
                 message=message,
+                size=size,
+                header_size=header_size,
             )
         )
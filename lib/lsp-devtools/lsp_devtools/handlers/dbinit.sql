@@ -1,5 +1,14 @@
 -- Tables
 
+-- The version of the schema, used to determine which migrations (see the
+-- 'migrations/' folder) need to be applied to the database.
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER NOT NULL
+);
+
+INSERT INTO schema_version
+SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM schema_version);
+
 -- We use a single table 'protocol' to store all messages sent between client and server.
 -- Data within the table is then exposed through a number of SQL views, that parse out the
 -- details relevant to that view.
@@ -0,0 +1,83 @@
+-- Version 1
+--
+-- Adds indexes used when joining requests with their responses and when looking up
+-- messages by method or time, as well as indexed generated columns for commonly
+-- extracted JSON fields.
+--
+-- Like all migrations, this script is run statement by statement within a single
+-- transaction, see init_db() in 'handlers/sql.py'.
+
+-- Generated columns
+ALTER TABLE protocol ADD COLUMN client_name TEXT GENERATED ALWAYS AS (
+    CASE WHEN method = 'initialize' THEN json_extract(params, '$.clientInfo.name') END
+) VIRTUAL;
+
+ALTER TABLE protocol ADD COLUMN client_version TEXT GENERATED ALWAYS AS (
+    CASE WHEN method = 'initialize' THEN json_extract(params, '$.clientInfo.version') END
+) VIRTUAL;
+
+ALTER TABLE protocol ADD COLUMN root_uri TEXT GENERATED ALWAYS AS (
+    CASE WHEN method = 'initialize' THEN json_extract(params, '$.rootUri') END
+) VIRTUAL;
+
+ALTER TABLE protocol ADD COLUMN log_type INTEGER GENERATED ALWAYS AS (
+    CASE WHEN method = 'window/logMessage' THEN json_extract(params, '$.type') END
+) VIRTUAL;
+
+ALTER TABLE protocol ADD COLUMN log_message TEXT GENERATED ALWAYS AS (
+    CASE WHEN method = 'window/logMessage' THEN json_extract(params, '$.message') END
+) VIRTUAL;
+
+-- Indexes
+CREATE INDEX IF NOT EXISTS protocol_session_id ON protocol (session, id);
+CREATE INDEX IF NOT EXISTS protocol_session_method ON protocol (session, method);
+CREATE INDEX IF NOT EXISTS protocol_timestamp ON protocol (timestamp);
+CREATE INDEX IF NOT EXISTS protocol_method ON protocol (method);
+
+-- Indexing the generated columns stores their values, so that they are not extracted
+-- from the JSON each time they are queried. The indexes are partial, so only the
+-- messages they apply to pay the cost of maintaining them.
+CREATE INDEX IF NOT EXISTS protocol_clients
+ON protocol (client_name, client_version, root_uri)
+WHERE method = 'initialize';
+
+CREATE INDEX IF NOT EXISTS protocol_log_messages
+ON protocol (session, timestamp, log_type, log_message)
+WHERE method = 'window/logMessage';
+
+-- Views
+DROP VIEW IF EXISTS sessions;
+CREATE VIEW sessions AS
+SELECT
+    client.session,
+    client.timestamp,
+    client.client_name,
+    client.client_version,
+    client.root_uri,
+    json_extract(client.params, "$.workspaceFolders") as workspace_folders,
+    client.params,
+    server.result
+FROM protocol as client
+INNER JOIN protocol as server ON
+    client.session = server.session AND
+    client.id = server.id AND
+    client.params IS NOT NULL AND
+    (
+        server.result IS NOT NULL OR
+        server.error IS NOT NULL
+    )
+WHERE client.method = 'initialize';
+
+DROP VIEW IF EXISTS logMessages;
+CREATE VIEW logMessages AS
+SELECT
+    rowid,
+    session,
+    timestamp,
+    log_type as type,
+    log_message as message
+-- Otherwise the planner prefers 'protocol_method', which does not hold the values.
+FROM protocol INDEXED BY protocol_log_messages
+WHERE method = 'window/logMessage';
+
+UPDATE schema_version SET version = 1;
@@ -0,0 +1,62 @@
+-- Version 2
+--
+-- Responses are paired with their requests as they are written to the database,
+-- storing the request's rowid and method, along with the time taken to respond on the
+-- response's row.
+
+ALTER TABLE protocol ADD COLUMN request_rowid INTEGER NULL;
+ALTER TABLE protocol ADD COLUMN duration_ms REAL NULL;
+
+-- Pair any existing responses with their requests.
+UPDATE protocol AS server SET request_rowid = (
+    SELECT client.rowid FROM protocol AS client
+    WHERE
+        client.session = server.session AND
+        client.id = server.id AND
+        client.source <> server.source AND
+        client.method IS NOT NULL AND
+        client.rowid < server.rowid
+    ORDER BY client.rowid DESC
+    LIMIT 1
+)
+WHERE
+    server.id IS NOT NULL AND
+    server.method IS NULL;
+
+UPDATE protocol AS server SET
+    method = client.method,
+    duration_ms = (julianday(server.timestamp) - julianday(client.timestamp)) * 86400000
+FROM protocol AS client
+WHERE client.rowid = server.request_rowid;
+
+-- Views
+DROP VIEW IF EXISTS requests;
+CREATE VIEW requests AS
+SELECT
+    client.session,
+    client.timestamp,
+    server.duration_ms as duration,
+    client.id,
+    client.method,
+    client.params,
+    server.result,
+    server.error
+FROM protocol as server
+INNER JOIN protocol as client ON client.rowid = server.request_rowid;
+
+DROP VIEW IF EXISTS sessions;
+CREATE VIEW sessions AS
+SELECT
+    client.session,
+    client.timestamp,
+    client.client_name,
+    client.client_version,
+    client.root_uri,
+    json_extract(client.params, "$.workspaceFolders") as workspace_folders,
+    client.params,
+    server.result
+FROM protocol as server
+INNER JOIN protocol as client ON client.rowid = server.request_rowid
+WHERE server.method = 'initialize';
+
+UPDATE schema_version SET version = 2;
@@ -0,0 +1,14 @@
+-- Version 3
+--
+-- Adds the option of storing the body of a message exactly as it was received,
+-- rather than re-encoding its 'params', 'result' and 'error' fields.
+
+-- The raw message body, if stored. Rows with a body leave the 'params', 'result'
+-- and 'error' columns empty.
+ALTER TABLE protocol ADD COLUMN body NULL;
+
+-- How the body is encoded, NULL if the body is stored as plain JSON text,
+-- 'zlib' if the body is compressed.
+ALTER TABLE protocol ADD COLUMN body_encoding TEXT NULL;
+
+UPDATE schema_version SET version = 3;
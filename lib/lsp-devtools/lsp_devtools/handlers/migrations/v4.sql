@@ -0,0 +1,36 @@
+-- Version 4
+--
+-- Adds the columns and indexes needed to search for messages, see
+-- 'lsp_devtools/search.py'.
+
+-- The type of the message, one of 'request', 'result', 'error' or 'notification'.
+ALTER TABLE protocol ADD COLUMN message_type TEXT NULL;
+
+-- Compressed bodies cannot be inspected, so any errors stored that way are treated as
+-- results.
+UPDATE protocol SET message_type = CASE
+    WHEN id IS NULL THEN 'notification'
+    WHEN error IS NOT NULL THEN 'error'
+    WHEN body_encoding IS NULL AND json_type(body, '$.error') IS NOT NULL THEN 'error'
+    WHEN request_rowid IS NOT NULL OR method IS NULL THEN 'result'
+    ELSE 'request'
+END;
+
+-- Timestamps are stored in more than one format (e.g. with either a 'T' or a space
+-- between the date and time), so searches compare them as julian day numbers.
+CREATE INDEX IF NOT EXISTS protocol_julianday ON protocol (julianday(timestamp));
+
+-- Full text search over the JSON text of each message.
+--
+-- The index is contentless, the text itself is only stored in the 'protocol' table.
+-- Messages are not indexed as they are inserted, instead the index is brought up to
+-- date the first time it is needed, see update_search_index() in
+-- 'lsp_devtools/search.py'. Compressed bodies are not indexed.
+CREATE VIRTUAL TABLE IF NOT EXISTS protocol_fts USING fts5(text, content='');
+
+-- The largest rowid of the messages that have been added to the index.
+CREATE TABLE IF NOT EXISTS protocol_fts_status (indexed_rowid INTEGER NOT NULL);
+
+INSERT INTO protocol_fts_status (indexed_rowid) VALUES (0);
+
+UPDATE schema_version SET version = 4;
@@ -0,0 +1,18 @@
+-- Version 5
+--
+-- Records the size of each message, as it was sent over the wire.
+
+-- The size of the message body in bytes i.e. its 'Content-Length'.
+ALTER TABLE protocol ADD COLUMN size INTEGER NULL;
+
+-- The size of the message's headers in bytes, including the blank line that separates
+-- them from the body.
+ALTER TABLE protocol ADD COLUMN header_size INTEGER NULL;
+
+-- Bodies stored as they were received have the same size they were sent with.
+UPDATE protocol SET size = length(CAST(body AS BLOB))
+WHERE body IS NOT NULL AND body_encoding IS NULL;
+
+CREATE INDEX IF NOT EXISTS protocol_size ON protocol (size);
+
+UPDATE schema_version SET version = 5;
@@ -1,47 +1,430 @@
-import json
+import logging
 import pathlib
+import queue
 import sqlite3
 import sys
+import threading
+import time
+import zlib
 from contextlib import closing
+from datetime import datetime
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Literal
+from typing import Optional
+from typing import Tuple
+from typing import Union
 
+from lsp_devtools import codec
+from lsp_devtools.codec import peek_message
+from lsp_devtools.handlers import OTHER_SOURCE
 from lsp_devtools.handlers import LspHandler
 from lsp_devtools.handlers import LspMessage
+from lsp_devtools.handlers import PendingRequests
+from lsp_devtools.handlers import get_message_type
+from lsp_devtools.handlers import message_sizes
 
 if sys.version_info < (3, 9):
     import importlib_resources as resources
 else:
     from importlib import resources  # type: ignore[no-redef]
 
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 5
+"""The current version of the database schema."""
+
+INSERT_MESSAGE = (
+    "INSERT INTO protocol "
+    "(rowid, session, timestamp, source, id, method, params, result, error, "
+    "body, body_encoding, message_type, size, header_size, request_rowid, "
+    "duration_ms) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+"""Statement used to insert rows produced by :class:`RequestPairer`."""
+
+StorageMode = Literal["columns", "raw", "compressed"]
+"""How messages are stored in the database.
+
+``columns``
+   The message's ``params``, ``result`` and ``error`` fields are encoded and stored
+   in their own columns.
+
+``raw``
+   The message body is stored exactly as it was received.
+
+``compressed``
+   The message body is stored exactly as it was received, compressed with zlib.
+   Compressed messages are not included in the full text search index.
+"""
+
+STORAGE_MODES = ["columns", "raw", "compressed"]
+
+
+_FLUSH = object()
+"""Sentinel used to ask the writer thread to flush any pending rows."""
+
+_STOP = object()
+"""Sentinel used to ask the writer thread to flush any pending rows and exit."""
+
+
+def get_schema() -> str:
+    """Return the script used to initialize the database."""
+    resource = resources.files("lsp_devtools.handlers").joinpath("dbinit.sql")
+    return resource.read_text(encoding="utf8")
+
+
+def get_migrations(version: int) -> List[str]:
+    """Return the scripts required to migrate a database from the given version of
+    the schema to the latest version."""
+    migrations = resources.files("lsp_devtools.handlers").joinpath("migrations")
+
+    return [
+        migrations.joinpath(f"v{v}.sql").read_text(encoding="utf8")
+        for v in range(version + 1, SCHEMA_VERSION + 1)
+    ]
+
+
+def split_statements(script: str) -> List[str]:
+    """Split the given script into individual statements.
+
+    Unlike ``executescript``, this allows a script to be run within a transaction
+    managed by the caller.
+    """
+    statements = []
+    current = ""
+
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+
+    return statements
+
+
+def get_migration_statements(version: int) -> List[str]:
+    """Return the statements required to migrate a database from the given version
+    of the schema to the latest version."""
+    return [
+        statement
+        for script in get_migrations(version)
+        for statement in split_statements(script)
+    ]
+
+
+def init_db(conn: sqlite3.Connection):
+    """Ensure that the given database is initialized with the latest schema.
+
+    The schema version is read and any migrations applied while holding the
+    database's write lock, so that multiple processes opening the same database do
+    not attempt to apply the same migration.
+    """
+    conn.executescript(get_schema())
+    conn.execute("BEGIN IMMEDIATE")
+
+    try:
+        (version,) = conn.execute("SELECT version FROM schema_version").fetchone()
+        for statement in get_migration_statements(version):
+            conn.execute(statement)
+
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+class RequestPairer:
+    """Pairs responses with their requests as messages are written to the database."""
+
+    def __init__(self, pending: Optional[PendingRequests] = None):
+        self.pending: PendingRequests[Tuple[int, str, datetime]] = (
+            pending if pending is not None else PendingRequests()
+        )
+
+    def pair(self, rowid: int, rows: List[Tuple[Any, ...]]) -> List[Tuple[Any, ...]]:
+        """Assign row ids to the given rows, starting from ``rowid``.
+
+        Any responses will have their ``method``, ``request_rowid`` and
+        ``duration_ms`` fields filled in, see :data:`INSERT_MESSAGE` for the
+        resulting row layout.
+        """
+        result = []
+
+        for row in rows:
+            session, timestamp, source, msg_id, method, *fields = row
+            request_rowid, duration = None, None
+
+            if msg_id is None:
+                pass
+
+            elif method is not None:
+                self.pending.add(
+                    (session, source, msg_id), (rowid, method, as_datetime(timestamp))
+                )
+
+            elif request := self.pending.pop(
+                (session, OTHER_SOURCE.get(source), msg_id)
+            ):
+                request_rowid, method, requested_at = request
+                delta = as_datetime(timestamp) - requested_at
+                duration = delta.total_seconds() * 1000
+
+            result.append(
+                (
+                    rowid,
+                    session,
+                    timestamp,
+                    source,
+                    msg_id,
+                    method,
+                    *fields,
+                    request_rowid,
+                    duration,
+                )
+            )
+            rowid += 1
+
+        return result
+
+
+def message_row(
+    session: str,
+    timestamp: Any,
+    source: str,
+    message: Dict[str, Any],
+    size: Optional[int] = None,
+    header_size: Optional[int] = None,
+) -> Tuple[Any, ...]:
+    """Return the row used to store the given message in ``columns`` mode.
+
+    The ``size`` of the message body and its ``header_size`` should be given where
+    known, they cannot be recovered from the decoded message.
+    """
+    params = message.get("params")
+    result = message.get("result")
+    error = message.get("error")
+
+    return (
+        session,
+        timestamp,
+        source,
+        message.get("id"),
+        message.get("method"),
+        codec.dumps(params) if params else None,
+        codec.dumps(result) if result else None,
+        codec.dumps(error) if error else None,
+        None,
+        None,
+        get_message_type(message),
+        size,
+        header_size,
+    )
+
+
+def raw_message_row(
+    session: str,
+    timestamp: Any,
+    source: str,
+    body: bytes,
+    storage: StorageMode,
+    header_size: Optional[int] = None,
+    message: Optional[Dict[str, Any]] = None,
+) -> Tuple[Any, ...]:
+    """Return the row used to store the given message body in ``raw`` or
+    ``compressed`` mode.
+
+    Only the fields needed to index the message are extracted from the body. If the
+    caller has already decoded the body, it should be passed as ``message`` so that
+    the fields can be taken from it instead.
+    """
+    if message is not None:
+        fields = message
+        message_type = get_message_type(message)
+    elif (peek := peek_message(body)).message_type is not None:
+        fields = peek.fields
+        message_type = peek.message_type
+    else:
+        fields = codec.loads(bytes(body))
+        message_type = get_message_type(fields)
+
+    if storage == "compressed":
+        # Favour speed over size, since this happens on every message.
+        stored: Union[str, bytes] = zlib.compress(body, 1)
+        encoding: Optional[str] = "zlib"
+    else:
+        stored, encoding = str(body, "utf8"), None
+
+    return (
+        session,
+        timestamp,
+        source,
+        fields.get("id"),
+        fields.get("method"),
+        None,
+        None,
+        None,
+        stored,
+        encoding,
+        message_type,
+        len(body),
+        header_size,
+    )
+
+
+def as_datetime(timestamp: Union[str, datetime]) -> datetime:
+    if isinstance(timestamp, datetime):
+        return timestamp
+
+    return datetime.fromisoformat(timestamp)
+
+
+def get_max_rowid(conn: sqlite3.Connection) -> int:
+    """Return the largest rowid currently in the ``protocol`` table."""
+    (max_row,) = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM protocol").fetchone()
+    return max_row
+
 
 class SqlHandler(LspHandler):
-    """A logging handler that sends log records to a SQL database"""
+    """A logging handler that sends log records to a SQL database.
 
-    def __init__(self, dbpath: pathlib.Path, *args, **kwargs):
+    Messages are written to the database in batches by a background thread which
+    holds a single connection open for the lifetime of the handler. A batch is
+    written once it contains ``batch_size`` messages, or once ``flush_interval``
+    seconds have passed since the first message in the batch was received.
+    """
+
+    def __init__(
+        self,
+        dbpath: pathlib.Path,
+        *args,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        storage: StorageMode = "columns",
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
 
         self.dbpath = dbpath
-
-        resource = resources.files("lsp_devtools.handlers").joinpath("dbinit.sql")
-        sql_script = resource.read_text(encoding="utf8")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.storage = storage
 
         with closing(sqlite3.connect(self.dbpath)) as conn:
-            conn.executescript(sql_script)
+            conn.execute("PRAGMA journal_mode=WAL")
+            init_db(conn)
+
+        self._pairer = RequestPairer()
+        self._queue: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._run, name="lsp-devtools-sql-writer", daemon=True
+        )
+        self._writer.start()
+
+    def emit(self, record: logging.LogRecord):
+        # Store the body as received, if available.
+        body = record.__dict__.get("Message-Body")
+        if self.storage == "columns" or body is None:
+            super().emit(record)
+            return
+
+        self._queue.put(
+            raw_message_row(
+                record.__dict__["Message-Session"],
+                record.__dict__["Message-Timestamp"],
+                record.__dict__["Message-Source"],
+                body,
+                self.storage,
+                header_size=message_sizes(record.__dict__)[1],
+                message=record.args if isinstance(record.args, dict) else None,
+            )
+        )
 
     def handle_message(self, message: LspMessage):
-        with closing(sqlite3.connect(self.dbpath)) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO protocol VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    message.session,
-                    message.timestamp,
-                    message.source,
-                    message.id,
-                    message.method,
-                    json.dumps(message.params) if message.params else None,
-                    json.dumps(message.result) if message.result else None,
-                    json.dumps(message.error) if message.error else None,
-                ),
+        fields = {
+            name: value
+            for name in ["id", "method", "params", "result", "error"]
+            if (value := getattr(message, name)) is not None
+        }
+
+        self._queue.put(
+            message_row(
+                message.session,
+                message.timestamp,
+                message.source,
+                fields,
+                message.size,
+                message.header_size,
             )
+        )
+
+    def flush(self):
+        """Block until all messages received so far have been written to the
+        database."""
+        if self._writer.is_alive():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def close(self):
+        """Write any pending messages to the database and stop the writer thread."""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+        super().close()
+
+    def _run(self):
+        """The writer thread's main loop."""
+        rows: List[Tuple[Any, ...]] = []
+        deadline = 0.0
+
+        with closing(sqlite3.connect(self.dbpath)) as conn:
+            conn.execute("PRAGMA synchronous=NORMAL")
+
+            while True:
+                timeout = max(0.0, deadline - time.monotonic()) if rows else None
+
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None  # Time to write the current batch
+                else:
+                    if item is not _FLUSH and item is not _STOP:
+                        rows.append(item)
+
+                        if len(rows) == 1:
+                            deadline = time.monotonic() + self.flush_interval
+
+                        if len(rows) < self.batch_size:
+                            continue
+
+                if rows:
+                    self._write_rows(conn, rows)
+
+                    # Mark all the rows written in this batch as done
+                    for _ in rows:
+                        self._queue.task_done()
+
+                    rows = []
+
+                if item is _FLUSH or item is _STOP:
+                    self._queue.task_done()
+
+                if item is _STOP:
+                    break
 
-            conn.commit()
+    def _write_rows(self, conn: sqlite3.Connection, rows: List[Tuple[Any, ...]]):
+        try:
+            # Forget the requests in this batch if it cannot be written, so that later
+            # responses are not paired with rows that do not exist.
+            with self._pairer.pending.transaction():
+                # Take the write lock before choosing row ids, in case another process
+                # is writing to the same database.
+                conn.execute("BEGIN IMMEDIATE")
+                rows = self._pairer.pair(get_max_rowid(conn) + 1, rows)
+                conn.executemany(INSERT_MESSAGE, rows)
+                conn.commit()
+        except Exception:
+            logger.error("Unable to write messages to database", exc_info=True)
+            conn.rollback()
@@ -1,97 +1,397 @@
 import argparse
 import asyncio
+import itertools
 import logging
+import math
 import pathlib
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from collections import deque
 from functools import partial
 from typing import Any
 from typing import Dict
+from typing import Iterable
 from typing import List
 from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
 
+import attrs
 import platformdirs
 from rich.highlighter import ReprHighlighter
+from rich.segment import Segment
+from rich.style import Style
 from rich.text import Text
+from textual import events
 from textual import on
 from textual.app import App
 from textual.app import ComposeResult
+from textual.binding import Binding
 from textual.containers import Container
-from textual.containers import ScrollableContainer
 from textual.events import Ready
+from textual.geometry import Region
+from textual.geometry import Size
+from textual.geometry import Spacing
+from textual.message import Message
+from textual.reactive import reactive
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+from textual.timer import Timer
 from textual.widgets import DataTable
 from textual.widgets import Footer
 from textual.widgets import Header
+from textual.widgets import Input
+from textual.widgets import Sparkline
 from textual.widgets import Tree
 from textual.widgets.tree import TreeNode
 
 from lsp_devtools.agent import AgentServer
-from lsp_devtools.agent import parse_rpc_message
+from lsp_devtools.agent import parse_rpc_headers
 from lsp_devtools.database import Database
-from lsp_devtools.handlers import LspMessage
+from lsp_devtools.handlers import LazyLspMessage
+from lsp_devtools.handlers import message_sizes
+from lsp_devtools.handlers.sql import STORAGE_MODES
+from lsp_devtools.record.formatters import format_bytes
+from lsp_devtools.search import MessageQuery
+from lsp_devtools.search import parse_query
+from lsp_devtools.stats import MethodStats
 
 logger = logging.getLogger(__name__)
 
 
-class MessageViewer(Tree):
-    """Used to inspect the fields of an object."""
+@attrs.define
+class _Children:
+    """Holds the object whose fields are shown as the children of a tree node."""
+
+    obj: Union[Dict[str, Any], List[Any]]
+    """The object."""
+
+    loaded: int = attrs.field(default=0)
+    """The number of the object's fields that have been added to the tree so far."""
+
+
+@attrs.define
+class _ShowMore:
+    """Marks the node used to load the next page of a large object's fields."""
 
-    def __init__(self, *args, **kwargs) -> None:
+    parent: TreeNode
+    """The node the fields should be added to."""
+
+
+class MessageViewer(Tree):
+    """Used to inspect the fields of an object.
+
+    Child nodes are only created when their parent is expanded, and large objects
+    are shown ``page_size`` fields at a time, so that huge messages can be viewed
+    without creating a node for every field up front.
+    """
+
+    def __init__(
+        self,
+        *args,
+        page_size: int = 100,
+        expand_limit: int = 200,
+        max_value_length: int = 200,
+        preview_length: int = 40,
+        **kwargs,
+    ) -> None:
         super().__init__(*args, **kwargs)
         self.highlighter = ReprHighlighter()
 
+        self.page_size = page_size
+        """The maximum number of an object's fields to show at once."""
+
+        self.expand_limit = expand_limit
+        """Nested objects are expanded automatically, until the tree contains this
+        many nodes."""
+
+        self.max_value_length = max_value_length
+        """Strings longer than this are truncated."""
+
+        self.preview_length = preview_length
+        """Collapsed objects include a preview of their contents, if it would be no
+        longer than this."""
+
     def set_object(self, name: str, obj: Any):
         self.clear()
         self.root.set_label(name)
-        self.walk_object(name, self.root, obj)
 
-    def walk_object(self, label: str, node: TreeNode, obj: Any):
-        if isinstance(obj, dict):
-            node.expand()
-            for field, value in obj.items():
-                child = node.add(field)
-                self.walk_object(field, child, value)
+        if not _is_container(obj):
+            self.root.allow_expand = False
+            self.root.set_label(self._leaf_label(name, obj))
+            return
 
-        elif isinstance(obj, list):
+        self.root.data = _Children(obj)
+        self._load_children(self.root)
+        self.root.expand()
+
+        # Expand small nested objects, breadth first, while the tree stays small.
+        count = len(self.root.children)
+        queue = deque(self.root.children)
+
+        while queue and count < self.expand_limit:
+            node = queue.popleft()
+            if not isinstance(node.data, _Children):
+                continue
+
+            self._load_children(node)
             node.expand()
-            for idx, value in enumerate(obj):
-                child_label = self.highlighter(str(idx))
-                child = node.add(child_label)
-                self.walk_object(str(idx), child, value)
 
+            count += len(node.children)
+            queue.extend(node.children)
+
+    def _load_children(self, node: TreeNode):
+        """Add the next page of fields of the object held by ``node``."""
+        if not isinstance(children := node.data, _Children):
+            return
+
+        obj = children.obj
+        start, stop = children.loaded, min(children.loaded + self.page_size, len(obj))
+
+        if isinstance(obj, dict):
+            fields: Iterable[Tuple[Any, Any]] = itertools.islice(
+                obj.items(), start, stop
+            )
         else:
-            node.allow_expand = False
-            node.set_label(Text.assemble(label, " = ", self.highlighter(repr(obj))))
+            fields = zip(range(start, stop), obj[start:stop])
+
+        for field, value in fields:
+            label: Union[str, Text] = (
+                str(field) if isinstance(obj, dict) else self.highlighter(str(field))
+            )
+
+            if _is_container(value):
+                node.add(self._container_label(label, value), data=_Children(value))
+            else:
+                node.add_leaf(self._leaf_label(label, value))
+
+        children.loaded = stop
+        if (remaining := len(obj) - stop) > 0:
+            count = min(remaining, self.page_size)
+            node.add_leaf(
+                Text(f"... show {count} more ({remaining} remaining)", style="dim"),
+                data=_ShowMore(node),
+            )
+
+    def _leaf_label(self, label: Union[str, Text], value: Any) -> Text:
+        suffix = ""
+        if isinstance(value, str) and len(value) > self.max_value_length:
+            suffix = f"... ({len(value)} characters)"
+            value = value[: self.max_value_length]
+
+        return Text.assemble(
+            label, " = ", self.highlighter(repr(value)), (suffix, "dim")
+        )
+
+    def _container_label(self, label: Union[str, Text], value: Any) -> Text:
+        if isinstance(value, dict):
+            size = f"{{{len(value)} {'field' if len(value) == 1 else 'fields'}}}"
+        else:
+            size = f"[{len(value)} {'item' if len(value) == 1 else 'items'}]"
+
+        text = Text.assemble(label, " ", (size, "dim"))
+        if (preview := self._preview(value)) is not None:
+            text.append(" ")
+            text.append_text(self.highlighter(preview))
+
+        return text
+
+    def _preview(self, value: Any) -> Optional[str]:
+        """Return a short summary of the given object, if there is one short enough."""
+
+        # Each field takes at least 2 characters, so there is no need to look at any
+        # object larger than this.
+        if len(value) > self.preview_length // 2:
+            return None
+
+        items = value.values() if isinstance(value, dict) else value
+
+        if any(_is_container(item) for item in items):
+            return None
+
+        preview = repr(value)
+        return preview if len(preview) <= self.preview_length else None
+
+    @on(Tree.NodeExpanded)
+    def _on_node_expanded(self, event: Tree.NodeExpanded):
+        node = event.node
+        if isinstance(node.data, _Children) and node.data.loaded == 0:
+            self._load_children(node)
+
+    @on(Tree.NodeSelected)
+    def _on_node_selected(self, event: Tree.NodeSelected):
+        node = event.node
+        if isinstance(node.data, _ShowMore):
+            parent = node.data.parent
+            node.remove()
+            self._load_children(parent)
+
+
+def _is_container(obj: Any) -> bool:
+    """Determine if the given object has fields that are shown as child nodes."""
+    return isinstance(obj, (dict, list)) and len(obj) > 0
 
 
-class MessagesTable(DataTable):
-    """Datatable used to display all messages between client and server"""
+class MessagesTable(ScrollView, can_focus=True):
+    """Table used to display all messages between client and server.
 
-    def __init__(self, db: Database, viewer: MessageViewer, session=None):
+    Only the row ids of the messages in the table are held in memory, the messages
+    themselves are fetched from the database a page at a time as they are scrolled
+    into view. Pages that have not been viewed recently are evicted.
+    """
+
+    BINDINGS = [
+        Binding("up", "cursor_up", "Cursor Up", show=False),
+        Binding("down", "cursor_down", "Cursor Down", show=False),
+        Binding("pageup", "page_up", "Page Up", show=False),
+        Binding("pagedown", "page_down", "Page Down", show=False),
+        Binding("home", "cursor_home", "Top", show=False),
+        Binding("end", "cursor_end", "Bottom", show=False),
+    ]
+
+    COMPONENT_CLASSES = {
+        "messages-table--header",
+        "messages-table--cursor",
+        "messages-table--placeholder",
+    }
+
+    DEFAULT_CSS = """
+    MessagesTable > .messages-table--header {
+        text-style: bold;
+        background: $primary;
+        color: $text;
+    }
+
+    MessagesTable > .messages-table--cursor {
+        background: $secondary;
+        color: $text;
+    }
+
+    MessagesTable > .messages-table--placeholder {
+        color: $text-muted;
+    }
+    """
+
+    COLUMNS = [
+        ("", 8),
+        ("Time", 18),
+        ("Source", 8),
+        ("ID", 8),
+        ("Size", 9),
+        ("Method", 48),
+    ]
+    """The table's columns, along with their widths."""
+
+    cursor_row: reactive[int] = reactive(-1)
+    """The index of the currently highlighted row."""
+
+    def __init__(
+        self,
+        db: Database,
+        viewer: MessageViewer,
+        session=None,
+        *,
+        page_size: int = 100,
+        max_pages: int = 10,
+        refresh_rate: float = 10.0,
+    ):
         super().__init__()
 
         self.db = db
 
-        self.rpcdata: Dict[int, LspMessage] = {}
+        self.refresh_rate = refresh_rate
+        """The maximum number of times per second to query for new messages."""
+
+        self._update_pending = False
+        self._last_update = 0.0
+        self._latest_row = 0
+        self._queried_row = 0
+
+        self.rowids: array[int] = array("q")
+        """The row ids of all the messages in the table."""
+
         self.max_row = 0
         self.session: Optional[str] = session
 
+        self.search: Optional[MessageQuery] = None
+        """If set, only show messages matching the given search."""
+
+        self._generation = 0
+        """Incremented each time the table is reset, so that the results of any
+        queries made before the reset can be discarded."""
+
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._pages: OrderedDict[int, Dict[int, LazyLspMessage]] = OrderedDict()
+        self._loading: Set[int] = set()
+
         self.viewer = viewer
+        self.virtual_size = Size(self.table_width, 1)
 
-        self.cursor_type = "row"
+    @property
+    def row_count(self) -> int:
+        return len(self.rowids)
 
-        self.add_column("")
-        self.add_column("Time")
-        self.add_column("Source")
-        self.add_column("ID")
-        self.add_column("Method")
+    @property
+    def table_width(self) -> int:
+        return sum(width + 1 for _, width in self.COLUMNS)
 
-    @on(DataTable.RowHighlighted)
-    def show_object(self, event: DataTable.RowHighlighted):
+    def get_message(self, row: int) -> Optional[LazyLspMessage]:
+        """Return the message at the given row, if it has been loaded.
+
+        If the message has not been loaded, the page containing it is fetched in the
+        background.
+        """
+        page_idx = row // self.page_size
+        if (page := self._pages.get(page_idx)) is None:
+            self._load_page(page_idx)
+            return None
+
+        self._pages.move_to_end(page_idx)
+        return page.get(self.rowids[row])
+
+    def _load_page(self, page_idx: int):
+        if page_idx in self._loading:
+            return
+
+        self._loading.add(page_idx)
+        self.run_worker(self._fetch_page(page_idx), group="pages")
+
+    async def _fetch_page(self, page_idx: int):
+        start = page_idx * self.page_size
+        stop = min(start + self.page_size, self.row_count) - 1
+        generation = self._generation
+
+        try:
+            messages = await self.db.get_messages(
+                **self._get_query_params(),
+                max_row=self.rowids[start] - 1,
+                until_row=self.rowids[stop],
+            )
+        finally:
+            if generation == self._generation:
+                self._loading.discard(page_idx)
+
+        if generation != self._generation:
+            return
+
+        self._pages[page_idx] = dict(messages)
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+        self.refresh()
+        if start <= self.cursor_row <= stop:
+            self.show_object()
+
+    def show_object(self):
         """Show the message object on the currently highlighted row."""
-        if event.cursor_row < 0:
+        if self.cursor_row < 0:
             return
 
-        rowid = int(self.get_row_at(event.cursor_row)[0])
-        if (message := self.rpcdata.get(rowid, None)) is None:
+        if (message := self.get_message(self.cursor_row)) is None:
             return
 
         name = ""
@@ -111,28 +411,327 @@ class MessagesTable(DataTable):
 
         self.viewer.set_object(name, obj)
 
+    def watch_cursor_row(self, old_row: int, new_row: int):
+        self.refresh()
+        if new_row < 0:
+            return
+
+        # Wait for any changes to the table's size to take effect before scrolling.
+        self.call_after_refresh(self._scroll_to_cursor)
+        self.show_object()
+
+    def _scroll_to_cursor(self):
+        # The header occupies the first line of the table.
+        self.scroll_to_region(
+            Region(0, self.cursor_row + 1, 1, 1), spacing=Spacing(top=1), animate=False
+        )
+
+    def validate_cursor_row(self, row: int) -> int:
+        return max(min(row, self.row_count - 1), -1 if self.row_count == 0 else 0)
+
+    def move_cursor(self, *, row: int):
+        self.cursor_row = row
+
+    def action_cursor_up(self):
+        self.cursor_row -= 1
+
+    def action_cursor_down(self):
+        self.cursor_row += 1
+
+    def action_page_up(self):
+        self.cursor_row -= max(self.size.height - 1, 1)
+
+    def action_page_down(self):
+        self.cursor_row += max(self.size.height - 1, 1)
+
+    def action_cursor_home(self):
+        self.cursor_row = 0
+
+    def action_cursor_end(self):
+        self.cursor_row = self.row_count - 1
+
+    def on_click(self, event: events.Click):
+        if event.y > 0:
+            self.cursor_row = self.scroll_offset.y + event.y - 1
+
+    def render_line(self, y: int) -> Strip:
+        if y == 0:
+            style = self.get_component_rich_style("messages-table--header")
+            cells = [name for name, _ in self.COLUMNS]
+        else:
+            row = self.scroll_offset.y + y - 1
+            if row >= self.row_count:
+                return Strip.blank(self.size.width, self.rich_style)
+
+            cells, style = self._render_row(row)
+
+        text = "".join(
+            cell[:width].ljust(width + 1)
+            for cell, (_, width) in zip(cells, self.COLUMNS)
+        )
+        strip = Strip([Segment(text, style)])
+        return strip.crop(self.scroll_offset.x, self.scroll_offset.x + self.size.width)
+
+    def _render_row(self, row: int) -> Tuple[List[str], Style]:
+        rowid = self.rowids[row]
+        style = self.rich_style
+
+        if row == self.cursor_row:
+            style += self.get_component_rich_style("messages-table--cursor")
+
+        if (message := self.get_message(row)) is None:
+            placeholder = self.get_component_rich_style("messages-table--placeholder")
+            return [str(rowid), "..."], style + placeholder
+
+        time = message.timestamp[message.timestamp.find("T") + 1 :]
+        size = "" if message.size is None else format_bytes(message.size)
+        cells = [str(rowid), time, message.source, message.id, size, message.method]
+        return [cell or "" for cell in cells], style
+
     def _get_query_params(self):
         """Return the set of query parameters to use when populating the table."""
-        query: Dict[str, Any] = dict(max_row=self.max_row)
+        query: Dict[str, Any] = dict()
 
         if self.session is not None:
             query["session"] = self.session
 
+        if self.search is not None:
+            query["query"] = self.search
+
         return query
 
+    def set_search(self, search: Optional[MessageQuery]):
+        """Only show the messages matching the given search.
+
+        Parameters
+        ----------
+        search
+           The search to apply, if ``None`` all messages are shown.
+        """
+        self.search = search
+        self._generation += 1
+
+        self.rowids = array("q")
+        self.max_row = 0
+        self._pages.clear()
+        self._loading.clear()
+        self.virtual_size = Size(self.table_width, 1)
+        self.cursor_row = -1
+        self.refresh()
+
+        self._queried_row = 0
+        self.request_update()
+
+    def request_update(self, max_row: int = 0):
+        """Request that the table be updated with new messages.
+
+        Requests are coalesced so that the database is queried at most
+        ``refresh_rate`` times per second, no matter how often this is called.
+
+        Parameters
+        ----------
+        max_row
+           The largest row id in the database, if known. Used to skip the update if
+           the table has already seen all the rows up to it.
+        """
+        if max_row:
+            if max_row <= self._queried_row:
+                return
+
+            self._latest_row = max(self._latest_row, max_row)
+
+        if self._update_pending:
+            return
+
+        self._update_pending = True
+        delay = self._last_update + 1 / self.refresh_rate - time.monotonic()
+
+        if delay > 0:
+            self.set_timer(delay, self._run_update)
+        else:
+            self.call_later(self._run_update)
+
+    async def _run_update(self):
+        self._update_pending = False
+        self._last_update = time.monotonic()
+        self._queried_row = self._latest_row
+
+        await self.update()
+
     async def update(self):
         """Trigger a re-run of the query to pull in new data."""
+        generation = self._generation
+
+        rowids = await self.db.get_rowids(
+            **self._get_query_params(), max_row=self.max_row
+        )
+        if generation != self._generation:
+            return
+
+        # Drop any rows added by an update that finished while this one was running.
+        rowids = rowids[bisect_right(rowids, self.max_row) :]
+        if len(rowids) == 0:
+            return
+
+        # Any cached partial page at the end of the table is now out of date.
+        self._pages.pop((self.row_count - 1) // self.page_size, None)
+
+        self.rowids.extend(rowids)
+        self.max_row = rowids[-1]
+        self.virtual_size = Size(self.table_width, self.row_count + 1)
+
+        self.move_cursor(row=self.row_count - 1)
+        self.refresh()
+
+
+class FilterBar(Input):
+    """Used to search for messages, see :mod:`lsp_devtools.search` for the syntax.
+
+    The search is applied once the user stops typing for ``delay`` seconds, or
+    presses enter.
+    """
+
+    DEFAULT_CSS = """
+    FilterBar {
+        border-subtitle-color: $error;
+    }
+    """
+
+    class Search(Message):
+        """Sent when a new search should be applied."""
+
+        def __init__(self, search: Optional[MessageQuery]):
+            super().__init__()
+
+            self.search = search
+            """The search to apply, ``None`` if the filter bar is empty."""
+
+    def __init__(self, *args, delay: float = 0.3, **kwargs):
+        kwargs.setdefault("placeholder", "Filter, e.g. method:initialize type:request")
+        super().__init__(*args, **kwargs)
+
+        self.delay = delay
+        self._timer: Optional[Timer] = None
+
+    def on_input_changed(self, event: Input.Changed):
+        if self._timer is not None:
+            self._timer.stop()
 
-        query_params = self._get_query_params()
-        messages = await self.db.get_messages(**query_params)
-        for idx, message in messages:
-            self.max_row = idx
-            self.rpcdata[idx] = message
+        self._timer = self.set_timer(self.delay, self.apply)
 
-            time = message.timestamp[message.timestamp.find("T") + 1 :]
-            self.add_row(str(idx), time, message.source, message.id, message.method)
+    def on_input_submitted(self, event: Input.Submitted):
+        self.apply()
 
-        self.move_cursor(row=self.row_count, animate=True)
+    def apply(self):
+        """Parse the current value and, if valid, post a :class:`Search` message."""
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+
+        try:
+            search = parse_query(self.value) if self.value.strip() else None
+        except ValueError as exc:
+            self.add_class("-invalid")
+            self.border_subtitle = str(exc)
+            return
+
+        self.remove_class("-invalid")
+        self.border_subtitle = None
+        self.post_message(self.Search(search))
+
+
+class StatsPanel(Container):
+    """Shows latency statistics for each method, along with a sparkline of the mean
+    latency over time for the highlighted method."""
+
+    COLUMNS = [
+        ("method", "Method"),
+        ("count", "Count"),
+        ("p50", "p50 (ms)"),
+        ("p90", "p90 (ms)"),
+        ("p99", "p99 (ms)"),
+        ("max", "Max (ms)"),
+        ("in_flight", "In-flight"),
+    ]
+
+    TOTAL = ""
+    """The row key used for the statistics across all methods."""
+
+    def __init__(self, db: Database, *args, refresh_rate: float = 2.0, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.db = db
+        self.refresh_rate = refresh_rate
+        """The number of times per second to refresh the statistics, while visible."""
+
+        self.method = self.TOTAL
+        """The method shown in the sparkline."""
+
+    def compose(self) -> ComposeResult:
+        yield Sparkline([], summary_function=max)
+        yield DataTable(cursor_type="row")
+
+    def on_mount(self):
+        table = self.query_one(DataTable)
+        for key, label in self.COLUMNS:
+            table.add_column(label, key=key)
+
+        self.set_interval(1 / self.refresh_rate, self.update_stats)
+
+    def update_stats(self):
+        """Update the panel with the latest statistics."""
+        if self.has_class("-hidden"):
+            return
+
+        stats = self.db.stats
+        in_flight = self.db.in_flight()
+        table = self.query_one(DataTable)
+
+        rows: Dict[str, Optional[MethodStats]] = {
+            self.TOTAL: stats.total,
+            **stats.methods,
+        }
+        for method in in_flight:
+            rows.setdefault(method, None)
+
+        for method, method_stats in rows.items():
+            if method == self.TOTAL:
+                pending = sum(in_flight.values())
+                label = "(all)"
+            else:
+                pending = in_flight.get(method, 0)
+                label = method
+
+            if method_stats is None:
+                cells = [label, "0", "-", "-", "-", "-", str(pending)]
+            else:
+                latency = method_stats.latency
+                cells = [
+                    label,
+                    str(latency.count),
+                    *(_ms(latency.quantile(q)) for q in [0.5, 0.9, 0.99]),
+                    _ms(latency.max if latency.count else math.nan),
+                    str(pending),
+                ]
+
+            if method not in table.rows:
+                table.add_row(*cells, key=method)
+                continue
+
+            for (key, _), cell in zip(self.COLUMNS, cells):
+                table.update_cell(method, key, cell)
+
+        if (method_stats := rows.get(self.method)) is not None:
+            self.query_one(Sparkline).data = method_stats.timeline.values()
+
+    @on(DataTable.RowHighlighted)
+    def _on_row_highlighted(self, event: DataTable.RowHighlighted):
+        self.method = event.row_key.value or self.TOTAL
+        self.update_stats()
+
+
+def _ms(value: float) -> str:
+    return "-" if math.isnan(value) else f"{value:.1f}"
 
 
 class Sidebar(Container):
@@ -143,16 +742,27 @@ class LSPInspector(App):
     CSS_PATH = pathlib.Path(__file__).parent / "app.css"
     BINDINGS = [
         ("ctrl+b", "toggle_sidebar", "Sidebar"),
+        ("ctrl+t", "toggle_stats", "Stats"),
         ("ctrl+c", "quit", "Quit"),
         ("ctrl+s", "screenshot", "Take Screenshot"),
     ]
 
-    def __init__(self, db: Database, server: AgentServer, *args, **kwargs):
+    def __init__(
+        self,
+        db: Database,
+        server: AgentServer,
+        *args,
+        refresh_rate: float = 10.0,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
 
         self.db = db
         db.app = self
 
+        self.refresh_rate = refresh_rate
+        """The maximum number of times per second to refresh the messages table."""
+
         self.server = server
         """Server used to manage connections to lsp servers."""
 
@@ -162,8 +772,13 @@ class LSPInspector(App):
         yield Header()
 
         viewer = MessageViewer("")
-        messages = MessagesTable(self.db, viewer)
-        yield Container(ScrollableContainer(messages), Sidebar(viewer))
+        messages = MessagesTable(self.db, viewer, refresh_rate=self.refresh_rate)
+        yield Container(
+            FilterBar(),
+            messages,
+            StatsPanel(self.db, classes="-hidden"),
+            Sidebar(viewer),
+        )
         yield Footer()
 
     def action_screenshot(self):
@@ -181,6 +796,11 @@ class LSPInspector(App):
                 self.screen.set_focus(None)
             sidebar.add_class("-hidden")
 
+    def action_toggle_stats(self) -> None:
+        panel = self.query_one(StatsPanel)
+        panel.toggle_class("-hidden")
+        panel.update_stats()
+
     async def on_ready(self, event: Ready):
         self._async_tasks.append(
             asyncio.create_task(self.server.start_tcp("localhost", 8765))
@@ -189,9 +809,14 @@ class LSPInspector(App):
         await table.update()
 
     @on(Database.Update)
-    async def update_table(self, event: Database.Update):
+    def update_table(self, event: Database.Update):
         table = self.query_one(MessagesTable)
-        await table.update()
+        table.request_update(event.max_row)
+
+    @on(FilterBar.Search)
+    def search_table(self, event: FilterBar.Search):
+        table = self.query_one(MessagesTable)
+        table.set_search(event.search)
 
     async def action_quit(self):
         self.server.stop()
@@ -203,23 +828,24 @@ async def handle_message(db: Database, data: bytes):
     """Handle messages received from the connected lsp server."""
 
     try:
-        rpc = parse_rpc_message(data)
-    except ValueError:
+        headers, start = parse_rpc_headers(data)
+        db.queue_raw_message(
+            headers["Message-Session"],
+            headers["Message-Timestamp"],
+            headers["Message-Source"],
+            data[start:],
+            header_size=message_sizes(headers)[1],
+        )
+    except (KeyError, ValueError):
         # TODO: error reporting
         return
 
-    session = rpc["Message-Session"]
-    timestamp = rpc["Message-Timestamp"]
-    source = rpc["Message-Source"]
-
-    await db.add_message(session, timestamp, source, rpc.body)
-
 
 def inspector(args, extra: List[str]):
-    db = Database(args.dbpath)
+    db = Database(args.dbpath, storage=args.storage)
     server = AgentServer(handler=partial(handle_message, db))
 
-    app = LSPInspector(db, server)
+    app = LSPInspector(db, server, refresh_rate=args.refresh_rate)
     app.run()
 
 
@@ -244,6 +870,20 @@ manipulate an LSP session interactively.
         default=default_db,
         help="the database path to use",
     )
+    cmd.add_argument(
+        "--storage",
+        choices=STORAGE_MODES,
+        default="columns",
+        help="how to store new messages in the database. (default: %(default)s)",
+    )
+    cmd.add_argument(
+        "--refresh-rate",
+        type=float,
+        metavar="FPS",
+        default=10.0,
+        help="the maximum number of times per second to refresh the messages table. "
+        "(default: %(default)s)",
+    )
 
     connect = cmd.add_argument_group(
         title="connection options",
@@ -1,6 +1,5 @@
 import argparse
 import asyncio
-import json
 import logging
 import pathlib
 from functools import partial
@@ -13,9 +12,14 @@ from rich.console import ConsoleRenderable
 from rich.logging import RichHandler
 from rich.traceback import Traceback
 
+from lsp_devtools import codec
 from lsp_devtools.agent import AgentServer
-from lsp_devtools.agent import parse_rpc_message
+from lsp_devtools.agent import parse_rpc_headers
+from lsp_devtools.codec import peek_message
+from lsp_devtools.handlers import message_sizes
+from lsp_devtools.handlers.sql import STORAGE_MODES
 from lsp_devtools.handlers.sql import SqlHandler
+from lsp_devtools.search import parse_size
 
 from .filters import LSPFilter
 from .visualize import SpinnerHandler
@@ -60,7 +64,7 @@ class RichLSPHandler(RichHandler):
     def format(self, record: LogRecord) -> str:
         # Pretty print json messages
         if isinstance(record.args, dict):
-            record.args = (json.dumps(record.args, indent=2),)
+            record.args = (codec.dumps(record.args, indent=2),)
         return super().format(record)
 
 
@@ -78,39 +82,42 @@ def setup_logging(logger: logging.Logger, console: Console):
     logger.addHandler(handler)
 
 
-def setup_stdout_output(args, logger: logging.Logger, console: Console):
+def setup_stdout_output(args, logger: logging.Logger, console: Console) -> LSPFilter:
     """Log messages to stdout."""
 
     handler = RichLSPHandler(level=logging.INFO, console=console)
-    handler.addFilter(
-        LSPFilter(
-            message_source=args.message_source,
-            include_message_types=args.include_message_types,
-            exclude_message_types=args.exclude_message_types,
-            include_methods=args.include_methods,
-            exclude_methods=args.exclude_methods,
-            formatter=args.format_message or "{.|json}",
-        )
+    lsp_filter = LSPFilter(
+        message_source=args.message_source,
+        include_message_types=args.include_message_types,
+        exclude_message_types=args.exclude_message_types,
+        include_methods=args.include_methods,
+        exclude_methods=args.exclude_methods,
+        min_size=args.min_size,
+        formatter=args.format_message or "{.|json}",
     )
+    handler.addFilter(lsp_filter)
 
     logger.addHandler(handler)
     logger.propagate = False
+    return lsp_filter
 
 
-def setup_file_output(args, logger: logging.Logger, console: Optional[Console] = None):
+def setup_file_output(
+    args, logger: logging.Logger, console: Optional[Console] = None
+) -> LSPFilter:
     """Log messages to a file."""
     handler = logging.FileHandler(filename=str(args.to_file))
     handler.setLevel(logging.INFO)
-    handler.addFilter(
-        LSPFilter(
-            message_source=args.message_source,
-            include_message_types=args.include_message_types,
-            exclude_message_types=args.exclude_message_types,
-            include_methods=args.include_methods,
-            exclude_methods=args.exclude_methods,
-            formatter=args.format_message or "{.|json-compact}",
-        )
+    lsp_filter = LSPFilter(
+        message_source=args.message_source,
+        include_message_types=args.include_message_types,
+        exclude_message_types=args.exclude_message_types,
+        include_methods=args.include_methods,
+        exclude_methods=args.exclude_methods,
+        min_size=args.min_size,
+        formatter=args.format_message or "{.|json-compact}",
     )
+    handler.addFilter(lsp_filter)
 
     if console:
         spinner = SpinnerHandler(console)
@@ -120,23 +127,24 @@ def setup_file_output(args, logger: logging.Logger, console: Optional[Console] =
     # This must come last!
     logger.addHandler(handler)
     logger.propagate = False
+    return lsp_filter
 
 
 def setup_sqlite_output(
     args, logger: logging.Logger, console: Optional[Console] = None
-):
+) -> LSPFilter:
     """Log messages to SQLite."""
-    handler = SqlHandler(args.to_sqlite)
+    handler = SqlHandler(args.to_sqlite, storage=args.sqlite_storage)
     handler.setLevel(logging.INFO)
-    handler.addFilter(
-        LSPFilter(
-            message_source=args.message_source,
-            include_message_types=args.include_message_types,
-            exclude_message_types=args.exclude_message_types,
-            include_methods=args.include_methods,
-            exclude_methods=args.exclude_methods,
-        )
+    lsp_filter = LSPFilter(
+        message_source=args.message_source,
+        include_message_types=args.include_message_types,
+        exclude_message_types=args.exclude_message_types,
+        include_methods=args.include_methods,
+        exclude_methods=args.exclude_methods,
+        min_size=args.min_size,
     )
+    handler.addFilter(lsp_filter)
 
     if console:
         spinner = SpinnerHandler(console)
@@ -146,16 +154,35 @@ def setup_sqlite_output(
     # This must come last!
     logger.addHandler(handler)
     logger.propagate = False
+    return lsp_filter
 
 
-def log_message(logger: logging.Logger, message: bytes):
+def log_message(
+    logger: logging.Logger, message: bytes, prefilter: Optional[LSPFilter] = None
+):
+    """Log the given message.
+
+    If given, the ``prefilter`` is used to skip decoding any messages that it would
+    exclude.
+    """
     try:
-        rpc = parse_rpc_message(message)
-    except ValueError:
+        headers, start = parse_rpc_headers(message)
+
+        if prefilter is not None and not prefilter.prefilter(
+            headers["Message-Source"],
+            peek_message(message, start),
+            message_sizes(headers)[0],
+        ):
+            return
+
+        body = codec.loads(message[start:])
+    except (KeyError, ValueError):
         # TODO: report the error.
         return
 
-    logger.info("%s", rpc.body, extra=rpc.headers)
+    # Also pass along the body as received, so it can be stored without re-encoding.
+    extra = {**headers, "Message-Body": memoryview(message)[start:]}
+    logger.info("%s", body, extra=extra)
 
 
 def start_recording(args, extra: List[str]):
@@ -164,20 +191,20 @@ def start_recording(args, extra: List[str]):
     rpc_logger = logging.getLogger(__name__)
     rpc_logger.setLevel(logging.INFO)
 
-    handler = partial(log_message, rpc_logger)
-    server = AgentServer(logger=logger, handler=handler)
-
     console = Console(record=args.save_output is not None)
     setup_logging(logger, console)
 
     if args.to_file:
-        setup_file_output(args, rpc_logger, console)
+        lsp_filter = setup_file_output(args, rpc_logger, console)
 
     elif args.to_sqlite:
-        setup_sqlite_output(args, rpc_logger, console)
+        lsp_filter = setup_sqlite_output(args, rpc_logger, console)
 
     else:
-        setup_stdout_output(args, rpc_logger, console)
+        lsp_filter = setup_stdout_output(args, rpc_logger, console)
+
+    handler = partial(log_message, rpc_logger, prefilter=lsp_filter)
+    server = AgentServer(logger=logger, handler=handler)
 
     try:
         host = args.host
@@ -189,6 +216,10 @@ def start_recording(args, extra: List[str]):
         pass
     except KeyboardInterrupt:
         server.stop()
+    finally:
+        # Ensure any buffered messages are written out.
+        for log_handler in rpc_logger.handlers:
+            log_handler.close()
 
     if console is not None:
         console.show_cursor(True)
@@ -252,6 +283,13 @@ def setup_filter_args(cmd: argparse.ArgumentParser):
         metavar="METHOD",
         help="omit messages for the given method(s)",
     )
+    filter_.add_argument(
+        "--min-size",
+        default=None,
+        type=parse_size,
+        metavar="SIZE",
+        help="only include messages with a body of at least the given size e.g. 10k",
+    )
 
 
 def cli(commands: argparse._SubParsersAction):
@@ -327,6 +365,15 @@ default) and push messages to it and have them be recorded.
         type=pathlib.Path,
         help="save messages to a SQLite DB",
     )
+    output.add_argument(
+        "--sqlite-storage",
+        choices=STORAGE_MODES,
+        default="columns",
+        help=(
+            "how messages are stored in the SQLite DB, 'raw' and 'compressed' store "
+            "the message body exactly as it was received. (default: %(default)s)"
+        ),
+    )
     output.add_argument(
         "--save-output",
         default=None,
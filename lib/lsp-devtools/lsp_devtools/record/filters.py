@@ -1,11 +1,19 @@
 import logging
+from typing import Any
 from typing import Dict
 from typing import Literal
+from typing import Optional
 from typing import Set
-from typing import Union
 
 import attrs
 
+from lsp_devtools.codec import MessagePeek
+from lsp_devtools.handlers import OTHER_SOURCE
+from lsp_devtools.handlers import PendingRequests
+from lsp_devtools.handlers import get_message_type
+from lsp_devtools.handlers import message_matches_type
+from lsp_devtools.handlers import message_sizes
+
 from .formatters import FormatString
 
 logger = logging.getLogger(__name__)
@@ -33,14 +41,83 @@ class LSPFilter(logging.Filter):
     exclude_methods: Set[str] = attrs.field(factory=set, converter=set)
     """Exclude messages associated with the given method."""
 
+    min_size: Optional[int] = attrs.field(default=None)
+    """Only include messages whose body is at least the given number of bytes.
+
+    Messages of unknown size are always included."""
+
     formatter: FormatString = attrs.field(
         default="",
         converter=FormatString,
     )  # type: ignore
     """Format messages according to the given string"""
 
-    _response_method_map: Dict[Union[int, str], str] = attrs.field(factory=dict)
-    """Used to determine the method for response messages"""
+    max_pending_requests: int = attrs.field(default=10_000)
+    """The maximum number of unanswered requests to keep track of."""
+
+    pending_request_ttl: Optional[float] = attrs.field(default=3600.0)
+    """How long (in seconds) to wait for a response to a request."""
+
+    _response_method_map: PendingRequests[str] = attrs.field(init=False)
+    """Used to determine the method for response messages, keyed by the source and
+    id of the request."""
+
+    @_response_method_map.default
+    def _response_method_map_default(self) -> PendingRequests[str]:
+        return PendingRequests(
+            maxsize=self.max_pending_requests, ttl=self.pending_request_ttl
+        )
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Statistics on the requests currently waiting for a response."""
+        return {
+            "pending": len(self._response_method_map),
+            "evictions": self._response_method_map.evictions,
+        }
+
+    def prefilter(
+        self, source: str, message: MessagePeek, size: Optional[int] = None
+    ) -> bool:
+        """Determine if a message could pass the filter, based on the fields that
+        could be extracted without decoding the full message.
+
+        Returns ``False`` only if the message will definitely be filtered out.
+
+        Parameters
+        ----------
+        source
+           The source of the message
+
+        message
+           The fields extracted from the message
+
+        size
+           The size of the message body, if known
+        """
+        if (message_type := message.message_type) is None:
+            return True
+
+        fields = message.fields
+        if message_type in {"request", "notification"}:
+            message_method = fields["method"]
+        else:
+            message_method = self._response_method_map.get(
+                (OTHER_SOURCE.get(source), fields["id"])
+            )
+
+        if self.message_source in {"both", source} and not self._is_excluded(
+            message_type, message_method, size
+        ):
+            return True
+
+        # Since the message will not reach `filter`, update the method map here.
+        if message_type == "request":
+            self._response_method_map.add((source, fields["id"]), message_method)
+        elif message_type != "notification":
+            self._response_method_map.pop((OTHER_SOURCE.get(source), fields["id"]))
+
+        return False
 
     def filter(self, record: logging.LogRecord) -> bool:
         message = record.args
@@ -48,31 +125,20 @@ class LSPFilter(logging.Filter):
             return False
 
         source = record.__dict__["Message-Source"]
+        size, header_size = message_sizes(record.__dict__)
         message_type = get_message_type(message)
-        message_method = self._get_message_method(message_type, message)
+        message_method = self._get_message_method(source, message_type, message)
 
         if self.message_source not in {"both", source}:
             return False
 
-        if self.include_message_types and not message_matches_type(
-            message_type, self.include_message_types
-        ):
-            return False
-
-        if self.exclude_message_types and message_matches_type(
-            message_type, self.exclude_message_types
-        ):
-            return False
-
-        if self.include_methods and message_method not in self.include_methods:
-            return False
-
-        if self.exclude_methods and message_method in self.exclude_methods:
+        if self._is_excluded(message_type, message_method, size):
             return False
 
         if self.formatter.pattern:
             try:
-                record.msg = self.formatter.format(message)
+                metadata = _get_metadata(size, header_size)
+                record.msg = self.formatter.format(message, metadata)
                 record.args = None
             except Exception:
                 logger.debug(
@@ -82,38 +148,60 @@ class LSPFilter(logging.Filter):
 
         return True
 
-    def _get_message_method(self, message_type: str, message: dict) -> str:
+    def _is_excluded(
+        self,
+        message_type: str,
+        message_method: Optional[str],
+        size: Optional[int] = None,
+    ) -> bool:
+        """Determine if the given message type, method and size are excluded."""
+
+        if self.min_size is not None and size is not None and size < self.min_size:
+            return True
+
+        if self.include_message_types and not message_matches_type(
+            message_type, self.include_message_types
+        ):
+            return True
+
+        if self.exclude_message_types and message_matches_type(
+            message_type, self.exclude_message_types
+        ):
+            return True
+
+        if self.include_methods and message_method not in self.include_methods:
+            return True
+
+        return bool(self.exclude_methods) and message_method in self.exclude_methods
+
+    def _get_message_method(
+        self, source: str, message_type: str, message: dict
+    ) -> Optional[str]:
+        # Both client and server send requests, each with their own ids.
         if message_type == "request":
             method = message["method"]
-            self._response_method_map[message["id"]] = method
+            self._response_method_map.add((source, message["id"]), method)
 
             return method
 
         if message_type == "notification":
             return message["method"]
 
-        return self._response_method_map[message["id"]]
+        return self._response_method_map.pop((OTHER_SOURCE.get(source), message["id"]))
 
 
-def message_matches_type(message_type: str, types: Set[MessageType]) -> bool:
-    """Determine if the type of message is included in the given set of types"""
+def _get_metadata(size: Optional[int], header_size: Optional[int]) -> Dict[str, Any]:
+    """Return the metadata that can be included in formatted messages, omitting any
+    values that are unknown."""
+    metadata: Dict[str, Any] = {}
 
-    if message_type == "result":
-        return len({"result", "response"} & types) > 0
+    if size is not None:
+        metadata["size"] = size
 
-    if message_type == "error":
-        return len({"error", "response"} & types) > 0
+    if header_size is not None:
+        metadata["header_size"] = header_size
 
-    return message_type in types
+        if size is not None:
+            metadata["wire_size"] = size + header_size
 
-
-def get_message_type(message: dict) -> str:
-    if "id" in message:
-        if "error" in message:
-            return "error"
-        elif "method" in message:
-            return "request"
-        else:
-            return "result"
-    else:
-        return "notification"
+    return metadata
@@ -5,6 +5,7 @@ from typing import Any
 from typing import Callable
 from typing import Dict
 from typing import List
+from typing import Mapping
 from typing import Optional
 from typing import Tuple
 from typing import Union
@@ -26,6 +27,19 @@ def format_json(obj: dict, *, indent: Union[str, int, None] = 2) -> str:
     return json.dumps(obj, indent=indent)
 
 
+def format_bytes(size: float) -> str:
+    """Format the given number of bytes in a human readable form e.g. ``1.5KiB``."""
+    if size < 1024:
+        return f"{size:.0f}B"
+
+    for unit in ["KiB", "MiB"]:
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+
+    return f"{size / 1024:.1f}GiB"
+
+
 def format_position(position: dict) -> str:
     return f"{position['line']}:{position['character']}"
 
@@ -35,6 +49,7 @@ def format_range(range_: dict) -> str:
 
 
 FORMATTERS: Dict[str, Callable[[Any], str]] = {
+    "bytes": format_bytes,
     "position": format_position,
     "range": format_range,
     "json": format_json,
@@ -62,7 +77,14 @@ def get_formatter(fmt: str) -> Callable[[Any], str]:
 
 
 class Value:
-    """Represents a value to be inserted into a string."""
+    """Represents a value to be inserted into a string.
+
+    The accessor is compiled into a chain of functions when the value is created, so
+    that formatting a message only involves the necessary lookups.
+
+    Accessors starting with ``$`` (e.g. ``$size``) select fields from the metadata
+    recorded alongside the message, rather than the message itself.
+    """
 
     LIST_FIELD = re.compile(r"(.*)\[(.*)?\]")
 
@@ -70,43 +92,41 @@ class Value:
         self.accessor = accessor
         self.formatter = formatter
 
+        self.metadata = accessor.startswith("$")
+        """If ``True``, the value is selected from the message's metadata."""
+
+        fields = accessor[1:] if self.metadata else accessor
+        self.format: Callable[[Any], str] = self._compile(fields.split("."))
+        """Convert a message to a string according to the accessor and formatter."""
+
     def __repr__(self):
         return f'Value(accessor="{self.accessor}", formatter={self.formatter})'
 
-    def format(self, message: dict, accessor: Optional[str] = None) -> str:
-        """Convert a message to a string according to the current accessor and
-        formatter."""
-
-        idx = 0
-        obj = message
-        accessor = self.accessor if accessor is None else accessor
+    def _compile(self, fields: List[str]) -> Callable[[Any], str]:
+        """Compile the given accessor fields into a function that can be called with
+        a message."""
+        keys: List[Union[str, int]] = []
 
-        for field in accessor.split("."):
+        for idx, field in enumerate(fields):
             if not field:
                 continue
 
-            # TODO: Once we have a better idea on what we want the list syntax to be,
-            # most of this should be move into the format string parsing code, so that
-            # it only runs once.
-            idx += len(field)
             match = self.LIST_FIELD.fullmatch(field)
-            if match:
-                obj = obj[match.group(1)]
-                remainder = accessor[idx + 1 :]
-                sep, index = get_separator_index(match.group(2))
-
-                if isinstance(index, int):
-                    obj = obj[index]
-                    continue
+            if match is None:
+                keys.append(field)
+                continue
 
-                if isinstance(index, slice):
-                    obj = obj[index]
+            keys.append(match.group(1))
+            sep, index = get_separator_index(match.group(2))
 
-                return sep.join([self.format(o, remainder) for o in obj])
+            if isinstance(index, int):
+                keys.append(index)
+                continue
 
-            obj = obj[field]
+            item_fn = self._compile(fields[idx + 1 :])
+            return lookup(keys, join_items(sep, index, item_fn))
 
-        return self.formatter(obj)
+        return lookup(keys, self.formatter)
 
 
 @cache
@@ -151,6 +171,44 @@ def get_index(idx: str) -> Union[int, slice, None]:
     return None
 
 
+def lookup(
+    keys: List[Union[str, int]], next_fn: Callable[[Any], str]
+) -> Callable[[Any], str]:
+    """Return a function that looks up the given keys in an object, before passing
+    the result onto ``next_fn``."""
+    if len(keys) == 0:
+        return next_fn
+
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda obj: next_fn(obj[key])
+
+    keys = list(keys)
+
+    def fn(obj: Any) -> str:
+        for key in keys:
+            obj = obj[key]
+
+        return next_fn(obj)
+
+    return fn
+
+
+def join_items(
+    sep: str, index: Optional[slice], item_fn: Callable[[Any], str]
+) -> Callable[[Any], str]:
+    """Return a function that formats each item in a list, joining the results with
+    the given separator."""
+
+    def fn(obj: Any) -> str:
+        if index is not None:
+            obj = obj[index]
+
+        return sep.join([item_fn(item) for item in obj])
+
+    return fn
+
+
 class FormatString:
     """Implements the format string syntax.
 
@@ -185,5 +243,39 @@ class FormatString:
         parts.append(self.pattern[idx:])
         self.parts = parts
 
-    def format(self, message: dict) -> str:
-        return "".join([p.format(message) for p in self.parts])
+        # Literal text only has to be unescaped once.
+        literals = [
+            p.replace("{{", "{").replace("}}", "}").replace("%", "%%")
+            for p in parts
+            if isinstance(p, str)
+        ]
+        self._template = "%s".join(literals)
+
+        values = [p for p in parts if isinstance(p, Value)]
+        self._values = tuple(v.format for v in values)
+        self._metadata = tuple(v.metadata for v in values)
+        self._uses_metadata = any(self._metadata)
+
+    def format(
+        self, message: dict, metadata: Optional[Mapping[str, Any]] = None
+    ) -> str:
+        """Format the given message.
+
+        Parameters
+        ----------
+        message
+           The message to format
+
+        metadata
+           The metadata recorded alongside the message, used by any ``$`` accessors.
+        """
+        if not self._uses_metadata:
+            return self._template % tuple([fn(message) for fn in self._values])
+
+        metadata = metadata or {}
+        return self._template % tuple(
+            [
+                fn(metadata if from_metadata else message)
+                for fn, from_metadata in zip(self._values, self._metadata)
+            ]
+        )
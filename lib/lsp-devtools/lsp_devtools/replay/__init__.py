@@ -0,0 +1,202 @@
+"""Replay a recorded session against a language server."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import pathlib
+import sys
+import typing
+
+from rich.console import Console
+from rich.table import Table
+
+from lsp_devtools import codec
+
+from .recording import Recording
+from .recording import load_recording
+from .replayer import Replayer
+from .replayer import ReplayReport
+from .replayer import plan_replay
+
+if typing.TYPE_CHECKING:
+    from typing import Any
+    from typing import Dict
+    from typing import List
+    from typing import Optional
+
+__all__ = [
+    "Recording",
+    "ReplayReport",
+    "Replayer",
+    "load_recording",
+    "plan_replay",
+]
+
+
+def parse_speed(value: str) -> float:
+    """Parse a replay speed e.g. ``1``, ``10x`` or ``max``."""
+    value = value.strip().lower()
+    if value in {"max", "inf"}:
+        return math.inf
+
+    try:
+        speed = float(value[:-1] if value.endswith("x") else value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid speed: {value!r}") from None
+
+    if speed <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid speed: {value!r}")
+
+    return speed
+
+
+def print_report(console: Console, report: Dict[str, Any]):
+    """Print the given report, as returned by :meth:`ReplayReport.to_dict`, as a
+    table."""
+    rows = [*report["methods"], dict(report["total"], method="(all)")]
+
+    table = Table(title="Latency (ms)", title_justify="left")
+    table.add_column("Method", no_wrap=True)
+    for column in ["Req", "Err", "Miss"]:
+        table.add_column(column, justify="right")
+
+    for quantile in ["p50", "p90"]:
+        for column in ["Orig", "Replay", "Δ%"]:
+            table.add_column(f"{quantile} {column}", justify="right")
+
+    for row in rows:
+        cells = [str(row[k]) for k in ["requests", "errors", "missing"]]
+        for quantile in ["p50", "p90"]:
+            values = row[quantile]
+            cells.extend(
+                [
+                    _format(values["original_ms"], ".1f"),
+                    _format(values["replay_ms"], ".1f"),
+                    _format(values["change_pct"], "+.0f"),
+                ]
+            )
+
+        table.add_row(row["method"], *cells, end_section=row is rows[-2])
+
+    console.print(table)
+
+
+def _format(value: Optional[float], spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def replay(args, extra: List[str]):
+    if extra is None:
+        print("Missing server start command", file=sys.stderr)
+        return 1
+
+    path: pathlib.Path = args.capture
+    if not path.is_file():
+        print(f"No such file: {path}", file=sys.stderr)
+        return 1
+
+    try:
+        recording = load_recording(
+            path, session=args.session, input_format=args.input_format
+        )
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    speed = args.speed
+    if not recording.has_timing and math.isfinite(speed):
+        print(
+            "The capture does not record when messages were sent, "
+            "replaying as fast as possible",
+            file=sys.stderr,
+        )
+        speed = math.inf
+
+    replayer = Replayer(recording, extra, speed=speed, timeout=args.timeout)
+    report = asyncio.run(replayer.run())
+
+    if args.format == "json":
+        print(codec.dumps(report.to_dict(), indent=2))
+    else:
+        print_report(Console(), report.to_dict())
+
+    if args.max_regression is None:
+        return 0
+
+    if regressions := report.regressions(args.max_regression):
+        methods = ", ".join(r.method for r in regressions)
+        print(
+            f"Median latency increased by more than {args.max_regression}%: {methods}",
+            file=sys.stderr,
+        )
+        return 1
+
+    return 0
+
+
+def cli(commands: argparse._SubParsersAction):
+    cmd: argparse.ArgumentParser = commands.add_parser(
+        "replay",
+        help="replay a captured session against a server",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""\
+Replay a session captured with 'lsp-devtools record' against a language server,
+reporting how the server's response times compare with the original.
+
+The server is started with the command given after a `--`, for example:
+
+    lsp-devtools replay session.db -- python -m esbonio
+
+Messages sent by the client are sent to the server with their original timing,
+optionally accelerated, and only once the server has responded to the requests it
+had responded to when the message was originally sent. Request ids are rewritten
+and any requests sent by the server are answered with the client's recorded
+replies.
+
+JSONL captures do not record when each message was sent, so they are always
+replayed as fast as possible and no latency comparison is available.
+""",
+    )
+    cmd.add_argument("capture", type=pathlib.Path, help="the capture to replay")
+    cmd.add_argument(
+        "--input-format",
+        choices=["auto", "sqlite", "jsonl"],
+        default="auto",
+        help="the format of the capture. (default: %(default)s)",
+    )
+    cmd.add_argument(
+        "--session",
+        default=None,
+        help="the session to replay, required if the capture contains more than one",
+    )
+    cmd.add_argument(
+        "--speed",
+        type=parse_speed,
+        default=1.0,
+        help="how much faster than the original to send messages, e.g. '1', '10x' or "
+        "'max' to send them as fast as possible. (default: 1)",
+    )
+    cmd.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help="how long to wait for the server to respond, in seconds. "
+        "(default: %(default)s)",
+    )
+    cmd.add_argument(
+        "--format",
+        choices=["table", "json"],
+        default="table",
+        help="how to output the report. (default: %(default)s)",
+    )
+    cmd.add_argument(
+        "--max-regression",
+        type=float,
+        default=None,
+        metavar="PCT",
+        help="exit with a non-zero status if the median latency of any method "
+        "increases by more than the given percentage",
+    )
+    cmd.set_defaults(run=replay)
@@ -0,0 +1,271 @@
+"""Loading recorded sessions, so that they can be replayed."""
+
+from __future__ import annotations
+
+import sqlite3
+import typing
+from contextlib import closing
+
+import attrs
+from lsprotocol.types import METHOD_TO_TYPES
+
+from lsp_devtools import codec
+from lsp_devtools.handlers import OTHER_SOURCE
+from lsp_devtools.handlers import PendingRequests
+from lsp_devtools.handlers import decode_body
+from lsp_devtools.handlers import get_message_type
+from lsp_devtools.stats import is_sqlite
+from lsp_devtools.stats.capture import as_seconds
+from lsp_devtools.stats.capture import row_message_type
+
+if typing.TYPE_CHECKING:
+    import pathlib
+    from typing import Any
+    from typing import Dict
+    from typing import List
+    from typing import Optional
+
+    from lsp_devtools.handlers import MessageSource
+
+
+SERVER_METHODS = {
+    "$/logTrace",
+    "$/progress",
+    "client/registerCapability",
+    "client/unregisterCapability",
+    "telemetry/event",
+    "textDocument/publishDiagnostics",
+    "window/logMessage",
+    "window/showDocument",
+    "window/showMessage",
+    "window/showMessageRequest",
+    "window/workDoneProgress/create",
+    "workspace/applyEdit",
+    "workspace/codeLens/refresh",
+    "workspace/configuration",
+    "workspace/diagnostic/refresh",
+    "workspace/foldingRange/refresh",
+    "workspace/inlayHint/refresh",
+    "workspace/inlineValue/refresh",
+    "workspace/semanticTokens/refresh",
+    "workspace/workspaceFolders",
+}
+"""Methods sent from the server to the client, used to determine the source of
+messages in captures that do not record it."""
+
+
+@attrs.define
+class RecordedMessage:
+    """A message in a recorded session."""
+
+    source: MessageSource
+    """Who sent the message."""
+
+    message: Dict[str, Any]
+    """The message itself."""
+
+    timestamp: Optional[float] = attrs.field(default=None)
+    """When the message was sent (in seconds), if known."""
+
+    @property
+    def message_type(self) -> str:
+        return get_message_type(self.message)
+
+
+@attrs.define
+class Recording:
+    """A recorded session, with its messages in the order they were sent."""
+
+    messages: List[RecordedMessage] = attrs.field(factory=list)
+
+    session: Optional[str] = attrs.field(default=None)
+    """The id of the recorded session, if known."""
+
+    @property
+    def has_timing(self) -> bool:
+        """Indicates if the time each message was sent is known."""
+        return len(self.messages) > 0 and all(
+            m.timestamp is not None for m in self.messages
+        )
+
+
+def list_sessions(path: pathlib.Path) -> List[str]:
+    """Return the ids of the sessions in the given database, oldest first."""
+    with closing(_connect(path)) as conn:
+        rows = conn.execute(
+            "SELECT session FROM protocol GROUP BY session ORDER BY min(rowid)"
+        ).fetchall()
+
+    return [session for (session,) in rows]
+
+
+def load_sqlite(path: pathlib.Path, session: Optional[str] = None) -> Recording:
+    """Load a session from a database written by lsp-devtools.
+
+    Parameters
+    ----------
+    path
+       The database to load the session from
+
+    session
+       The session to load, may be omitted if the database contains a single
+       session.
+
+    Raises
+    ------
+    ValueError
+       If the session is not specified and cannot be determined.
+    """
+    if session is None:
+        sessions = list_sessions(path)
+        if len(sessions) != 1:
+            raise ValueError(
+                f"{path} contains {len(sessions)} sessions, please choose one of: "
+                + ", ".join(sessions)
+            )
+
+        session = sessions[0]
+
+    recording = Recording(session=session)
+
+    with closing(_connect(path)) as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(protocol)")}
+
+        def column(name: str) -> str:
+            return name if name in columns else f"NULL AS {name}"
+
+        sql = " ".join(
+            [
+                "SELECT timestamp, source, id, method, params, result, error,",
+                ", ".join(
+                    column(name)
+                    for name in [
+                        "body",
+                        "body_encoding",
+                        "message_type",
+                        "request_rowid",
+                    ]
+                ),
+                "FROM protocol WHERE session = ? ORDER BY rowid",
+            ]
+        )
+
+        for row in conn.execute(sql, (session,)):
+            timestamp, source, *fields = row
+            recording.messages.append(
+                RecordedMessage(
+                    source=source,
+                    message=_row_message(*fields),
+                    timestamp=as_seconds(timestamp),
+                )
+            )
+
+    return recording
+
+
+def load_jsonl(path: pathlib.Path) -> Recording:
+    """Load a session from a file written by ``lsp-devtools record --to-file``.
+
+    Such files only contain the messages themselves, so the source of each message is
+    inferred from its method and no timing information is available.
+    """
+    recording = Recording()
+    pending: PendingRequests[MessageSource] = PendingRequests()
+
+    with path.open("rb") as f:
+        for line in f:
+            if not (line := line.strip()):
+                continue
+
+            message = codec.loads(line)
+            if not isinstance(message, dict):
+                continue
+
+            message_type = get_message_type(message)
+            if message_type in {"request", "notification"}:
+                source: MessageSource = (
+                    "server" if message["method"] in SERVER_METHODS else "client"
+                )
+                if message_type == "request":
+                    pending.add(message["id"], source)
+
+            else:
+                request_source = pending.pop(message["id"]) or "client"
+                source = OTHER_SOURCE[request_source]
+
+            recording.messages.append(RecordedMessage(source, message))
+
+    return recording
+
+
+def load_recording(
+    path: pathlib.Path, session: Optional[str] = None, input_format: str = "auto"
+) -> Recording:
+    """Load a recorded session from the given SQLite database or JSONL file."""
+    if input_format == "auto":
+        input_format = "sqlite" if is_sqlite(path) else "jsonl"
+
+    if input_format == "sqlite":
+        return load_sqlite(path, session=session)
+
+    return load_jsonl(path)
+
+
+def _connect(path: pathlib.Path) -> sqlite3.Connection:
+    """Open the given database, read-only."""
+    return sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+
+
+def _row_message(
+    msg_id: Optional[str],
+    method: Optional[str],
+    params: Optional[str],
+    result: Optional[str],
+    error: Optional[str],
+    body: Optional[Any],
+    body_encoding: Optional[str],
+    message_type: Optional[str],
+    request_rowid: Optional[int],
+) -> Dict[str, Any]:
+    """Reconstruct a message from its row in the database."""
+    if body is not None:
+        return decode_body(body, body_encoding)
+
+    if message_type is None:
+        message_type = row_message_type(
+            msg_id, method, error is not None, request_rowid
+        )
+
+    message: Dict[str, Any] = {"jsonrpc": "2.0"}
+    if msg_id is not None:
+        message["id"] = _as_id(msg_id)
+
+    if message_type == "result":
+        message["result"] = None if result is None else codec.loads(result)
+        return message
+
+    if message_type == "error":
+        message["error"] = None if error is None else codec.loads(error)
+        return message
+
+    message["method"] = method
+    if params is not None:
+        message["params"] = codec.loads(params)
+
+    # Empty params are not stored, restore them where they are required.
+    elif (
+        method is not None
+        and (types := METHOD_TO_TYPES.get(method)) is not None
+        and types[2] is not None
+    ):
+        message["params"] = {}
+
+    return message
+
+
+def _as_id(msg_id: Any) -> Any:
+    """Message ids are stored as text, restore any that were numbers."""
+    if isinstance(msg_id, str) and msg_id.isdigit():
+        return int(msg_id)
+
+    return msg_id
@@ -0,0 +1,464 @@
+"""Replaying recorded sessions against a language server."""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import math
+import os
+import subprocess
+import time
+import typing
+from collections import deque
+from contextlib import suppress
+
+import attrs
+
+from lsp_devtools import codec
+from lsp_devtools.agent import parse_rpc_headers
+from lsp_devtools.agent.agent import aio_readline
+from lsp_devtools.handlers import get_message_type
+from lsp_devtools.stats import Histogram
+
+if typing.TYPE_CHECKING:
+    from typing import Any
+    from typing import Deque
+    from typing import Dict
+    from typing import Iterable
+    from typing import List
+    from typing import Optional
+    from typing import Tuple
+
+    from .recording import Recording
+
+logger = logging.getLogger(__name__)
+
+
+@attrs.define
+class ReplayRequest:
+    """The timing of a single request, in both the recording and the replay."""
+
+    method: str
+    """The request's method."""
+
+    original_ms: Optional[float] = attrs.field(default=None)
+    """How long the server took to respond in the recording, if known."""
+
+    replay_ms: Optional[float] = attrs.field(default=None)
+    """How long the server took to respond in the replay, if it responded."""
+
+    error: bool = attrs.field(default=False)
+    """Indicates if the server responded with an error in the replay."""
+
+
+@attrs.define
+class Step:
+    """A message to send to the server."""
+
+    message: Dict[str, Any]
+    """The message to send."""
+
+    timestamp: Optional[float]
+    """When the message was sent in the recording, if known."""
+
+    after: List[int]
+    """The events that had happened in the recording before the message was sent,
+    which must also happen in the replay before it is sent."""
+
+    event: Optional[int] = attrs.field(default=None)
+    """If the message is a request, the event signalling that it has been answered."""
+
+
+@attrs.define
+class Plan:
+    """The messages to send to the server when replaying a recording.
+
+    Each request sent by the client and each reply to a request sent by the server is
+    an *event*, identified by its index. Events are used to ensure that messages are
+    only sent once the server has reached the same state it was in when the message
+    was originally sent.
+    """
+
+    steps: List[Step] = attrs.field(factory=list)
+    """The messages sent by the client, in order."""
+
+    requests: Dict[int, ReplayRequest] = attrs.field(factory=dict)
+    """The requests sent by the client, by event."""
+
+    replies: Dict[str, Deque[Tuple[int, Dict[str, Any]]]] = attrs.field(factory=dict)
+    """The client's replies to requests sent by the server, by method."""
+
+    events: int = attrs.field(default=0)
+    """The total number of events."""
+
+
+def plan_replay(recording: Recording) -> Plan:
+    """Determine the messages to send, and when, to replay the given recording."""
+    plan = Plan()
+    client_requests: Dict[str, Tuple[int, Optional[float]]] = {}
+    server_requests: Dict[str, str] = {}
+    happened: List[int] = []
+
+    for recorded in recording.messages:
+        message = recorded.message
+        message_type = recorded.message_type
+        key = str(message.get("id"))
+
+        if recorded.source == "client" and message_type == "request":
+            event = plan.events
+            plan.events += 1
+
+            plan.requests[event] = ReplayRequest(message["method"])
+            client_requests[key] = (event, recorded.timestamp)
+            plan.steps.append(Step(message, recorded.timestamp, happened, event))
+            happened = []
+
+        elif recorded.source == "client" and message_type == "notification":
+            plan.steps.append(Step(message, recorded.timestamp, happened))
+            happened = []
+
+        elif recorded.source == "client":
+            if (method := server_requests.pop(key, None)) is None:
+                continue
+
+            event = plan.events
+            plan.events += 1
+
+            reply = {k: v for k, v in message.items() if k in {"result", "error"}}
+            plan.replies.setdefault(method, deque()).append((event, reply))
+            happened.append(event)
+
+        elif message_type == "request":
+            server_requests[key] = message["method"]
+
+        elif message_type != "notification":
+            if (request := client_requests.pop(key, None)) is None:
+                continue
+
+            event, sent_at = request
+            happened.append(event)
+
+            if sent_at is not None and recorded.timestamp is not None:
+                original_ms = (recorded.timestamp - sent_at) * 1000
+                plan.requests[event].original_ms = original_ms
+
+    return plan
+
+
+@attrs.define
+class MethodComparison:
+    """Compares the latency of the requests for a single method, in the recording and
+    the replay."""
+
+    method: str
+    """The method."""
+
+    requests: int = attrs.field(default=0)
+    """The number of requests sent."""
+
+    errors: int = attrs.field(default=0)
+    """The number of requests the server responded to with an error."""
+
+    missing: int = attrs.field(default=0)
+    """The number of requests the server did not respond to."""
+
+    original: Histogram = attrs.field(factory=Histogram)
+    """The response times in the recording, in milliseconds."""
+
+    replay: Histogram = attrs.field(factory=Histogram)
+    """The response times in the replay, in milliseconds."""
+
+    def add(self, request: ReplayRequest):
+        self.requests += 1
+
+        if request.original_ms is not None:
+            self.original.add(request.original_ms)
+
+        if request.replay_ms is None:
+            self.missing += 1
+            return
+
+        self.replay.add(request.replay_ms)
+        if request.error:
+            self.errors += 1
+
+    def change(self, q: float) -> Optional[float]:
+        """The change in the given quantile of the response time, as a percentage of
+        the original, if known."""
+        if self.original.count == 0 or self.replay.count == 0:
+            return None
+
+        original = self.original.quantile(q)
+        if original <= 0:
+            return None
+
+        return (self.replay.quantile(q) - original) / original * 100
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = dict(
+            method=self.method,
+            requests=self.requests,
+            errors=self.errors,
+            missing=self.missing,
+        )
+
+        for q in [0.5, 0.9]:
+            name = f"p{q * 100:.0f}"
+            result[name] = dict(
+                original_ms=_quantile(self.original, q),
+                replay_ms=_quantile(self.replay, q),
+                change_pct=self.change(q),
+            )
+
+        return result
+
+
+def _quantile(histogram: Histogram, q: float) -> Optional[float]:
+    return histogram.quantile(q) if histogram.count > 0 else None
+
+
+class ReplayReport:
+    """Compares the latency of the requests in a recording with their replay."""
+
+    def __init__(self, requests: Iterable[ReplayRequest]):
+        self.methods: Dict[str, MethodComparison] = {}
+        self.total = MethodComparison("")
+
+        for request in requests:
+            if (comparison := self.methods.get(request.method)) is None:
+                comparison = self.methods[request.method] = MethodComparison(
+                    request.method
+                )
+
+            comparison.add(request)
+            self.total.add(request)
+
+    def regressions(self, threshold: float) -> List[MethodComparison]:
+        """Return the methods whose median response time increased by more than the
+        given percentage."""
+        return [
+            comparison
+            for comparison in self.methods.values()
+            if (change := comparison.change(0.5)) is not None and change > threshold
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        methods = sorted(self.methods.values(), key=lambda m: m.requests, reverse=True)
+        return dict(
+            total=self.total.to_dict(),
+            methods=[m.to_dict() for m in methods],
+        )
+
+
+class Replayer:
+    """Replays a recorded session against a language server.
+
+    The client's messages are sent to the server with their original timing, scaled
+    by ``speed``. Each message waits until the server has responded to any requests
+    it had responded to when the message was originally sent. Requests sent by the
+    server are answered using the client's replies from the recording.
+    """
+
+    def __init__(
+        self,
+        recording: Recording,
+        command: List[str],
+        *,
+        speed: float = 1.0,
+        timeout: float = 30.0,
+    ):
+        self.plan = plan_replay(recording)
+        self.command = command
+
+        self.speed = speed
+        """How much faster than the original to send messages, ``math.inf`` to send
+        them as fast as possible."""
+
+        self.timeout = timeout
+        """How long to wait (in seconds) for the server to respond before moving
+        on."""
+
+        self.server: Optional[asyncio.subprocess.Process] = None
+
+        self._ids = itertools.count(1)
+        self._id_map: Dict[str, int] = {}
+        """Maps the original id of each request to the id used in the replay."""
+
+        self._sent: Dict[int, Tuple[int, float]] = {}
+        """Maps the id of each request waiting for a response, to its event and the
+        time it was sent."""
+
+        self._events: List[asyncio.Future] = []
+        self._last_reply: Dict[str, Dict[str, Any]] = {}
+
+    async def run(self) -> ReplayReport:
+        """Replay the recording, returning a comparison of response times."""
+        loop = asyncio.get_running_loop()
+        self._events = [loop.create_future() for _ in range(self.plan.events)]
+
+        command, *arguments = self.command
+        self.server = await asyncio.create_subprocess_exec(
+            command, *arguments, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+
+        reader = asyncio.create_task(
+            aio_readline(self.server.stdout, self._handle_message)  # type: ignore[arg-type]
+        )
+        reader.add_done_callback(self._on_server_closed)
+
+        try:
+            await self._send_messages()
+            await self._wait_for(self.plan.requests.keys())
+        finally:
+            await self._stop(reader)
+
+        return ReplayReport(self.plan.requests.values())
+
+    async def _send_messages(self):
+        steps = self.plan.steps
+        start = time.monotonic()
+        first = next((s.timestamp for s in steps if s.timestamp is not None), None)
+
+        for step in steps:
+            await self._wait_for(step.after)
+            if self._closed:
+                logger.warning("Server exited before the replay finished")
+                return
+
+            if math.isfinite(self.speed) and None not in (first, step.timestamp):
+                due = start + (step.timestamp - first) / self.speed  # type: ignore
+                if (delay := due - time.monotonic()) > 0:
+                    await asyncio.sleep(delay)
+
+            try:
+                self._write(self._prepare(step))
+                await self.server.stdin.drain()  # type: ignore[union-attr]
+            except (BrokenPipeError, ConnectionResetError):
+                logger.warning("Server exited before the replay finished")
+                return
+
+    @property
+    def _closed(self) -> bool:
+        return self.server is None or self.server.returncode is not None
+
+    def _prepare(self, step: Step) -> Dict[str, Any]:
+        """Prepare the given message to be sent to the server."""
+        message = {"jsonrpc": "2.0", **step.message}
+        method = message.get("method")
+
+        if step.event is not None:
+            request_id = next(self._ids)
+            self._id_map[str(message["id"])] = request_id
+            self._sent[request_id] = (step.event, time.perf_counter())
+            message["id"] = request_id
+
+        if method == "$/cancelRequest":
+            params = dict(message.get("params") or {})
+            if (cancelled_id := self._id_map.get(str(params.get("id")))) is not None:
+                params["id"] = cancelled_id
+                message["params"] = params
+
+        elif method == "initialize":
+            # Some servers exit if the client process they were given exits.
+            message["params"] = {
+                **(message.get("params") or {}),
+                "processId": os.getpid(),
+            }
+
+        return message
+
+    def _write(self, message: Dict[str, Any]):
+        body = codec.dumps(message).encode("utf8")
+        header = f"Content-Length: {len(body)}\r\n\r\n".encode()
+        self.server.stdin.write(header + body)  # type: ignore[union-attr]
+
+    def _handle_message(self, data: bytes):
+        """Handle a message sent by the server."""
+        try:
+            _, start = parse_rpc_headers(data)
+            message = codec.loads(data[start:])
+        except ValueError:
+            logger.debug("Unable to parse message: %r", data, exc_info=True)
+            return
+
+        message_type = get_message_type(message)
+        if message_type == "request":
+            self._reply(message)
+
+        elif message_type != "notification":
+            if (sent := self._sent.pop(message["id"], None)) is None:
+                return
+
+            event, sent_at = sent
+            request = self.plan.requests[event]
+            request.replay_ms = (time.perf_counter() - sent_at) * 1000
+            request.error = message_type == "error"
+            self._set_event(event)
+
+    def _reply(self, message: Dict[str, Any]):
+        """Reply to a request sent by the server, with the client's reply from the
+        recording."""
+        method = message["method"]
+
+        if replies := self.plan.replies.get(method):
+            event, reply = replies.popleft()
+            self._last_reply[method] = reply
+        else:
+            # The server has sent more requests than in the recording, reuse the last
+            # reply where possible.
+            event, reply = None, self._last_reply.get(method, {"result": None})
+
+        try:
+            self._write({"jsonrpc": "2.0", "id": message["id"], **reply})
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+        if event is not None:
+            self._set_event(event)
+
+    def _set_event(self, event: int):
+        if not (future := self._events[event]).done():
+            future.set_result(None)
+
+    def _on_server_closed(self, task: asyncio.Task):
+        """Once the server closes its output, nothing else will happen."""
+        for event in range(len(self._events)):
+            self._set_event(event)
+
+    async def _wait_for(self, events: Iterable[int]):
+        """Wait for the given events to happen."""
+        futures = [f for e in events if not (f := self._events[e]).done()]
+        if len(futures) == 0:
+            return
+
+        _, pending = await asyncio.wait(futures, timeout=self.timeout)
+        if len(pending) > 0:
+            logger.warning("Timed out waiting for the server after %ss", self.timeout)
+
+        for future in pending:
+            future.set_result(None)
+
+    async def _stop(self, reader: asyncio.Task):
+        """Ensure the server process is stopped."""
+        server = self.server
+        if server is not None and server.returncode is None:
+            # Give the server a chance to exit by itself, the recording should have
+            # ended with an `exit` notification.
+            with suppress(BrokenPipeError, ConnectionResetError):
+                server.stdin.close()  # type: ignore[union-attr]
+
+            try:
+                await asyncio.wait_for(server.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                server.terminate()
+
+                try:
+                    await asyncio.wait_for(server.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    server.kill()
+                    await server.wait()
+
+        with suppress(asyncio.CancelledError):
+            reader.cancel()
+            await reader
@@ -0,0 +1,346 @@
+"""Searching for messages stored in the database.
+
+Searches are written as a list of space separated terms, using the same vocabulary as
+the options used to filter messages when recording (see
+:class:`~lsp_devtools.record.filters.LSPFilter`)::
+
+   method:textDocument/completion type:response since:2024-01-01T10:00 example
+
+Terms of the form ``key:value`` restrict the messages by the given field, a ``-``
+prefix (e.g. ``-method:$/progress``) excludes matching messages instead. Multiple
+values can be given as a comma separated list. Any other terms are searched for in the
+text of the message using the database's full text search index, which must first be
+brought up to date with :func:`update_search_index`.
+
+========= =====================================================================
+Key       Value
+========= =====================================================================
+method    The method associated with the message
+source    ``client`` or ``server``
+type      ``request``, ``response``, ``result``, ``error`` or ``notification``
+session   The id of the session the message belongs to
+since     Only include messages sent at or after the given ISO 8601 time (UTC)
+until     Only include messages sent at or before the given ISO 8601 time (UTC)
+size      Only include messages whose body is larger (``size:>10k``), or smaller
+          (``size:<1k``) than the given size, or both (``size:>1k,<10k``). A bare
+          size (``size:10k``) is treated as a minimum. Messages with no recorded
+          size never match
+========= =====================================================================
+"""
+
+from __future__ import annotations
+
+import re
+import shlex
+import typing
+from datetime import datetime
+from datetime import timezone
+
+import attrs
+
+from lsp_devtools.handlers import message_matches_type
+
+if typing.TYPE_CHECKING:
+    import sqlite3
+    from typing import Any
+    from typing import Iterable
+    from typing import List
+    from typing import Optional
+    from typing import Set
+    from typing import Tuple
+
+    from lsp_devtools.record.filters import MessageSource
+    from lsp_devtools.record.filters import MessageType
+
+
+MESSAGE_SOURCES = {"client", "server"}
+MESSAGE_TYPES = {"request", "response", "result", "error", "notification"}
+QUERY_KEYS = {"method", "source", "type", "session", "since", "until", "size"}
+
+SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "kb": 1024, "m": 1024**2, "mb": 1024**2}
+SIZE = re.compile(r"(\d+(?:\.\d+)?)\s*([a-z]*)", re.IGNORECASE)
+SIZE_OPERATORS = [">=", "<=", ">", "<"]
+
+INDEX_BATCH_SIZE = 10_000
+"""The maximum number of messages added to the search index per transaction."""
+
+SEARCH_INDEX_RANGE = """
+SELECT indexed_rowid, (SELECT COALESCE(MAX(rowid), 0) FROM protocol)
+FROM protocol_fts_status
+"""
+"""Select the rowid of the last message in the search index and in the database."""
+
+INDEX_MESSAGES = """
+INSERT INTO protocol_fts (rowid, text)
+SELECT
+    rowid,
+    coalesce(params, '') || ' ' ||
+    coalesce(result, '') || ' ' ||
+    coalesce(error, '') || ' ' ||
+    coalesce(body, '')
+FROM protocol
+WHERE rowid > ? AND rowid <= ? AND body_encoding IS NULL
+"""
+"""Add the messages with rowids in the given range to the search index."""
+
+UPDATE_INDEXED_ROWID = "UPDATE protocol_fts_status SET indexed_rowid = ?"
+
+
+@attrs.define
+class MessageQuery:
+    """A search for messages, compiled to SQL by :meth:`where`."""
+
+    message_source: MessageSource = attrs.field(default="both")
+    """Only include messages from the given source."""
+
+    include_message_types: Set[MessageType] = attrs.field(factory=set, converter=set)
+    """Only include the given message types."""
+
+    exclude_message_types: Set[MessageType] = attrs.field(factory=set, converter=set)
+    """Exclude the given message types."""
+
+    include_methods: Set[str] = attrs.field(factory=set, converter=set)
+    """Only include messages associated with the given method."""
+
+    exclude_methods: Set[str] = attrs.field(factory=set, converter=set)
+    """Exclude messages associated with the given method."""
+
+    include_sessions: Set[str] = attrs.field(factory=set, converter=set)
+    """Only include messages from the given sessions."""
+
+    exclude_sessions: Set[str] = attrs.field(factory=set, converter=set)
+    """Exclude messages from the given sessions."""
+
+    since: Optional[str] = attrs.field(default=None)
+    """Only include messages sent at or after the given time."""
+
+    until: Optional[str] = attrs.field(default=None)
+    """Only include messages sent at or before the given time."""
+
+    min_size: Optional[int] = attrs.field(default=None)
+    """Only include messages whose body is at least the given number of bytes."""
+
+    max_size: Optional[int] = attrs.field(default=None)
+    """Only include messages whose body is at most the given number of bytes."""
+
+    text: List[str] = attrs.field(factory=list)
+    """Only include messages containing all of the given terms."""
+
+    def where(self) -> Tuple[List[str], List[Any]]:
+        """Return the conditions, and their parameters, a row in the ``protocol``
+        table must satisfy to match this query."""
+        where: List[str] = []
+        parameters: List[Any] = []
+
+        def add(condition: str, *values: Any):
+            where.append(condition)
+            parameters.extend(values)
+
+        if self.message_source != "both":
+            add("source = ?", self.message_source)
+
+        if self.include_message_types:
+            types = _expand_types(self.include_message_types)
+            add(f"message_type IN ({_placeholders(types)})", *types)
+
+        if self.exclude_message_types:
+            types = _expand_types(self.exclude_message_types)
+            add(f"message_type NOT IN ({_placeholders(types)})", *types)
+
+        if self.include_methods:
+            methods = sorted(self.include_methods)
+            add(f"method IN ({_placeholders(methods)})", *methods)
+
+        if self.exclude_methods:
+            methods = sorted(self.exclude_methods)
+            add(
+                f"(method IS NULL OR method NOT IN ({_placeholders(methods)}))",
+                *methods,
+            )
+
+        if self.include_sessions:
+            sessions = sorted(self.include_sessions)
+            add(f"session IN ({_placeholders(sessions)})", *sessions)
+
+        if self.exclude_sessions:
+            sessions = sorted(self.exclude_sessions)
+            add(f"session NOT IN ({_placeholders(sessions)})", *sessions)
+
+        if self.since is not None:
+            add("julianday(timestamp) >= julianday(?)", self.since)
+
+        if self.until is not None:
+            add("julianday(timestamp) <= julianday(?)", self.until)
+
+        if self.min_size is not None:
+            add("size >= ?", self.min_size)
+
+        if self.max_size is not None:
+            add("size <= ?", self.max_size)
+
+        if self.text:
+            add(
+                "rowid IN (SELECT rowid FROM protocol_fts WHERE protocol_fts MATCH ?)",
+                " ".join(_fts_string(term) for term in self.text),
+            )
+
+        return where, parameters
+
+
+def update_search_index(conn: sqlite3.Connection):
+    """Add any messages that are not yet in the full text search index to it.
+
+    Messages are added in batches of :data:`INDEX_BATCH_SIZE`, each in its own
+    transaction, so that writers are not blocked for long while a large database is
+    indexed for the first time.
+    """
+    while True:
+        (start, end) = conn.execute(SEARCH_INDEX_RANGE).fetchone()
+        if start >= end:
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            # Another process may have updated the index in the meantime.
+            (start, end) = conn.execute(SEARCH_INDEX_RANGE).fetchone()
+            stop = min(start + INDEX_BATCH_SIZE, end)
+
+            conn.execute(INDEX_MESSAGES, (start, stop))
+            conn.execute(UPDATE_INDEXED_ROWID, (stop,))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def _expand_types(types: Set[MessageType]) -> List[str]:
+    """Return the values of the ``message_type`` column matching the given types."""
+    return [
+        t
+        for t in ["request", "result", "error", "notification"]
+        if message_matches_type(t, types)
+    ]
+
+
+def _placeholders(values: Iterable[Any]) -> str:
+    return ", ".join("?" for _ in values)
+
+
+def _fts_string(term: str) -> str:
+    """Quote the given term, so that it is not interpreted as FTS5 query syntax."""
+    escaped = term.replace('"', '""')
+    return f'"{escaped}"'
+
+
+def _parse_time(value: str) -> str:
+    """Normalise the given time to a UTC time in a format understood by SQLite's date
+    and time functions."""
+    try:
+        time = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid time: {value!r}") from None
+
+    if time.tzinfo is not None:
+        time = time.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return time.isoformat()
+
+
+def parse_size(value: str) -> int:
+    """Parse the given size e.g. ``512``, ``10k`` or ``1.5MB`` into a number of bytes.
+
+    Raises
+    ------
+    ValueError
+       If the size is not valid.
+    """
+    match = SIZE.fullmatch(value.strip())
+    if match is None or (unit := match.group(2).lower()) not in SIZE_UNITS:
+        raise ValueError(f"Invalid size: {value!r}")
+
+    return int(float(match.group(1)) * SIZE_UNITS[unit])
+
+
+def _parse_size_comparison(query: MessageQuery, value: str):
+    """Update the size limits of the given query according to the given comparison
+    e.g. ``>10k``."""
+    operator = next((op for op in SIZE_OPERATORS if value.startswith(op)), "")
+    size = parse_size(value[len(operator) :])
+
+    if operator == ">":
+        query.min_size = size + 1
+    elif operator in {">=", ""}:
+        query.min_size = size
+    elif operator == "<":
+        query.max_size = size - 1
+    else:
+        query.max_size = size
+
+
+def parse_query(text: str) -> MessageQuery:
+    """Parse the given search string.
+
+    Raises
+    ------
+    ValueError
+       If the search string is not valid.
+    """
+    query = MessageQuery()
+
+    for term in shlex.split(text):
+        key, sep, value = term.partition(":")
+        exclude = key.startswith("-")
+        key = key[1:] if exclude else key
+
+        if not sep or key not in QUERY_KEYS:
+            query.text.append(term)
+            continue
+
+        values = [v for v in value.split(",") if v]
+        if len(values) == 0:
+            raise ValueError(f"Missing value for {key!r}")
+
+        if key == "method":
+            methods = query.exclude_methods if exclude else query.include_methods
+            methods.update(values)
+
+        elif key == "type":
+            if unknown := set(values) - MESSAGE_TYPES:
+                raise ValueError(
+                    f"Unknown message type(s): {', '.join(sorted(unknown))}"
+                )
+
+            types = (
+                query.exclude_message_types if exclude else query.include_message_types
+            )
+            types.update(values)  # type: ignore[arg-type]
+
+        elif key == "session":
+            sessions = query.exclude_sessions if exclude else query.include_sessions
+            sessions.update(values)
+
+        elif key == "source":
+            if len(values) > 1 or values[0] not in MESSAGE_SOURCES:
+                raise ValueError(f"Invalid source: {value!r}")
+
+            source = values[0]
+            if exclude:
+                source = "server" if source == "client" else "client"
+
+            query.message_source = source  # type: ignore[assignment]
+
+        elif exclude:
+            raise ValueError(f"{key!r} cannot be excluded")
+
+        elif key == "since":
+            query.since = _parse_time(value)
+
+        elif key == "size":
+            for comparison in values:
+                _parse_size_comparison(query, comparison)
+
+        else:
+            query.until = _parse_time(value)
+
+    return query
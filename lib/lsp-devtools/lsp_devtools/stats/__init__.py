@@ -0,0 +1,386 @@
+"""Statistics on the messages exchanged between client and server.
+
+Statistics are computed incrementally, in constant memory, as messages are seen, so
+that they can be kept up to date while a session is being captured.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import pathlib
+import sys
+import typing
+from collections import deque
+from datetime import datetime
+from datetime import timezone
+
+import attrs
+from rich.console import Console
+from rich.table import Table
+
+from lsp_devtools import codec
+
+if typing.TYPE_CHECKING:
+    from typing import Any
+    from typing import Deque
+    from typing import Dict
+    from typing import List
+    from typing import Optional
+    from typing import Tuple
+
+
+class Histogram:
+    """A streaming histogram, used to estimate the quantiles of a distribution.
+
+    Values are counted in logarithmically sized buckets, so that any quantile can be
+    estimated to within the given relative ``accuracy``, while the number of buckets
+    grows only with the logarithm of the range of values seen.
+    """
+
+    def __init__(self, accuracy: float = 0.01):
+        self.accuracy = accuracy
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+
+        self._buckets: Dict[int, int] = {}
+        self._zeros = 0
+        """The number of values too small to be placed in a bucket."""
+
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def add(self, value: float):
+        """Add a (non-negative) value to the histogram."""
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+        if value <= 1e-9:
+            self._zeros += 1
+            return
+
+        idx = math.ceil(math.log(value) / self._log_gamma)
+        self._buckets[idx] = self._buckets.get(idx, 0) + 1
+
+    def merge(self, other: Histogram):
+        """Add all the values in ``other`` to this histogram."""
+        if other.accuracy != self.accuracy:
+            raise ValueError("Cannot merge histograms with different accuracies")
+
+        for idx, count in other._buckets.items():
+            self._buckets[idx] = self._buckets.get(idx, 0) + count
+
+        self._zeros += other._zeros
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Estimate the value below which the given fraction ``q`` of values lie."""
+        if self.count == 0:
+            return math.nan
+
+        # The (zero based) nearest rank of the quantile.
+        rank = max(math.ceil(q * self.count) - 1, 0)
+        if rank < self._zeros:
+            return 0.0
+
+        seen = self._zeros
+        for idx in sorted(self._buckets):
+            seen += self._buckets[idx]
+            if seen > rank:
+                value = 2 * self._gamma**idx / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+
+        return self.max
+
+
+class Timeline:
+    """Tracks the mean of a value over fixed intervals of time, keeping only the most
+    recent ``length`` intervals."""
+
+    def __init__(self, interval: float = 1.0, length: int = 60):
+        self.interval = interval
+        self.length = length
+        self._intervals: Deque[Tuple[int, float, int]] = deque(maxlen=length)
+
+    def add(self, timestamp: float, value: float):
+        """Add a value, seen at the given time (in seconds)."""
+        idx = int(timestamp // self.interval)
+
+        if self._intervals and self._intervals[-1][0] == idx:
+            _, total, count = self._intervals[-1]
+            self._intervals[-1] = (idx, total + value, count + 1)
+
+        # Values should arrive in order, but ignore any that are too late to count.
+        elif not self._intervals or self._intervals[-1][0] < idx:
+            self._intervals.append((idx, value, 1))
+
+    def values(self) -> List[float]:
+        """Return the mean value in each interval, oldest first, where intervals
+        without any values are ``0``."""
+        if not self._intervals:
+            return []
+
+        last = self._intervals[-1][0]
+        values = [0.0] * min(self.length, last - self._intervals[0][0] + 1)
+        first = last - len(values) + 1
+
+        for idx, total, count in self._intervals:
+            if idx >= first:
+                values[idx - first] = total / count
+
+        return values
+
+
+@attrs.define
+class MethodStats:
+    """Latency statistics for a single method."""
+
+    method: str
+    """The method."""
+
+    latency: Histogram = attrs.field(factory=Histogram)
+    """The time taken to respond to requests, in milliseconds."""
+
+    timeline: Timeline = attrs.field(factory=Timeline)
+    """The mean time taken to respond to requests, over time."""
+
+
+class LatencyStats:
+    """Per-method request latency statistics, updated as responses are paired with
+    their requests."""
+
+    def __init__(self, interval: float = 1.0, length: int = 60):
+        self.interval = interval
+        self.length = length
+
+        self.methods: Dict[str, MethodStats] = {}
+        """Statistics for each method."""
+
+        self.total = self._new_stats("")
+        """Statistics for all methods combined."""
+
+        self.version = 0
+        """Incremented every time the statistics change."""
+
+    def _new_stats(self, method: str) -> MethodStats:
+        return MethodStats(
+            method, timeline=Timeline(interval=self.interval, length=self.length)
+        )
+
+    def add(self, method: Optional[str], timestamp: float, duration_ms: float):
+        """Record the response to a request.
+
+        Parameters
+        ----------
+        method
+           The method of the request.
+
+        timestamp
+           When the response was sent, in seconds.
+
+        duration_ms
+           The time taken to respond to the request.
+        """
+        method = method or "<unknown>"
+        if (stats := self.methods.get(method)) is None:
+            stats = self.methods[method] = self._new_stats(method)
+
+        for s in [stats, self.total]:
+            s.latency.add(duration_ms)
+            s.timeline.add(timestamp, duration_ms)
+
+        self.version += 1
+
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+
+def is_sqlite(path: pathlib.Path) -> bool:
+    """Determine if the given file is a SQLite database."""
+    with path.open("rb") as f:
+        return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+
+
+def print_summary(console: Console, summary: Dict[str, Any]):
+    """Print the given summary, as returned by :meth:`CaptureSummary.to_dict`, as a
+    set of tables."""
+
+    duration = summary["duration_s"]
+    total = summary["total"]
+    overview = [f"{total['messages']} messages"]
+    if summary["sessions"]:
+        overview.append(f"{summary['sessions']} session(s)")
+
+    if duration is not None:
+        overview.append(f"over {duration:.1f}s")
+        overview.append(f"peak {summary['peak_rate']} messages/s")
+
+    console.print(", ".join(overview))
+
+    rows = [*summary["methods"], dict(total, method="(all)")]
+
+    table = Table(
+        title="Messages",
+        title_justify="left",
+        caption="Sizes are of the message payload",
+        caption_justify="left",
+    )
+    table.add_column("Method", no_wrap=True)
+    for column in ["Count", "Req", "Notif", "Err", "/s"]:
+        table.add_column(column, justify="right")
+
+    for column in ["Size p50", "Max", "Total"]:
+        table.add_column(column, justify="right")
+
+    for row in rows:
+        size = row["size_bytes"]
+        table.add_row(
+            row["method"],
+            str(row["messages"]),
+            str(row["requests"]),
+            str(row["notifications"]),
+            str(row["errors"]),
+            _format(row["rate"], ".1f"),
+            *(_format_size(size[k]) for k in ["p50", "max", "total"]),
+            end_section=row is rows[-2],
+        )
+
+    console.print(table)
+
+    rows = [row for row in rows if row["latency_ms"]["max"] is not None]
+    if len(rows) > 0:
+        table = Table(title="Latency (ms)", title_justify="left")
+        table.add_column("Method", no_wrap=True)
+        for column in ["Responses", "p50", "p90", "p99", "Max"]:
+            table.add_column(column, justify="right")
+
+        for row in rows:
+            latency = row["latency_ms"]
+            table.add_row(
+                row["method"],
+                str(row["results"] + row["errors"]),
+                *(_format(latency[k], ".1f") for k in ["p50", "p90", "p99", "max"]),
+                end_section=row is rows[-2],
+            )
+
+        console.print(table)
+
+    if not summary["slowest"]:
+        return
+
+    table = Table(title="Slowest requests", title_justify="left")
+    for column in ["Duration (ms)", "Method", "ID", "Session", "Time (UTC)"]:
+        table.add_column(
+            column, justify="right" if column == "Duration (ms)" else "left"
+        )
+
+    for request in summary["slowest"]:
+        timestamp = request["timestamp"]
+        table.add_row(
+            f"{request['duration_ms']:.1f}",
+            request["method"] or "",
+            str(request["id"]),
+            request["session"] or "",
+            "" if timestamp is None else _format_time(timestamp),
+        )
+
+    console.print(table)
+
+
+def _format(value: Optional[float], spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def _format_size(value: Optional[float]) -> str:
+    # Imported here, since lsp_devtools.record (indirectly) imports this module.
+    from lsp_devtools.record.formatters import format_bytes
+
+    return "-" if value is None else format_bytes(value)
+
+
+def _format_time(timestamp: float) -> str:
+    time = datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+    return time.isoformat(timespec="milliseconds")
+
+
+def stats(args, extra: List[str]):
+    from .capture import read_jsonl
+    from .capture import read_sqlite
+    from .capture import summarise
+
+    path: pathlib.Path = args.capture
+    if not path.is_file():
+        print(f"No such file: {path}", file=sys.stderr)
+        return 1
+
+    input_format = args.input_format
+    if input_format == "auto":
+        input_format = "sqlite" if is_sqlite(path) else "jsonl"
+
+    if input_format == "sqlite":
+        messages = read_sqlite(path, session=args.session)
+    else:
+        messages = read_jsonl(path)
+
+    summary = summarise(messages, slowest=args.slowest).to_dict()
+
+    if args.format == "json":
+        print(codec.dumps(summary, indent=2))
+    else:
+        print_summary(Console(), summary)
+
+
+def cli(commands: argparse._SubParsersAction):
+    cmd: argparse.ArgumentParser = commands.add_parser(
+        "stats",
+        help="summarise a captured session",
+        description="""Summarise the messages in a SQLite database or JSONL file captured with
+'lsp-devtools record'. Reports per-method message counts, latency percentiles,
+payload sizes, message rates and the slowest requests.
+
+The capture is read in a single pass, using a fixed amount of memory regardless of
+its size. JSONL files do not record when each message was sent, so latency and rate
+information is only available for SQLite captures.
+""",
+    )
+    cmd.add_argument("capture", type=pathlib.Path, help="the capture to summarise")
+    cmd.add_argument(
+        "--input-format",
+        choices=["auto", "sqlite", "jsonl"],
+        default="auto",
+        help="the format of the capture. (default: %(default)s)",
+    )
+    cmd.add_argument(
+        "--format",
+        choices=["table", "json"],
+        default="table",
+        help="how to output the summary. (default: %(default)s)",
+    )
+    cmd.add_argument(
+        "--session",
+        default=None,
+        help="only include messages from the given session (SQLite only)",
+    )
+    cmd.add_argument(
+        "-n",
+        "--slowest",
+        type=int,
+        default=10,
+        metavar="N",
+        help="the number of slowest requests to report. (default: %(default)s)",
+    )
+    cmd.set_defaults(run=stats)
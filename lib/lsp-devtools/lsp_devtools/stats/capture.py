@@ -0,0 +1,395 @@
+"""Summarise captured sessions, in a single pass and in constant memory."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import sqlite3
+import typing
+import zlib
+from contextlib import closing
+from datetime import datetime
+from datetime import timezone
+
+import attrs
+
+from lsp_devtools import codec
+from lsp_devtools.handlers import PendingRequests
+from lsp_devtools.handlers import get_message_type
+
+from . import Histogram
+
+if typing.TYPE_CHECKING:
+    import pathlib
+    from typing import Any
+    from typing import Dict
+    from typing import Iterable
+    from typing import Iterator
+    from typing import List
+    from typing import Optional
+    from typing import Set
+    from typing import Tuple
+
+
+@attrs.define(slots=True)
+class MessageInfo:
+    """The details of a single message needed to summarise a capture."""
+
+    session: Optional[str]
+    """The session the message belongs to, if known."""
+
+    timestamp: Optional[float]
+    """When the message was sent (in seconds), if known."""
+
+    source: Optional[str]
+    """Who sent the message, if known."""
+
+    id: Optional[Any]
+    """The message's id."""
+
+    method: Optional[str]
+    """The method associated with the message, if known."""
+
+    message_type: str
+    """One of ``request``, ``result``, ``error`` or ``notification``."""
+
+    size: int
+    """The size of the message body in bytes, or of its payload where the size of
+    the body was not recorded."""
+
+    duration_ms: Optional[float] = attrs.field(default=None)
+    """For responses, the time taken to respond to the request, if known."""
+
+
+@attrs.define
+class MethodSummary:
+    """Aggregate statistics for the messages associated with a single method."""
+
+    method: str
+    """The method."""
+
+    counts: Dict[str, int] = attrs.field(factory=dict)
+    """The number of messages seen, by message type."""
+
+    latency: Histogram = attrs.field(factory=Histogram)
+    """The time taken to respond to requests, in milliseconds."""
+
+    size: Histogram = attrs.field(factory=Histogram)
+    """The size of each message, in bytes."""
+
+    def add(self, message: MessageInfo):
+        self.counts[message.message_type] = self.counts.get(message.message_type, 0) + 1
+        self.size.add(message.size)
+
+        if message.duration_ms is not None:
+            self.latency.add(message.duration_ms)
+
+    def to_dict(self, duration: Optional[float]) -> Dict[str, Any]:
+        count = sum(self.counts.values())
+        return dict(
+            method=self.method,
+            messages=count,
+            requests=self.counts.get("request", 0),
+            notifications=self.counts.get("notification", 0),
+            results=self.counts.get("result", 0),
+            errors=self.counts.get("error", 0),
+            rate=count / duration if duration else None,
+            latency_ms=_summarise(self.latency),
+            size_bytes=dict(**_summarise(self.size), total=self.size.total),
+        )
+
+
+@attrs.define(order=True)
+class SlowRequest:
+    """A request that took a long time to receive a response."""
+
+    duration_ms: float
+    session: Optional[str] = attrs.field(order=False)
+    method: Optional[str] = attrs.field(order=False)
+    id: Any = attrs.field(order=False)
+    timestamp: Optional[float] = attrs.field(order=False)
+
+
+class CaptureSummary:
+    """Aggregate statistics on a captured session.
+
+    Only a fixed amount of state is kept per method, so the memory used does not
+    depend on the size of the capture.
+    """
+
+    def __init__(self, slowest: int = 10):
+        self.slowest = slowest
+        """The number of slowest requests to keep track of."""
+
+        self.methods: Dict[str, MethodSummary] = {}
+        self.total = MethodSummary("")
+        self.sessions: Set[str] = set()
+
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+
+        self.peak_rate = 0
+        """The largest number of messages sent within a single second."""
+
+        self._second: Optional[int] = None
+        self._second_count = 0
+        self._slowest: List[Tuple[SlowRequest, int]] = []
+        self._counter = itertools.count()
+
+    @property
+    def duration(self) -> Optional[float]:
+        """The time between the first and last message, in seconds."""
+        if self.first is None or self.last is None:
+            return None
+
+        return self.last - self.first
+
+    def add(self, message: MessageInfo):
+        method = message.method or "<unknown>"
+        if (summary := self.methods.get(method)) is None:
+            summary = self.methods[method] = MethodSummary(method)
+
+        summary.add(message)
+        self.total.add(message)
+
+        if message.session is not None:
+            self.sessions.add(message.session)
+
+        if (timestamp := message.timestamp) is not None:
+            self._add_time(timestamp)
+
+        if message.duration_ms is not None and self.slowest > 0:
+            request = SlowRequest(
+                message.duration_ms,
+                session=message.session,
+                method=message.method,
+                id=message.id,
+                timestamp=message.timestamp,
+            )
+
+            # The counter ensures that requests with the same duration are never
+            # compared directly.
+            item = (request, -next(self._counter))
+            if len(self._slowest) < self.slowest:
+                heapq.heappush(self._slowest, item)
+            elif item > self._slowest[0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def _add_time(self, timestamp: float):
+        self.first = timestamp if self.first is None else min(self.first, timestamp)
+        self.last = timestamp if self.last is None else max(self.last, timestamp)
+
+        second = int(timestamp)
+        if second == self._second:
+            self._second_count += 1
+        else:
+            self._second = second
+            self._second_count = 1
+
+        self.peak_rate = max(self.peak_rate, self._second_count)
+
+    def slowest_requests(self) -> List[SlowRequest]:
+        """Return the slowest requests seen, slowest first."""
+        return [request for request, _ in sorted(self._slowest, reverse=True)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = self.duration
+        methods = sorted(
+            self.methods.values(), key=lambda m: sum(m.counts.values()), reverse=True
+        )
+
+        return dict(
+            sessions=len(self.sessions),
+            duration_s=duration,
+            peak_rate=self.peak_rate if duration is not None else None,
+            total=self.total.to_dict(duration),
+            methods=[m.to_dict(duration) for m in methods],
+            slowest=[attrs.asdict(r) for r in self.slowest_requests()],
+        )
+
+
+def _summarise(histogram: Histogram) -> Dict[str, Optional[float]]:
+    if histogram.count == 0:
+        return dict(p50=None, p90=None, p99=None, max=None)
+
+    return dict(
+        p50=histogram.quantile(0.5),
+        p90=histogram.quantile(0.9),
+        p99=histogram.quantile(0.99),
+        max=histogram.max,
+    )
+
+
+def summarise(messages: Iterable[MessageInfo], slowest: int = 10) -> CaptureSummary:
+    """Summarise the given messages."""
+    summary = CaptureSummary(slowest=slowest)
+
+    for message in messages:
+        summary.add(message)
+
+    return summary
+
+
+def read_jsonl(path: pathlib.Path) -> Iterator[MessageInfo]:
+    """Read the messages in a file written by ``lsp-devtools record --to-file``.
+
+    The file only contains the messages themselves, so responses are matched with
+    their requests by ``id`` alone and no timing information is available.
+    """
+    pending: PendingRequests[Optional[str]] = PendingRequests()
+
+    with path.open("rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                message = codec.loads(line)
+            except ValueError:
+                continue
+
+            if not isinstance(message, dict):
+                continue
+
+            message_type = get_message_type(message)
+            msg_id = message.get("id")
+            method = message.get("method")
+
+            if message_type == "request":
+                pending.add(msg_id, method)
+            elif message_type != "notification":
+                method = pending.pop(msg_id)
+
+            yield MessageInfo(
+                session=None,
+                timestamp=None,
+                source=None,
+                id=msg_id,
+                method=method,
+                message_type=message_type,
+                size=len(line),
+            )
+
+
+def read_sqlite(
+    path: pathlib.Path, session: Optional[str] = None
+) -> Iterator[MessageInfo]:
+    """Read the messages in a database written by lsp-devtools.
+
+    The database is opened read-only and rows are read in order without loading
+    them all into memory. Databases written by older versions are supported, though
+    latency information is only available from schema version 2 onwards.
+    """
+    uri = f"{path.resolve().as_uri()}?mode=ro"
+
+    with closing(sqlite3.connect(uri, uri=True)) as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(protocol)")}
+
+        def column(name: str) -> str:
+            return name if name in columns else f"NULL AS {name}"
+
+        # Older databases do not record the size of each message, so fall back to
+        # the size of the stored payload.
+        payload = [
+            "coalesce(length(CAST(params AS BLOB)), 0)",
+            "coalesce(length(CAST(result AS BLOB)), 0)",
+            "coalesce(length(CAST(error AS BLOB)), 0)",
+        ]
+        if "body" in columns:
+            payload.append(
+                "CASE WHEN body_encoding IS NULL "
+                "THEN coalesce(length(CAST(body AS BLOB)), 0) ELSE 0 END"
+            )
+            compressed = "CASE WHEN body_encoding = 'zlib' THEN body END"
+        else:
+            compressed = "NULL"
+
+        if "size" in columns:
+            size_column = f"coalesce(size, {' + '.join(payload)})"
+            compressed = f"CASE WHEN size IS NULL THEN {compressed} END"
+        else:
+            size_column = " + ".join(payload)
+
+        sql = [
+            "SELECT session, timestamp, source, id, method,",
+            column("message_type") + ",",
+            "error IS NOT NULL,",
+            column("request_rowid") + ",",
+            column("duration_ms") + ",",
+            size_column + ",",
+            compressed,
+            "FROM protocol",
+        ]
+        parameters: Tuple[Any, ...] = ()
+        if session is not None:
+            sql.append("WHERE session = ?")
+            parameters = (session,)
+
+        sql.append("ORDER BY rowid")
+
+        for row in conn.execute(" ".join(sql), parameters):
+            (
+                row_session,
+                timestamp,
+                source,
+                msg_id,
+                method,
+                message_type,
+                is_error,
+                request_rowid,
+                duration,
+                size,
+                body,
+            ) = row
+
+            if message_type is None:
+                message_type = row_message_type(msg_id, method, is_error, request_rowid)
+
+            if body is not None:
+                size = len(zlib.decompress(body))
+
+            yield MessageInfo(
+                session=row_session,
+                timestamp=as_seconds(timestamp),
+                source=source,
+                id=msg_id,
+                method=method,
+                message_type=message_type,
+                size=size,
+                duration_ms=duration,
+            )
+
+
+def row_message_type(
+    msg_id: Any, method: Optional[str], is_error: bool, request_rowid: Optional[int]
+) -> str:
+    """Determine the type of a message stored before the ``message_type`` column
+    was added."""
+    if msg_id is None:
+        return "notification"
+
+    if is_error:
+        return "error"
+
+    if method is None or request_rowid is not None:
+        return "result"
+
+    return "request"
+
+
+def as_seconds(timestamp: Any) -> Optional[float]:
+    """Convert a timestamp stored in the database to seconds since the epoch, naive
+    timestamps are assumed to be in UTC."""
+    if not isinstance(timestamp, str):
+        return None
+
+    try:
+        time = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+
+    return time.timestamp()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import typing
+import zlib
+
+import pytest
+
+from lsp_devtools import codec
+from lsp_devtools.handlers import LazyLspMessage
+
+if typing.TYPE_CHECKING:
+    from typing import Any
+    from typing import List
+
+BODY = '{"jsonrpc": "2.0", "id": 1, "method": "example", "params": {"a": [1, 2]}}'
+
+
+@pytest.fixture
+def decoded(monkeypatch: pytest.MonkeyPatch) -> List[Any]:
+    """Records every document decoded by the codec."""
+    documents: List[Any] = []
+    loads = codec.loads
+
+    def record_loads(data):
+        documents.append(data)
+        return loads(data)
+
+    monkeypatch.setattr(codec, "loads", record_loads)
+    return documents
+
+
+def test_lazy_message_columns(decoded: List[Any]):
+    """Ensure that fields stored in their own columns are decoded on demand."""
+
+    message = LazyLspMessage(
+        "session", "2024-01-01T00:00:00", "client", "1", "example", params='{"a": 1}'
+    )
+    assert decoded == []
+
+    assert message.params == {"a": 1}
+    assert message.params == {"a": 1}
+    assert message.result is None
+    assert decoded == ['{"a": 1}']
+
+    assert message.is_request
+    assert not message.is_response
+
+
+@pytest.mark.parametrize(
+    "body, encoding",
+    [(BODY, None), (zlib.compress(BODY.encode()), "zlib")],
+)
+def test_lazy_message_body(decoded: List[Any], body, encoding):
+    """Ensure that message bodies are decoded on demand, and only once."""
+
+    message = LazyLspMessage(
+        "session",
+        "2024-01-01T00:00:00",
+        "client",
+        "1",
+        "example",
+        body=body,
+        body_encoding=encoding,
+    )
+    assert decoded == []
+
+    assert message.params == {"a": [1, 2]}
+    assert message.result is None
+    assert message.error is None
+    assert len(decoded) == 1
+
+
+def test_lazy_message_slots():
+    """Ensure that lazy messages do not carry a ``__dict__``."""
+    message = LazyLspMessage("session", "", "client", None, "example")
+
+    assert not hasattr(message, "__dict__")
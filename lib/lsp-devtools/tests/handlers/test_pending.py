@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import pytest
+
+from lsp_devtools.handlers import PendingRequests
+
+
+def test_pending_requests():
+    """Ensure that pending requests can be added and removed."""
+
+    pending: PendingRequests[str] = PendingRequests()
+    pending.add(1, "a")
+    pending.add(2, "b")
+
+    assert len(pending) == 2
+    assert pending.pop(1) == "a"
+    assert pending.pop(1) is None
+    assert len(pending) == 1
+    assert pending.evictions == 0
+
+
+def test_pending_requests_maxsize():
+    """Ensure that the oldest requests are evicted once full."""
+
+    pending: PendingRequests[int] = PendingRequests(maxsize=3)
+    for idx in range(5):
+        pending.add(idx, idx)
+
+    assert len(pending) == 3
+    assert pending.evictions == 2
+    assert pending.pop(0) is None
+    assert pending.pop(4) == 4
+
+
+def test_pending_requests_ttl(monkeypatch: pytest.MonkeyPatch):
+    """Ensure that requests are evicted once expired."""
+
+    now = 0.0
+    monkeypatch.setattr("lsp_devtools.handlers.time.monotonic", lambda: now)
+
+    pending: PendingRequests[int] = PendingRequests(ttl=10)
+    pending.add(1, 1)
+
+    now = 5.0
+    pending.add(2, 2)
+
+    now = 12.0
+    pending.add(3, 3)
+
+    assert pending.evictions == 1
+    assert pending.pop(1) is None
+    assert pending.pop(2) == 2
@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import typing
+from contextlib import closing
+
+import pytest
+
+from lsp_devtools.handlers import LspMessage
+from lsp_devtools.handlers import PendingRequests
+from lsp_devtools.handlers import decode_body
+from lsp_devtools.handlers import sql
+from lsp_devtools.handlers.sql import SCHEMA_VERSION
+from lsp_devtools.handlers.sql import RequestPairer
+from lsp_devtools.handlers.sql import SqlHandler
+from lsp_devtools.handlers.sql import init_db
+from lsp_devtools.search import update_search_index
+
+if typing.TYPE_CHECKING:
+    import pathlib
+    from typing import List
+
+
+def make_message(idx: int) -> LspMessage:
+    return LspMessage.from_rpc(
+        session="session",
+        timestamp="2024-01-01T00:00:00+00:00",
+        source="client",
+        message=dict(jsonrpc="2.0", id=idx, method="example", params=dict(idx=idx)),
+    )
+
+
+def count_rows(dbpath: pathlib.Path) -> int:
+    with closing(sqlite3.connect(dbpath)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM protocol").fetchone()[0]
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 500])
+def test_sql_handler_close(tmp_path: pathlib.Path, batch_size: int):
+    """Ensure that all messages are written to the database when the handler is
+    closed."""
+
+    dbpath = tmp_path / "sessions.db"
+    handler = SqlHandler(dbpath, batch_size=batch_size, flush_interval=60)
+
+    for idx in range(20):
+        handler.handle_message(make_message(idx))
+
+    handler.close()
+    assert count_rows(dbpath) == 20
+
+
+def test_sql_handler_flush(tmp_path: pathlib.Path):
+    """Ensure that messages can be explicitly flushed to the database."""
+
+    dbpath = tmp_path / "sessions.db"
+    handler = SqlHandler(dbpath, flush_interval=60)
+
+    handler.handle_message(make_message(1))
+    handler.flush()
+    assert count_rows(dbpath) == 1
+
+    handler.handle_message(make_message(2))
+    handler.close()
+    assert count_rows(dbpath) == 2
+
+
+def test_sql_handler_flush_interval(tmp_path: pathlib.Path):
+    """Ensure that messages are written once the flush interval has passed."""
+
+    dbpath = tmp_path / "sessions.db"
+    handler = SqlHandler(dbpath, flush_interval=0.01)
+
+    handler.handle_message(make_message(1))
+    handler._queue.join()
+
+    assert count_rows(dbpath) == 1
+    handler.close()
+
+
+OLD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS protocol (
+    session TEXT,
+    timestamp REAL,
+    source TEXT,
+
+    id TEXT NULL,
+    method TEXT NULL,
+    params TEXT NULL,
+    result TEXT NULL,
+    error TEXT NULL
+);
+
+INSERT INTO protocol VALUES (
+    'session', '', 'server', NULL, 'window/logMessage', '{"type": 3, "message": "hi"}',
+    NULL, NULL
+);
+
+INSERT INTO protocol VALUES (
+    'session', '2024-01-01T00:00:00.000+00:00', 'client', '1', 'initialize', '{}',
+    NULL, NULL
+);
+
+-- A request from the server, using the same id as the client's request
+INSERT INTO protocol VALUES (
+    'session', '2024-01-01T00:00:00.100+00:00', 'server', '1',
+    'workspace/configuration', '{}', NULL, NULL
+);
+
+INSERT INTO protocol VALUES (
+    'session', '2024-01-01T00:00:00.250+00:00', 'server', '1', NULL, NULL, '{}', NULL
+);
+"""
+
+
+@pytest.mark.parametrize("existing", [False, True])
+def test_init_db(tmp_path: pathlib.Path, existing: bool):
+    """Ensure that both new and existing databases are migrated to the latest
+    version of the schema."""
+
+    dbpath = tmp_path / "sessions.db"
+    if existing:
+        with closing(sqlite3.connect(dbpath)) as conn:
+            conn.executescript(OLD_SCHEMA)
+
+    # Initializing the database multiple times should be safe.
+    for _ in range(2):
+        with closing(sqlite3.connect(dbpath)) as conn:
+            init_db(conn)
+
+    with closing(sqlite3.connect(dbpath)) as conn:
+        (version,) = conn.execute("SELECT version FROM schema_version").fetchone()
+        assert version == SCHEMA_VERSION
+
+        indexes = {
+            row[1] for row in conn.execute("PRAGMA index_list('protocol')").fetchall()
+        }
+        assert {
+            "protocol_session_id",
+            "protocol_session_method",
+            "protocol_method",
+            "protocol_size",
+            "protocol_julianday",
+            "protocol_clients",
+            "protocol_log_messages",
+        } <= indexes
+
+        for view in ["logMessages", "sessions"]:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN SELECT * FROM {view}").fetchall()
+            assert not any(row[3] == "SCAN protocol" for row in plan), plan
+
+        # Log messages should be read from the index, rather than the message JSON.
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM logMessages").fetchall()
+        assert any("protocol_log_messages" in row[3] for row in plan), plan
+
+        log_messages = conn.execute("SELECT type, message FROM logMessages").fetchall()
+        assert log_messages == ([(3, "hi")] if existing else [])
+
+        requests = conn.execute("SELECT method, duration FROM requests").fetchall()
+        assert requests == (
+            [("initialize", pytest.approx(250.0, abs=1))] if existing else []
+        )
+
+        types = conn.execute("SELECT message_type FROM protocol").fetchall()
+        assert types == (
+            [("notification",), ("request",), ("request",), ("result",)]
+            if existing
+            else []
+        )
+
+        # Messages are only indexed for searching when they are first searched for.
+        search = "SELECT rowid FROM protocol_fts WHERE protocol_fts MATCH 'hi'"
+        assert conn.execute(search).fetchall() == []
+
+        update_search_index(conn)
+        assert conn.execute(search).fetchall() == ([(1,)] if existing else [])
+
+
+def test_init_db_concurrent(tmp_path: pathlib.Path):
+    """Ensure that multiple connections can safely initialize the same database at
+    the same time."""
+
+    dbpath = tmp_path / "sessions.db"
+    barrier = threading.Barrier(4)
+    errors: List[Exception] = []
+
+    def initialize():
+        with closing(sqlite3.connect(dbpath, timeout=10)) as conn:
+            barrier.wait()
+            try:
+                init_db(conn)
+            except Exception as exc:
+                errors.append(exc)
+
+    threads = [threading.Thread(target=initialize) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+
+    with closing(sqlite3.connect(dbpath)) as conn:
+        versions = conn.execute("SELECT version FROM schema_version").fetchall()
+        assert versions == [(SCHEMA_VERSION,)]
+
+
+def test_sql_handler_pairs_responses(tmp_path: pathlib.Path):
+    """Ensure that responses are paired with their requests as they are written."""
+
+    dbpath = tmp_path / "sessions.db"
+    handler = SqlHandler(dbpath, batch_size=2)
+
+    messages = [
+        ("client", "2024-01-01T00:00:00+00:00", dict(id=1, method="a", params={})),
+        ("server", "2024-01-01T00:00:00+00:00", dict(id=1, method="b", params={})),
+        ("client", "2024-01-01T00:00:01+00:00", dict(id=2, method="c", params={})),
+        ("client", "2024-01-01T00:00:02+00:00", dict(id=1, result=[1])),
+        ("server", "2024-01-01T00:00:03+00:00", dict(id=1, result=[1])),
+        ("server", "2024-01-01T00:00:04+00:00", dict(id=3, result=[1])),
+    ]
+    for source, timestamp, message in messages:
+        handler.handle_message(
+            LspMessage.from_rpc(
+                session="session", timestamp=timestamp, source=source, message=message
+            )
+        )
+
+    handler.close()
+
+    with closing(sqlite3.connect(dbpath)) as conn:
+        rows = conn.execute(
+            "SELECT rowid, method, request_rowid, duration_ms FROM protocol "
+            "WHERE result IS NOT NULL"
+        ).fetchall()
+
+    assert rows == [(4, "b", 2, 2000.0), (5, "a", 1, 3000.0), (6, None, None, None)]
+    assert len(handler._pairer.pending) == 1
+
+
+def test_sql_handler_write_error(tmp_path: pathlib.Path):
+    """Ensure that requests in a batch that could not be written are not paired with
+    later responses."""
+
+    dbpath = tmp_path / "sessions.db"
+    handler = SqlHandler(dbpath, batch_size=1)
+    pair = handler._pairer.pair
+
+    def fail_once(rowid, rows):
+        handler._pairer.pair = pair  # type: ignore[method-assign]
+        pair(rowid, rows)
+        raise RuntimeError("Unable to write messages")
+
+    handler._pairer.pair = fail_once  # type: ignore[method-assign]
+
+    messages = [
+        ("client", "2024-01-01T00:00:00+00:00", dict(id=1, method="a", params={})),
+        ("server", "2024-01-01T00:00:01+00:00", dict(id=1, result=[1])),
+    ]
+    for source, timestamp, message in messages:
+        handler.handle_message(
+            LspMessage.from_rpc(
+                session="session", timestamp=timestamp, source=source, message=message
+            )
+        )
+        handler.flush()
+
+    handler.close()
+
+    with closing(sqlite3.connect(dbpath)) as conn:
+        rows = conn.execute(
+            "SELECT rowid, method, request_rowid, duration_ms FROM protocol"
+        ).fetchall()
+
+    assert rows == [(1, None, None, None)]
+    assert len(handler._pairer.pending) == 0
+
+
+def test_pending_requests_transaction():
+    """Ensure that changes to the pending requests are undone if the transaction
+    fails."""
+
+    pending: PendingRequests = PendingRequests(maxsize=1)
+    pending.add("a", 1)
+
+    def add_and_fail():
+        with pending.transaction():
+            pending.add("b", 2)
+            raise RuntimeError("Unable to write messages")
+
+    with pytest.raises(RuntimeError):
+        add_and_fail()
+
+    assert list(pending.values()) == [1]
+    assert pending.evictions == 0
+
+    with pending.transaction():
+        pending.add("b", 2)
+
+    assert list(pending.values()) == [2]
+    assert pending.evictions == 1
+
+
+def test_request_pairer_shared_pending():
+    """Ensure that the pairer uses the given pending requests, even when empty."""
+
+    pending: PendingRequests = PendingRequests(maxsize=10)
+    pairer = RequestPairer(pending)
+
+    pairer.pair(1, [("session", "2024-01-01T00:00:00", "client", "1", "a", None)])
+
+    assert pairer.pending is pending
+    assert len(pending) == 1
+
+
+@pytest.mark.parametrize("storage", ["raw", "compressed"])
+def test_sql_handler_raw_storage(
+    tmp_path: pathlib.Path, storage: str, monkeypatch: pytest.MonkeyPatch
+):
+    """Ensure that message bodies can be stored as they were received, indexed using
+    the already decoded message."""
+
+    def peek_message(*args, **kwargs):
+        raise AssertionError("message body should not be peeked at")
+
+    monkeypatch.setattr(sql, "peek_message", peek_message)
+
+    dbpath = tmp_path / "sessions.db"
+    handler = SqlHandler(dbpath, storage=storage)  # type: ignore[arg-type]
+
+    bodies = [
+        b'{"jsonrpc":"2.0","params":{"a":[1,{"b":"}"}]},"method":"example","id":1}',
+        b'{"jsonrpc":"2.0","id":1,"result":{"c":null}}',
+    ]
+    for source, body in zip(["client", "server"], bodies):
+        record = logging.LogRecord(
+            "example", logging.INFO, "", 0, "%s", json.loads(body), None
+        )
+        record.__dict__.update(
+            {
+                "Message-Session": "session",
+                "Message-Timestamp": "2024-01-01T00:00:00+00:00",
+                "Message-Source": source,
+                "Message-Header-Size": "21",
+                "Message-Body": memoryview(b"Content-Length: 1\r\n\r\n" + body)[21:],
+            }
+        )
+        handler.handle(record)
+
+    handler.close()
+
+    with closing(sqlite3.connect(dbpath)) as conn:
+        rows = conn.execute(
+            "SELECT id, method, params, result, body, body_encoding, request_rowid, "
+            "size, header_size FROM protocol"
+        ).fetchall()
+
+    assert [row[:4] for row in rows] == [
+        ("1", "example", None, None),
+        ("1", "example", None, None),
+    ]
+    assert [row[6] for row in rows] == [None, 1]
+    assert [row[7:] for row in rows] == [(len(body), 21) for body in bodies]
+    assert [decode_body(row[4], row[5]) for row in rows] == [
+        json.loads(body) for body in bodies
+    ]
+
+    if storage == "raw":
+        assert [row[4] for row in rows] == [body.decode("utf8") for body in bodies]
+    else:
+        assert {row[5] for row in rows} == {"zlib"}
+
+
+def test_sql_handler_sizes(tmp_path: pathlib.Path):
+    """Ensure that the size of each message is recorded, where known."""
+
+    dbpath = tmp_path / "sessions.db"
+    handler = SqlHandler(dbpath)
+
+    sizes = [{"Content-Length": "42", "Message-Header-Size": "21"}, {}]
+    for extra in sizes:
+        record = logging.LogRecord(
+            "example",
+            logging.INFO,
+            "",
+            0,
+            "%s",
+            dict(jsonrpc="2.0", method="exit"),
+            None,
+        )
+        record.__dict__.update(
+            {
+                "Message-Session": "session",
+                "Message-Timestamp": "2024-01-01T00:00:00+00:00",
+                "Message-Source": "client",
+                **extra,
+            }
+        )
+        handler.handle(record)
+
+    handler.close()
+
+    with closing(sqlite3.connect(dbpath)) as conn:
+        rows = conn.execute("SELECT size, header_size FROM protocol").fetchall()
+
+    assert rows == [(42, 21), (None, None)]
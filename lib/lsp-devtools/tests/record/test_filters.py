@@ -1,10 +1,14 @@
 import itertools
+import json
 import logging
+from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Tuple
 
 import pytest
 
+from lsp_devtools.codec import peek_message
 from lsp_devtools.record.filters import LSPFilter
 
 
@@ -99,7 +103,7 @@ def test_filter_included_message_types(message: dict, setup: Tuple[List[str], bo
     record.__dict__["Message-Source"] = "client"
 
     lsp = LSPFilter(include_message_types=message_types)
-    lsp._response_method_map["1"] = ""
+    lsp._response_method_map.add("1", "")
 
     assert lsp.filter(record) is expected
 
@@ -172,7 +176,7 @@ def test_filter_excluded_message_types(message: dict, setup: Tuple[List[str], bo
     record.__dict__["Message-Source"] = "client"
 
     lsp = LSPFilter(exclude_message_types=message_types)
-    lsp._response_method_map["1"] = ""
+    lsp._response_method_map.add("1", "")
 
     assert lsp.filter(record) is expected
 
@@ -386,3 +390,144 @@ def test_filter_format_message():
 
     assert lsp.filter(record) is True
     assert record.msg == "file:///path/to/file.txt"
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    [(None, True), ("99", False), ("100", True), ("101", True)],
+)
+def test_filter_min_size(size: Optional[str], expected: bool):
+    """Ensure that we can filter out messages smaller than a given size, including
+    any messages of unknown size."""
+
+    lsp = LSPFilter(min_size=100)
+
+    message = dict(id="1", method="initialize", params={})
+    record = logging.LogRecord("example", logging.INFO, "", 0, "%s", message, None)
+    record.__dict__["Message-Source"] = "client"
+    if size is not None:
+        record.__dict__["Content-Length"] = size
+
+    assert lsp.filter(record) is expected
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({"Content-Length": "2048", "Message-Header-Size": "22"}, "exit 2.0KiB 2070"),
+        ({"Content-Length": "2048"}, None),
+        ({}, None),
+    ],
+)
+def test_filter_format_message_sizes(headers: Dict[str, str], expected: Optional[str]):
+    """Ensure that the size of a message can be included in formatted messages and
+    that messages are skipped if it is unknown."""
+
+    lsp = LSPFilter(formatter="{.method} {.$size|bytes} {.$wire_size}")
+
+    message = dict(jsonrpc="2.0", method="exit")
+    record = logging.LogRecord("example", logging.INFO, "", 0, "%s", message, None)
+    record.__dict__.update({"Message-Source": "client", **headers})
+
+    assert lsp.filter(record) is (expected is not None)
+    if expected is not None:
+        assert record.msg == expected
+
+
+def test_filter_forgets_answered_requests():
+    """Ensure that the filter stops tracking requests once they have been
+    answered."""
+
+    lsp = LSPFilter(max_pending_requests=2)
+
+    for source, message in [
+        ("client", dict(id="1", method="textDocument/completion", params={})),
+        ("server", dict(id="1", result={})),
+        ("client", dict(id="2", method="textDocument/hover", params={})),
+        ("client", dict(id="3", method="textDocument/hover", params={})),
+        ("client", dict(id="4", method="textDocument/hover", params={})),
+    ]:
+        record = logging.LogRecord("example", logging.INFO, "", 0, "%s", message, None)
+        record.__dict__["Message-Source"] = source
+        lsp.filter(record)
+
+    assert lsp.stats == {"pending": 2, "evictions": 1}
+
+
+def test_filter_request_ids_per_source():
+    """Ensure that requests from the client and server with the same id are tracked
+    separately."""
+
+    lsp = LSPFilter(include_methods=["textDocument/hover"])
+
+    results = []
+    for source, message in [
+        ("client", dict(id=1, method="textDocument/hover", params={})),
+        ("server", dict(id=1, method="workspace/configuration", params={})),
+        ("client", dict(id=1, result=[{}])),
+        ("server", dict(id=1, result={})),
+    ]:
+        record = logging.LogRecord("example", logging.INFO, "", 0, "%s", message, None)
+        record.__dict__["Message-Source"] = source
+        results.append(lsp.filter(record))
+
+    assert results == [True, False, False, True]
+    assert lsp.stats["pending"] == 0
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        dict(exclude_methods=["textDocument/semanticTokens/full"]),
+        dict(include_methods=["initialize"]),
+        dict(exclude_message_types=["notification", "result"]),
+        dict(include_message_types=["request"]),
+        dict(message_source="server"),
+        dict(message_source="server", include_methods=["textDocument/hover"]),
+        dict(message_source="client", include_message_types=["result"]),
+        dict(min_size=50),
+        dict(min_size=50, include_methods=["initialize"]),
+    ],
+)
+def test_prefilter(options: dict):
+    """Ensure that the prefilter agrees with the full filter."""
+
+    messages = [
+        ("client", dict(id=1, method="initialize", params={})),
+        ("server", dict(id=1, result={})),
+        ("client", dict(method="initialized", params={})),
+        ("client", dict(id=2, method="textDocument/semanticTokens/full", params={})),
+        ("server", dict(id=2, result=dict(data=[1, 2, 3]))),
+        ("server", dict(method="$/progress", params={})),
+        ("client", dict(id=3, method="textDocument/hover", params={})),
+        ("server", dict(id=1, method="workspace/configuration", params={})),
+        ("server", dict(id=3, result=None)),
+        ("client", dict(id=1, result=[{}])),
+        ("client", dict(id=4, method="shutdown")),
+        ("server", dict(id=4, result=None)),
+    ]
+
+    expected = []
+    lsp = LSPFilter(**options)
+    for source, message in messages:
+        body = json.dumps(message).encode()
+        record = logging.LogRecord("example", logging.INFO, "", 0, "%s", message, None)
+        record.__dict__["Message-Source"] = source
+        record.__dict__["Content-Length"] = str(len(body))
+        expected.append(lsp.filter(record))
+
+    actual = []
+    lsp = LSPFilter(**options)
+    for source, message in messages:
+        body = json.dumps(message).encode()
+        if not lsp.prefilter(source, peek_message(body), len(body)):
+            actual.append(False)
+            continue
+
+        record = logging.LogRecord("example", logging.INFO, "", 0, "%s", message, None)
+        record.__dict__["Message-Source"] = source
+        record.__dict__["Content-Length"] = str(len(body))
+        actual.append(lsp.filter(record))
+
+    assert actual == expected
+    assert lsp.stats["pending"] == 0
@@ -1,6 +1,7 @@
 import pytest
 
 from lsp_devtools.record.formatters import FormatString
+from lsp_devtools.record.formatters import format_bytes
 
 
 @pytest.mark.parametrize(
@@ -140,6 +141,23 @@ from lsp_devtools.record.formatters import FormatString
             },
             "- one\n- two",
         ),
+        (
+            "{.result.a.b.items[, ].labels[0]}",
+            {"result": {"a": {"b": {"items": [{"labels": ["x"]}, {"labels": ["y"]}]}}}},
+            "x, y",
+        ),
+        (
+            "{.result.items[; ].children[,].name} (100%)",
+            {
+                "result": {
+                    "items": [
+                        {"children": [{"name": "a"}, {"name": "b"}]},
+                        {"children": [{"name": "c"}]},
+                    ]
+                }
+            },
+            "a,b; c (100%)",
+        ),
         (
             '{{"clientInfo": {.params.clientInfo}, '
             '"capabilities": {.params.capabilities}}}',
@@ -165,3 +183,31 @@ def test_format_string(pattern: str, message: dict, expected: str):
 
     fmt = FormatString(pattern)
     assert expected == fmt.format(message)
+
+
+def test_format_string_metadata():
+    """Ensure that values can be selected from a message's metadata."""
+
+    fmt = FormatString("{.method}: {.$size} ({.$size|bytes})")
+    message = {"method": "textDocument/completion"}
+
+    result = fmt.format(message, {"size": 1536})
+    assert result == "textDocument/completion: 1536 (1.5KiB)"
+
+    with pytest.raises(KeyError):
+        fmt.format(message)
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    [
+        (0, "0B"),
+        (1023, "1023B"),
+        (1024, "1.0KiB"),
+        (5 * 1024**2, "5.0MiB"),
+        (3 * 1024**3, "3.0GiB"),
+    ],
+)
+def test_format_bytes(size: int, expected: str):
+    """Ensure that sizes are formatted correctly."""
+    assert format_bytes(size) == expected
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import argparse
+import json
 import logging
 import typing
 
 import pytest
 
+from lsp_devtools import codec
 from lsp_devtools.record import cli
+from lsp_devtools.record import log_message
 from lsp_devtools.record import setup_file_output
 
 if typing.TYPE_CHECKING:
@@ -121,3 +124,46 @@ def test_file_output(
         logger.info("%s", message, extra={"Message-Source": "client"})
 
     assert log.read_text() == expected
+
+
+def test_log_message_prefilter(
+    tmp_path: pathlib.Path,
+    record: argparse.ArgumentParser,
+    logger: logging.Logger,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Ensure that messages excluded by the prefilter are skipped, without being
+    decoded."""
+    log = tmp_path / "log.json"
+    parsed_args = record.parse_args(
+        ["record", "--to-file", str(log), "-f", "{.method}", "--exclude-method", "b"]
+    )
+
+    lsp_filter = setup_file_output(parsed_args, logger)
+
+    decoded = []
+    loads = codec.loads
+
+    def record_loads(data, *args, **kwargs):
+        result = loads(data, *args, **kwargs)
+        if isinstance(result, dict):
+            decoded.append(result["method"])
+
+        return result
+
+    monkeypatch.setattr(codec, "loads", record_loads)
+
+    for method in ["a", "b", "c"]:
+        params = dict(token="1", value=dict(kind="report", message="[{"))
+        body = json.dumps(dict(jsonrpc="2.0", params=params, method=method))
+        message = "".join(
+            [
+                "Message-Source: client\r\n",
+                f"Content-Length: {len(body)}\r\n\r\n",
+                body,
+            ]
+        )
+        log_message(logger, message.encode(), prefilter=lsp_filter)
+
+    assert log.read_text() == "a\nc\n"
+    assert decoded == ["a", "c"]
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import json
+import math
+import pathlib
+import sqlite3
+import sys
+import typing
+from contextlib import closing
+
+import pytest
+
+from lsp_devtools.cli import main
+from lsp_devtools.handlers.sql import INSERT_MESSAGE
+from lsp_devtools.handlers.sql import RequestPairer
+from lsp_devtools.handlers.sql import init_db
+from lsp_devtools.handlers.sql import message_row
+from lsp_devtools.handlers.sql import raw_message_row
+from lsp_devtools.replay import Replayer
+from lsp_devtools.replay import ReplayReport
+from lsp_devtools.replay import load_recording
+from lsp_devtools.replay import plan_replay
+from lsp_devtools.replay.recording import RecordedMessage
+from lsp_devtools.replay.recording import Recording
+from lsp_devtools.replay.recording import load_jsonl
+from lsp_devtools.replay.replayer import ReplayRequest
+
+if typing.TYPE_CHECKING:
+    from typing import Any
+    from typing import Dict
+    from typing import List
+    from typing import Tuple
+
+    Message = Tuple[str, str, Dict[str, Any]]
+
+SERVER = pathlib.Path(__file__).parent.parent / "servers" / "configuration.py"
+
+HOVER_PARAMS = dict(
+    textDocument=dict(uri="file:///project/a.txt"),
+    position=dict(line=1, character=0),
+)
+
+MESSAGES: List[Message] = [
+    (
+        "2024-01-01T10:00:00+00:00",
+        "client",
+        dict(id=1, method="initialize", params=dict(processId=1, capabilities={})),
+    ),
+    (
+        "2024-01-01T10:00:00.050+00:00",
+        "server",
+        dict(id=1, result={"capabilities": {}}),
+    ),
+    ("2024-01-01T10:00:00.060+00:00", "client", dict(method="initialized", params={})),
+    (
+        "2024-01-01T10:00:00.070+00:00",
+        "server",
+        dict(
+            id="cfg-1",
+            method="workspace/configuration",
+            params=dict(items=[dict(section="example")]),
+        ),
+    ),
+    (
+        "2024-01-01T10:00:00.080+00:00",
+        "client",
+        dict(id="cfg-1", result=[dict(greeting="Hello")]),
+    ),
+    (
+        "2024-01-01T10:00:00.090+00:00",
+        "client",
+        dict(id=2, method="textDocument/hover", params=HOVER_PARAMS),
+    ),
+    (
+        "2024-01-01T10:00:00.100+00:00",
+        "server",
+        dict(id=2, result=dict(contents="Hello, line 1")),
+    ),
+    ("2024-01-01T10:00:00.110+00:00", "client", dict(id=3, method="shutdown")),
+    ("2024-01-01T10:00:00.120+00:00", "server", dict(id=3, result=None)),
+    ("2024-01-01T10:00:00.130+00:00", "client", dict(method="exit")),
+]
+
+
+def write_db(path: pathlib.Path, storage: str, sessions: Tuple[str, ...] = ("s",)):
+    with closing(sqlite3.connect(path)) as conn:
+        init_db(conn)
+
+        rows = []
+        for session in sessions:
+            for timestamp, source, message in MESSAGES:
+                message = dict(jsonrpc="2.0", **message)
+                if storage == "columns":
+                    rows.append(message_row(session, timestamp, source, message))
+                else:
+                    body = json.dumps(message).encode("utf8")
+                    rows.append(
+                        raw_message_row(session, timestamp, source, body, storage)
+                    )
+
+        conn.executemany(INSERT_MESSAGE, RequestPairer().pair(1, rows))
+        conn.commit()
+
+
+@pytest.mark.parametrize("storage", ["columns", "raw", "compressed"])
+def test_load_sqlite(tmp_path: pathlib.Path, storage: str):
+    """Ensure that a session can be loaded from a database."""
+
+    dbpath = tmp_path / "sessions.db"
+    write_db(dbpath, storage)
+
+    recording = load_recording(dbpath)
+    assert recording.session == "s"
+    assert recording.has_timing
+    assert [m.source for m in recording.messages] == [s for _, s, _ in MESSAGES]
+    assert [m.message for m in recording.messages] == [
+        dict(jsonrpc="2.0", **m) for *_, m in MESSAGES
+    ]
+
+    timestamps = [m.timestamp for m in recording.messages]
+    assert timestamps[1] - timestamps[0] == pytest.approx(0.05)
+
+
+def test_load_sqlite_sessions(tmp_path: pathlib.Path):
+    """Ensure that the session to load must be given, if there is more than one."""
+
+    dbpath = tmp_path / "sessions.db"
+    write_db(dbpath, "columns", sessions=("a", "b"))
+
+    with pytest.raises(ValueError, match="2 sessions, please choose one of: a, b"):
+        load_recording(dbpath)
+
+    recording = load_recording(dbpath, session="b")
+    assert recording.session == "b"
+    assert len(recording.messages) == len(MESSAGES)
+
+
+def test_load_jsonl(tmp_path: pathlib.Path):
+    """Ensure that the source of each message is inferred when loading JSONL files."""
+
+    path = tmp_path / "messages.jsonl"
+    path.write_text("\n".join(json.dumps(m) for *_, m in MESSAGES) + "\n")
+
+    recording = load_jsonl(path)
+    assert not recording.has_timing
+    assert [m.source for m in recording.messages] == [s for _, s, _ in MESSAGES]
+
+
+def test_plan_replay():
+    """Ensure that each message waits for the responses seen before it was sent."""
+
+    recording = Recording(
+        [
+            RecordedMessage(source, dict(jsonrpc="2.0", **message), float(idx))
+            for idx, (_, source, message) in enumerate(MESSAGES)
+        ]
+    )
+    plan = plan_replay(recording)
+
+    assert [(s.message.get("method"), s.after, s.event) for s in plan.steps] == [
+        ("initialize", [], 0),
+        ("initialized", [0], None),
+        ("textDocument/hover", [1], 2),
+        ("shutdown", [2], 3),
+        ("exit", [3], None),
+    ]
+    assert {e: (r.method, r.original_ms) for e, r in plan.requests.items()} == {
+        0: ("initialize", 1000),
+        2: ("textDocument/hover", 1000),
+        3: ("shutdown", 1000),
+    }
+    assert list(plan.replies["workspace/configuration"]) == [
+        (1, dict(result=[dict(greeting="Hello")]))
+    ]
+
+
+def test_prepare_rewrites_ids():
+    """Ensure that request ids are rewritten, along with any references to them."""
+
+    recording = Recording(
+        [
+            RecordedMessage("client", dict(id="abc", method="a", params={})),
+            RecordedMessage("client", dict(id=7, method="b", params={})),
+            RecordedMessage("client", dict(method="$/cancelRequest", params={"id": 7})),
+        ]
+    )
+    replayer = Replayer(recording, ["server"])
+    messages = [replayer._prepare(step) for step in replayer.plan.steps]
+
+    assert [m.get("id") for m in messages] == [1, 2, None]
+    assert messages[2]["params"] == {"id": 2}
+    assert recording.messages[2].message["params"] == {"id": 7}
+
+
+def test_report_regressions():
+    """Ensure that changes in latency are reported per method."""
+
+    report = ReplayReport(
+        [
+            ReplayRequest("a", original_ms=10, replay_ms=20),
+            ReplayRequest("a", original_ms=10, replay_ms=20, error=True),
+            ReplayRequest("b", original_ms=10, replay_ms=10.5),
+            ReplayRequest("c", original_ms=10),
+        ]
+    )
+    methods = {m["method"]: m for m in report.to_dict()["methods"]}
+
+    assert methods["a"]["errors"] == 1
+    assert methods["a"]["p50"]["change_pct"] == pytest.approx(100, rel=0.05)
+    assert methods["c"]["missing"] == 1
+    assert methods["c"]["p50"]["change_pct"] is None
+    assert [m.method for m in report.regressions(10)] == ["a"]
+    assert report.regressions(200) == []
+
+
+@pytest.mark.asyncio
+async def test_replay(tmp_path: pathlib.Path):
+    """Ensure that a recorded session can be replayed against a server, answering the
+    server's requests from the recording."""
+
+    dbpath = tmp_path / "sessions.db"
+    write_db(dbpath, "columns")
+
+    replayer = Replayer(
+        load_recording(dbpath), [sys.executable, str(SERVER)], speed=10, timeout=10
+    )
+    report = await replayer.run()
+
+    assert set(report.methods) == {"initialize", "textDocument/hover", "shutdown"}
+    assert (report.total.requests, report.total.errors, report.total.missing) == (
+        3,
+        0,
+        0,
+    )
+
+    hover = report.methods["textDocument/hover"]
+    assert hover.original.max == pytest.approx(10, rel=0.05)
+    assert hover.replay.count == 1
+    assert replayer.server is not None
+    assert replayer.server.returncode is not None
+
+
+def test_replay_cli(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, capsys):
+    """Ensure that the replay command reports the change in latency as JSON."""
+
+    path = tmp_path / "messages.jsonl"
+    path.write_text("\n".join(json.dumps(m) for *_, m in MESSAGES) + "\n")
+
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "lsp-devtools",
+            "replay",
+            str(path),
+            "--format",
+            "json",
+            "--max-regression",
+            "0",
+            "--timeout",
+            "10",
+            "--",
+            sys.executable,
+            str(SERVER),
+        ],
+    )
+    assert main() == 0
+
+    captured = capsys.readouterr()
+    assert "replaying as fast as possible" in captured.err
+
+    report = json.loads(captured.out)
+    assert report["total"]["requests"] == 3
+    assert report["total"]["errors"] == 0
+    assert report["total"]["p50"]["original_ms"] is None
+
+
+def test_replay_cli_missing_command(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, capsys
+):
+    """Ensure that the server command is required."""
+
+    monkeypatch.setattr(sys, "argv", ["lsp-devtools", "replay", str(tmp_path)])
+    assert main() == 1
+    assert "Missing server start command" in capsys.readouterr().err
+
+
+def test_speed_option():
+    """Ensure that replay speeds are parsed."""
+    from lsp_devtools.replay import parse_speed
+
+    assert parse_speed("10x") == 10
+    assert parse_speed("0.5") == 0.5
+    assert parse_speed("max") == math.inf
@@ -0,0 +1,30 @@
+"""A language server that requests its configuration from the client."""
+
+from lsprotocol import types
+from pygls.server import LanguageServer
+
+server = LanguageServer("configuration-server", "v1")
+server.config = None
+
+
+@server.feature(types.INITIALIZED)
+async def _(ls: LanguageServer, params: types.InitializedParams):
+    ls.config = await ls.get_configuration_async(
+        types.WorkspaceConfigurationParams(
+            items=[types.ConfigurationItem(section="example")]
+        )
+    )
+
+
+@server.feature(types.TEXT_DOCUMENT_HOVER)
+def _(ls: LanguageServer, params: types.HoverParams):
+    if ls.config is None:
+        raise RuntimeError("Configuration not received")
+
+    return types.Hover(
+        contents=f"{ls.config[0]['greeting']}, line {params.position.line}"
+    )
+
+
+if __name__ == "__main__":
+    server.start_io()
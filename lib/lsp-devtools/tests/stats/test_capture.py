@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import sys
+import typing
+from contextlib import closing
+
+import pytest
+
+from lsp_devtools import codec
+from lsp_devtools.cli import main
+from lsp_devtools.handlers.sql import INSERT_MESSAGE
+from lsp_devtools.handlers.sql import RequestPairer
+from lsp_devtools.handlers.sql import init_db
+from lsp_devtools.handlers.sql import message_row
+from lsp_devtools.handlers.sql import raw_message_row
+from lsp_devtools.stats.capture import MessageInfo
+from lsp_devtools.stats.capture import read_jsonl
+from lsp_devtools.stats.capture import read_sqlite
+from lsp_devtools.stats.capture import summarise
+
+if typing.TYPE_CHECKING:
+    import pathlib
+    from typing import Any
+    from typing import Dict
+    from typing import List
+    from typing import Tuple
+
+    Message = Tuple[str, str, str, Dict[str, Any]]
+
+
+MESSAGES: List[Message] = [
+    (
+        "a",
+        "2024-01-01T10:00:00+00:00",
+        "client",
+        dict(id=1, method="initialize", params=dict(rootUri="file:///project")),
+    ),
+    (
+        "a",
+        "2024-01-01T10:00:00.500+00:00",
+        "client",
+        dict(id=2, method="textDocument/hover", params=dict(line=1)),
+    ),
+    ("a", "2024-01-01T10:00:01+00:00", "server", dict(id=1, result=dict(ok=True))),
+    (
+        "a",
+        "2024-01-01T10:00:01.200+00:00",
+        "server",
+        dict(method="window/logMessage", params=dict(type=3, message="hello world")),
+    ),
+    (
+        "a",
+        "2024-01-01T10:00:02.500+00:00",
+        "server",
+        dict(id=2, error=dict(code=-32603, message="oops")),
+    ),
+    (
+        "b",
+        "2024-01-01T10:00:03+00:00",
+        "client",
+        dict(id=1, method="textDocument/hover", params=dict(line=2)),
+    ),
+    ("b", "2024-01-01T10:00:03.100+00:00", "server", dict(id=1, result=None)),
+]
+
+
+def write_db(path: pathlib.Path, storage: str):
+    with closing(sqlite3.connect(path)) as conn:
+        init_db(conn)
+
+        rows = []
+        for session, timestamp, source, message in MESSAGES:
+            if storage == "columns":
+                rows.append(message_row(session, timestamp, source, message))
+            else:
+                body = json.dumps(message).encode("utf8")
+                rows.append(raw_message_row(session, timestamp, source, body, storage))
+
+        conn.executemany(INSERT_MESSAGE, RequestPairer().pair(1, rows))
+        conn.commit()
+
+
+def write_jsonl(path: pathlib.Path):
+    path.write_text("\n".join(json.dumps(message) for *_, message in MESSAGES) + "\n\n")
+
+
+@pytest.mark.parametrize("storage", ["columns", "raw", "compressed"])
+def test_read_sqlite(tmp_path: pathlib.Path, storage: str):
+    """Ensure that messages can be read from a database."""
+
+    dbpath = tmp_path / "sessions.db"
+    write_db(dbpath, storage)
+
+    messages = list(read_sqlite(dbpath))
+    assert [(m.session, m.method, m.message_type) for m in messages] == [
+        ("a", "initialize", "request"),
+        ("a", "textDocument/hover", "request"),
+        ("a", "initialize", "result"),
+        ("a", "window/logMessage", "notification"),
+        ("a", "textDocument/hover", "error"),
+        ("b", "textDocument/hover", "request"),
+        ("b", "textDocument/hover", "result"),
+    ]
+    assert [m.duration_ms for m in messages] == [
+        None,
+        None,
+        pytest.approx(1000),
+        None,
+        pytest.approx(2000),
+        None,
+        pytest.approx(100),
+    ]
+    assert messages[1].timestamp - messages[0].timestamp == pytest.approx(0.5)
+    assert all(m.size > 0 for m in messages[:-1])
+
+    # Raw and compressed bodies contain the complete message
+    if storage == "columns":
+        params = codec.dumps(dict(type=3, message="hello world"))
+        assert messages[3].size == len(params.encode("utf8"))
+    else:
+        assert messages[3].size == len(json.dumps(MESSAGES[3][3]).encode("utf8"))
+
+    messages = list(read_sqlite(dbpath, session="b"))
+    assert [m.session for m in messages] == ["b", "b"]
+
+
+def test_read_sqlite_old_schema(tmp_path: pathlib.Path):
+    """Ensure that databases without the latest columns can still be read."""
+
+    dbpath = tmp_path / "sessions.db"
+    with closing(sqlite3.connect(dbpath)) as conn:
+        conn.executescript(
+            """
+CREATE TABLE protocol (
+    session TEXT, timestamp REAL, source TEXT,
+    id TEXT NULL, method TEXT NULL, params TEXT NULL, result TEXT NULL,
+    error TEXT NULL
+);
+INSERT INTO protocol VALUES ('s', '', 'client', '1', 'initialize', '{}', NULL, NULL);
+INSERT INTO protocol VALUES ('s', '', 'server', '1', NULL, NULL, '{}', NULL);
+INSERT INTO protocol VALUES ('s', '', 'server', NULL, 'exit', NULL, NULL, NULL);
+INSERT INTO protocol VALUES ('s', '', 'server', '2', NULL, NULL, NULL, '{}');
+"""
+        )
+        conn.commit()
+
+    messages = list(read_sqlite(dbpath))
+    assert [m.message_type for m in messages] == [
+        "request",
+        "result",
+        "notification",
+        "error",
+    ]
+    assert [m.timestamp for m in messages] == [None] * 4
+
+
+def test_read_jsonl(tmp_path: pathlib.Path):
+    """Ensure that messages can be read from a file written by ``record --to-file``."""
+
+    path = tmp_path / "messages.jsonl"
+    write_jsonl(path)
+
+    messages = list(read_jsonl(path))
+    assert [(m.id, m.method, m.message_type) for m in messages] == [
+        (1, "initialize", "request"),
+        (2, "textDocument/hover", "request"),
+        (1, "initialize", "result"),
+        (None, "window/logMessage", "notification"),
+        (2, "textDocument/hover", "error"),
+        (1, "textDocument/hover", "request"),
+        (1, "textDocument/hover", "result"),
+    ]
+    assert all(m.timestamp is None and m.duration_ms is None for m in messages)
+
+
+def test_summarise_slowest():
+    """Ensure that only the slowest requests are kept, slowest first."""
+
+    messages = [
+        MessageInfo(
+            session="s",
+            timestamp=float(idx),
+            source="server",
+            id=idx,
+            method="a",
+            message_type="result",
+            size=10,
+            duration_ms=float(duration),
+        )
+        for idx, duration in enumerate([5, 50, 1, 20, 50, 30, 2])
+    ]
+
+    summary = summarise(messages, slowest=3)
+    assert [(r.id, r.duration_ms) for r in summary.slowest_requests()] == [
+        (1, 50.0),
+        (4, 50.0),
+        (5, 30.0),
+    ]
+    assert summary.peak_rate == 1
+    assert summary.duration == 6.0
+
+    summary = summarise(messages, slowest=0)
+    assert summary.slowest_requests() == []
+
+
+def run_stats(monkeypatch: pytest.MonkeyPatch, *args: str):
+    monkeypatch.setattr(sys, "argv", ["lsp-devtools", "stats", *args])
+    monkeypatch.setenv("COLUMNS", "200")
+    return main()
+
+
+def test_stats_json(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, capsys):
+    """Ensure that a capture can be summarised as JSON."""
+
+    dbpath = tmp_path / "sessions.db"
+    write_db(dbpath, "columns")
+
+    run_stats(monkeypatch, str(dbpath), "--format", "json", "--slowest", "2")
+    summary = json.loads(capsys.readouterr().out)
+
+    assert summary["sessions"] == 2
+    assert summary["duration_s"] == pytest.approx(3.1)
+    assert summary["peak_rate"] == 2
+    assert summary["total"]["messages"] == 7
+
+    methods = {m["method"]: m for m in summary["methods"]}
+    assert list(methods) == ["textDocument/hover", "initialize", "window/logMessage"]
+
+    hover = methods["textDocument/hover"]
+    assert (hover["requests"], hover["results"], hover["errors"]) == (2, 1, 1)
+    assert hover["latency_ms"]["max"] == pytest.approx(2000)
+    assert hover["latency_ms"]["p50"] == pytest.approx(100, rel=0.01)
+    assert hover["rate"] == pytest.approx(4 / 3.1)
+
+    assert [(r["method"], r["session"]) for r in summary["slowest"]] == [
+        ("textDocument/hover", "a"),
+        ("initialize", "a"),
+    ]
+
+
+@pytest.mark.parametrize("filename", ["sessions.db", "messages.jsonl"])
+def test_stats_table(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, capsys, filename: str
+):
+    """Ensure that a capture can be summarised as a table, detecting its format."""
+
+    path = tmp_path / filename
+    if filename.endswith(".db"):
+        write_db(path, "raw")
+    else:
+        write_jsonl(path)
+
+    run_stats(monkeypatch, str(path))
+    output = capsys.readouterr().out
+
+    assert "7 messages" in output
+    assert "textDocument/hover" in output
+    assert ("Slowest requests" in output) == filename.endswith(".db")
+
+
+def test_stats_missing_file(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, capsys
+):
+    """Ensure that a missing capture is reported."""
+
+    path = tmp_path / "missing.db"
+    assert run_stats(monkeypatch, str(path)) == 1
+    assert f"No such file: {path}" in capsys.readouterr().err
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import math
+import random
+
+import pytest
+
+from lsp_devtools.stats import Histogram
+from lsp_devtools.stats import LatencyStats
+from lsp_devtools.stats import Timeline
+
+
+def exact_quantile(values, q: float) -> float:
+    return sorted(values)[max(math.ceil(q * len(values)) - 1, 0)]
+
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.05])
+def test_histogram_quantiles(accuracy: float):
+    """Ensure that quantiles are estimated to within the requested accuracy."""
+    rng = random.Random(1234)
+    values = [rng.lognormvariate(3, 1.5) for _ in range(10_000)]
+
+    histogram = Histogram(accuracy=accuracy)
+    for value in values:
+        histogram.add(value)
+
+    assert histogram.count == 10_000
+    assert histogram.max == max(values)
+    assert histogram.mean == pytest.approx(sum(values) / len(values))
+
+    for q in [0.0, 0.25, 0.5, 0.9, 0.99, 1.0]:
+        expected = exact_quantile(values, q)
+        assert histogram.quantile(q) == pytest.approx(expected, rel=accuracy)
+
+    # The number of buckets depends on the range of values, not the number of them
+    assert len(histogram._buckets) < 2000
+
+
+def test_histogram_zeros():
+    """Ensure that zeros are counted."""
+    histogram = Histogram()
+    assert math.isnan(histogram.quantile(0.5))
+
+    for value in [0, 0, 0, 10]:
+        histogram.add(value)
+
+    assert histogram.quantile(0.5) == 0
+    assert histogram.quantile(1) == pytest.approx(10, rel=0.01)
+
+
+def test_histogram_merge():
+    """Ensure that histograms can be combined."""
+    a, b = Histogram(), Histogram()
+    for value in range(1, 51):
+        a.add(value)
+
+    for value in range(51, 101):
+        b.add(value)
+
+    a.merge(b)
+    assert a.count == 100
+    assert a.min == 1
+    assert a.max == 100
+    assert a.quantile(0.5) == pytest.approx(50, rel=0.01)
+
+    with pytest.raises(ValueError):
+        a.merge(Histogram(accuracy=0.1))
+
+
+def test_timeline():
+    """Ensure that the timeline tracks the mean value in each interval."""
+    timeline = Timeline(interval=1.0, length=4)
+    assert timeline.values() == []
+
+    timeline.add(10.1, 1)
+    timeline.add(10.5, 3)
+    timeline.add(12.0, 5)
+    assert timeline.values() == [2, 0, 5]
+
+    # Late values are ignored
+    timeline.add(11.0, 100)
+    assert timeline.values() == [2, 0, 5]
+
+    timeline.add(14.0, 7)
+    assert timeline.values() == [0, 5, 0, 7]
+
+    timeline.add(100.0, 1)
+    assert timeline.values() == [0, 0, 0, 1]
+
+
+def test_latency_stats():
+    """Ensure that latency statistics are tracked per method."""
+    stats = LatencyStats()
+
+    stats.add("a", 0.0, 10)
+    stats.add("a", 1.0, 20)
+    stats.add("b", 1.5, 100)
+    stats.add(None, 2.0, 1)
+
+    assert stats.version == 4
+    assert list(stats.methods) == ["a", "b", "<unknown>"]
+    assert stats.methods["a"].latency.count == 2
+    assert stats.methods["a"].latency.max == 20
+    assert stats.total.latency.count == 4
+    assert stats.total.timeline.values() == [10, 60, 1]
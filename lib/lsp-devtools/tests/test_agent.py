@@ -1,13 +1,22 @@
+import argparse
 import asyncio
 import json
 import os
 import pathlib
 import subprocess
 import sys
+from datetime import datetime
+from datetime import timezone
+from typing import List
 
 import pytest
 
 from lsp_devtools.agent import Agent
+from lsp_devtools.agent import CaptureQueue
+from lsp_devtools.agent import MessageFramer
+from lsp_devtools.agent import cli
+from lsp_devtools.agent import parse_rpc_message
+from lsp_devtools.handlers import message_sizes
 
 SERVER_DIR = pathlib.Path(__file__).parent / "servers"
 
@@ -29,8 +38,9 @@ def echo_handler(d: bytes):
     sys.stdout.flush()
 
 
+@pytest.mark.parametrize("splice", [False, True])
 @pytest.mark.asyncio
-async def test_agent_exits():
+async def test_agent_exits(splice: bool):
     """Ensure that when the client closes down the lsp session and the server process
     exits, the agent does also."""
 
@@ -50,6 +60,7 @@ async def test_agent_exits():
         os.fdopen(stdin_read, mode="rb"),
         os.fdopen(stdout_write, mode="wb"),
         echo_handler,
+        splice=splice,
     )
 
     os.write(
@@ -84,3 +95,198 @@ async def test_agent_exits():
             raise RuntimeError("Server process did not exit") from exc
 
         exc.add_note("lsp-devtools agent did not stop")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 4096])
+def test_message_framer(chunk_size: int):
+    """Ensure that the message framer can reassemble messages, regardless of how the
+    underlying stream is split up."""
+
+    messages = [
+        format_message(dict(jsonrpc="2.0", id=1, method="initialize", params={})),
+        format_message(dict(jsonrpc="2.0", method="exit", params=None)),
+        format_message(dict(jsonrpc="2.0", id=1, result={"text": "a\r\n\r\nb" * 100})),
+    ]
+    data = b"".join(messages)
+
+    framer = MessageFramer()
+    result = []
+    for idx in range(0, len(data), chunk_size):
+        result.extend(framer.feed(data[idx : idx + chunk_size]))
+
+    assert result == messages
+    assert framer._buffer == b""
+
+
+def test_message_framer_extra_headers():
+    """Ensure that the message framer handles messages with additional headers."""
+
+    message = b"".join(
+        [
+            b"Message-Source: client\r\n",
+            b"Content-Type: application/vscode-jsonrpc; charset=utf-8\r\n",
+            format_message(dict(jsonrpc="2.0", method="exit", params=None)),
+        ]
+    )
+
+    framer = MessageFramer()
+    assert framer.feed(message * 2) == [message, message]
+
+
+def test_message_framer_invalid_headers():
+    """Ensure that the message framer skips over messages with invalid headers."""
+
+    message = format_message(dict(jsonrpc="2.0", method="exit", params=None))
+
+    framer = MessageFramer()
+    assert framer.feed(b"Not a header\r\n\r\n" + message) == [message]
+
+
+@pytest.mark.parametrize("length", [b"-5", b"abc", b"+2", b"1_0", b"", b"\xd9\xa2"])
+def test_message_framer_invalid_length(length: bytes):
+    """Ensure that the message framer skips over messages with an invalid
+    Content-Length."""
+
+    message = format_message(dict(jsonrpc="2.0", method="exit", params=None))
+
+    framer = MessageFramer()
+    invalid = b"Content-Length: " + length + b"\r\n\r\n"
+    assert framer.feed(invalid + message) == [message]
+
+
+def test_parse_rpc_message():
+    """Ensure that we can parse a JSON-RPC message."""
+
+    body = dict(jsonrpc="2.0", id=1, method="initialize", params={})
+    rpc = parse_rpc_message(b"Message-Source: client\r\n" + format_message(body))
+
+    assert rpc["Message-Source"] == "client"
+    assert rpc.body == body
+
+
+def test_agent_capture_message_sizes():
+    """Ensure that the agent records the size of each message it captures."""
+
+    captured: List[bytes] = []
+    agent = Agent(None, None, None, captured.append)  # type: ignore[arg-type]
+
+    message = b"".join(
+        [
+            b"Content-Type: application/vscode-jsonrpc; charset=utf-8\r\n",
+            format_message(dict(jsonrpc="2.0", method="exit", params=None)),
+        ]
+    )
+    agent.capture_message("client", datetime.now(tz=timezone.utc), message)
+
+    rpc = parse_rpc_message(captured[0])
+    body_size, header_size = message_sizes(rpc.headers)
+
+    assert body_size + header_size == len(message)
+    assert message[header_size:] == json.dumps(rpc.body).encode()
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"Content-Length: 2\r\n",
+        b"Content-Type: application/json\r\n\r\n{}",
+        b"Content-Length: 3\r\n\r\n{}",
+        b"Invalid\r\nContent-Length: 2\r\n\r\n{}",
+        b"Content-Length: -2\r\n\r\n{}",
+        b"Content-Length: +2\r\n\r\n{}",
+    ],
+)
+def test_parse_rpc_message_invalid(data: bytes):
+    """Ensure that we reject invalid messages."""
+
+    with pytest.raises(ValueError):
+        parse_rpc_message(data)
+
+
+@pytest.mark.parametrize(
+    "policy,expected",
+    [
+        ("drop-oldest", [3, 4]),
+        ("drop-newest", [1, 2]),
+    ],
+)
+@pytest.mark.asyncio
+async def test_capture_queue_overflow(policy: str, expected: List[int]):
+    """Ensure that the capture queue applies the given overflow policy."""
+
+    handled = []
+    queue = CaptureQueue(handled.append, maxsize=2, policy=policy)  # type: ignore
+
+    for idx in range(1, 5):
+        await queue.put((idx,))  # type: ignore
+
+    assert queue.captured == 4
+    assert queue.dropped == 2
+
+    task = asyncio.create_task(queue.run())
+    await asyncio.sleep(0)
+    task.cancel()
+
+    assert handled == expected
+
+
+@pytest.mark.asyncio
+async def test_capture_queue_block():
+    """Ensure that the capture queue can apply backpressure when full."""
+
+    handled = []
+    queue = CaptureQueue(handled.append, maxsize=1, policy="block")
+
+    await queue.put((1,))  # type: ignore
+    put = asyncio.create_task(queue.put((2,)))  # type: ignore
+
+    await asyncio.sleep(0)
+    assert not put.done()
+
+    task = asyncio.create_task(queue.run())
+    await asyncio.wait_for(put, timeout=1)
+    await asyncio.sleep(0)
+    task.cancel()
+
+    assert handled == [1, 2]
+    assert queue.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_capture_queue_drain():
+    """Ensure that draining the queue delivers queued messages, counting any that
+    could not be delivered in time as dropped."""
+
+    handled = []
+    queue = CaptureQueue(handled.append, maxsize=10)
+
+    for idx in range(3):
+        await queue.put((idx,))  # type: ignore
+
+    task = asyncio.create_task(queue.run())
+    await queue.drain(timeout=1)
+    task.cancel()
+
+    assert handled == [0, 1, 2]
+    assert queue.dropped == 0
+
+    # Without anything processing the queue, the remaining messages are dropped.
+    for idx in range(3):
+        await queue.put((idx,))  # type: ignore
+
+    await queue.drain(timeout=0.01)
+
+    assert len(queue) == 0
+    assert queue.captured == 6
+    assert queue.dropped == 3
+
+
+def test_agent_cli_drain_timeout():
+    """Ensure that the time spent draining the capture queue can be configured."""
+    parser = argparse.ArgumentParser()
+    cli(parser.add_subparsers())
+
+    assert parser.parse_args(["agent"]).drain_timeout == 2.0
+
+    args = parser.parse_args(["agent", "--splice", "--drain-timeout", "0.5"])
+    assert args.drain_timeout == 0.5
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import typing
+
+import pytest
+
+from lsp_devtools.agent import AgentClient
+from lsp_devtools.agent import MessageBuffer
+
+if typing.TYPE_CHECKING:
+    import pathlib
+    from typing import List
+
+
+def format_message(idx: int) -> bytes:
+    content = json.dumps(
+        dict(jsonrpc="2.0", method="example", params=dict(idx=f"{idx:04}"))
+    )
+    return f"Content-Length: {len(content)}\r\n\r\n{content}".encode()
+
+
+def drain(buffer: MessageBuffer) -> List[bytes]:
+    messages = []
+    while (message := buffer.popleft()) is not None:
+        messages.append(message)
+
+    return messages
+
+
+def test_message_buffer():
+    """Ensure that the message buffer returns messages in the order they were added."""
+
+    messages = [format_message(idx) for idx in range(10)]
+    buffer = MessageBuffer()
+
+    for message in messages:
+        buffer.append(message)
+
+    assert len(buffer) == 10
+    assert drain(buffer) == messages
+    assert len(buffer) == 0
+
+
+def test_message_buffer_bounded():
+    """Ensure that the message buffer drops the oldest messages once full."""
+
+    messages = [format_message(idx) for idx in range(10)]
+    buffer = MessageBuffer(max_size=len(messages[0]) * 3)
+
+    for message in messages:
+        buffer.append(message)
+
+    assert buffer.dropped == 7
+    assert drain(buffer) == messages[7:]
+
+
+@pytest.mark.parametrize("max_spill", [100, 4])
+def test_message_buffer_spill(tmp_path: pathlib.Path, max_spill: int):
+    """Ensure that the message buffer can spill messages to disk."""
+
+    messages = [format_message(idx) for idx in range(100)]
+    message_size = len(messages[0])
+
+    spill = tmp_path / "spill.bin"
+    buffer = MessageBuffer(
+        max_size=message_size * 3,
+        spill_path=spill,
+        max_spill_size=message_size * max_spill,
+    )
+
+    for message in messages:
+        buffer.append(message)
+
+    spilled = min(max_spill, 97)
+    assert buffer.dropped == 97 - spilled
+    assert drain(buffer) == [*messages[:spilled], *messages[-3:]]
+    assert spill.stat().st_size == 0
+
+    buffer.close()
+
+
+def test_message_buffer_spill_while_draining(tmp_path: pathlib.Path):
+    """Ensure that messages added while draining the buffer are kept in order."""
+
+    messages = [format_message(idx) for idx in range(10)]
+    message_size = len(messages[0])
+
+    buffer = MessageBuffer(max_size=message_size * 3, spill_path=tmp_path / "spill")
+    for message in messages[:5]:
+        buffer.append(message)
+
+    actual = [buffer.popleft()]
+    for message in messages[5:]:
+        buffer.append(message)
+
+    actual.extend(drain(buffer))
+    assert actual == messages
+    assert buffer.dropped == 0
+
+    buffer.close()
+
+
+def test_agent_client_buffer():
+    """Ensure that the client uses the buffer it is given, even when empty."""
+    buffer = MessageBuffer(max_size=1024)
+    client = AgentClient(buffer=buffer)
+
+    message = format_message(1)
+    client.forward_message(message)
+
+    assert len(buffer) == 1
+    assert drain(buffer) == [message]
+
+
+@pytest.mark.asyncio
+async def test_agent_client_read(monkeypatch: pytest.MonkeyPatch):
+    """Ensure that the client passes each complete message it receives onto its
+    protocol."""
+    messages = [format_message(idx) for idx in range(3)]
+    data = b"".join(messages)
+
+    async def send(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        for idx in range(0, len(data), 7):
+            writer.write(data[idx : idx + 7])
+            await writer.drain()
+
+        writer.close()
+
+    server = await asyncio.start_server(send, "localhost", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    received: List[bytes] = []
+    client = AgentClient()
+    monkeypatch.setattr(client.protocol, "data_received", received.append)
+
+    async with server:
+        await client.start_tcp("localhost", port)
+        await asyncio.wait_for(asyncio.gather(*client._async_tasks), timeout=5)
+
+    assert received == messages
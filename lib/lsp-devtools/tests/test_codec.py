@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from lsp_devtools import codec
+from lsp_devtools.codec import peek_message
+
+
+@pytest.fixture(params=list(codec.BACKENDS))
+def backend(request) -> codec.JsonBackend:
+    """Each of the available JSON backends."""
+    pytest.importorskip(request.param)
+    return codec.load_backend(request.param)
+
+
+MESSAGE = dict(
+    jsonrpc="2.0",
+    id=1,
+    method="textDocument/hover",
+    params=dict(
+        textDocument=dict(uri="file:///a/b/c.py"),
+        position=dict(line=1, character=2),
+        values=[1.5, None, True, "é"],
+    ),
+)
+
+
+def test_roundtrip(backend: codec.JsonBackend):
+    """Ensure that each backend can decode what it encodes."""
+    data = backend.dumps(MESSAGE)
+
+    assert isinstance(data, str)
+    assert json.loads(data) == MESSAGE
+    assert backend.loads(data) == MESSAGE
+    assert backend.loads(data.encode("utf8")) == MESSAGE
+
+
+def test_indent(backend: codec.JsonBackend):
+    """Ensure that indented output matches the standard library."""
+    assert backend.dumps(dict(a=[1], b={}), indent=2) == json.dumps(
+        dict(a=[1], b={}), indent=2
+    )
+
+
+def test_default(backend: codec.JsonBackend):
+    """Ensure that the ``default`` argument is used for unsupported types."""
+
+    class Point:
+        def __init__(self, x: int, y: int):
+            self.x = x
+            self.y = y
+
+    data = backend.dumps(dict(p=Point(1, 2)), default=lambda obj: obj.__dict__)
+    assert json.loads(data) == dict(p=dict(x=1, y=2))
+
+    with pytest.raises(TypeError):
+        backend.dumps(dict(p=Point(1, 2)))
+
+
+@pytest.mark.parametrize("data", ['{"a": 1', b"\xff", ""])
+def test_invalid(backend: codec.JsonBackend, data):
+    """Ensure that each backend raises a ``ValueError`` for invalid JSON."""
+    with pytest.raises(ValueError):
+        backend.loads(data)
+
+
+def test_load_backend_unknown():
+    """Ensure that an unknown backend is reported."""
+    with pytest.raises(ValueError, match="Unknown JSON backend"):
+        codec.load_backend("yaml")
+
+
+def test_set_backend():
+    """Ensure that the module level functions use the selected backend."""
+    original = codec.get_backend()
+
+    try:
+        codec.set_backend("json")
+        assert codec.get_backend().name == "json"
+        assert codec.dumps(dict(a=1)) == '{"a": 1}'
+    finally:
+        codec.set_backend(original.name)
+
+
+@pytest.mark.parametrize(
+    "body, fields, message_type",
+    [
+        (
+            b'{"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}',
+            dict(jsonrpc="2.0", id=1, method="initialize"),
+            "request",
+        ),
+        (
+            b'{"jsonrpc": "2.0", "params": {}, "method": "initialize", "id": 1}',
+            dict(jsonrpc="2.0", method="initialize", id=1),
+            "request",
+        ),
+        (
+            b'{"jsonrpc":"2.0","method":"exit"}',
+            dict(jsonrpc="2.0", method="exit"),
+            "notification",
+        ),
+        (
+            b'{"jsonrpc":"2.0","method":"$/progress","params":{}}',
+            dict(jsonrpc="2.0", method="$/progress"),
+            "notification",
+        ),
+        (
+            b'{"params":{"token":"a]}\\"","value":[{"kind":"end"}]},"method":"$/progress"}',
+            dict(method="$/progress"),
+            "notification",
+        ),
+        (
+            b'{"params":{"token":"a","value":[{"kind":"end"}],"method":"$/progress"',
+            dict(),
+            None,
+        ),
+        (
+            b'{"id": "a\\"b", "result": {"data": [1, 2, 3]}}',
+            dict(id='a"b'),
+            "result",
+        ),
+        (b'{"id": 2, "result": null}', dict(id=2, result=None), "result"),
+        (b'{"id": 2, "error": {"code": -1}}', dict(id=2), "error"),
+        (b'{"result": [], "id": 2}', dict(id=2), "result"),
+        (b"[]", dict(), None),
+    ],
+)
+def test_peek_message(body: bytes, fields: dict, message_type: str):
+    """Ensure that we can extract fields from a message without decoding it."""
+
+    peek = peek_message(b"Content-Length: 1\r\n\r\n" + body, start=21)
+
+    assert peek.fields == fields
+    assert peek.message_type == message_type
+
+
+LARGE_VALUE = json.dumps([dict(label=f"a[{i}", data=[i, "}"]) for i in range(1000)])
+
+
+@pytest.mark.parametrize(
+    "body, fields, message_type",
+    [
+        (
+            f'{{"id": 1, "result": {LARGE_VALUE}, "jsonrpc": "2.0"}}',
+            dict(id=1),
+            "result",
+        ),
+        (
+            f'{{"id": 1, "error": {{"code": 1, "data": {LARGE_VALUE}}}}}',
+            dict(id=1),
+            "error",
+        ),
+        (
+            f'{{"id": 1, "method": "a", "params": {LARGE_VALUE}}}',
+            dict(id=1, method="a"),
+            "request",
+        ),
+        (
+            f'{{"method": "a", "params": {LARGE_VALUE}, "jsonrpc": "2.0"}}',
+            dict(method="a"),
+            "notification",
+        ),
+        (
+            f'{{"method": "a", "params": {LARGE_VALUE}, "id": 1}}',
+            dict(method="a"),
+            None,
+        ),
+        (
+            f'{{"id": 1, "params": {LARGE_VALUE}, "method": "a"}}',
+            dict(id=1),
+            None,
+        ),
+    ],
+)
+def test_peek_message_large(body: str, fields: dict, message_type: str):
+    """Ensure that large values are not scanned when peeking at a message."""
+    assert len(LARGE_VALUE) > codec.SKIP_LIMIT
+
+    peek = peek_message(body.encode("utf8"))
+
+    assert peek.fields == fields
+    assert peek.message_type == message_type
+
+
+def test_skip_compound_limit():
+    """Ensure that truncating the search window within a string cannot end a
+    skipped value early."""
+    data = b'{"a": "' + b"x" * 10 + b'}"}'
+
+    assert codec.skip_compound(data, 0) == len(data)
+    assert codec.skip_compound(data, 0, limit=len(data) - 2) is None
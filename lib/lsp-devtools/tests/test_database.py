@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import typing
+
+import pytest
+from lsprotocol import types
+
+from lsp_devtools.agent import logger
+from lsp_devtools.client.lsp import LanguageClient
+from lsp_devtools.database import Database
+from lsp_devtools.database import DatabaseLogHandler
+from lsp_devtools.search import parse_query
+
+if typing.TYPE_CHECKING:
+    from typing import Any
+    from typing import List
+
+
+class FakeApp:
+    """Used to capture the messages posted by the database."""
+
+    def __init__(self):
+        self.messages: List[Any] = []
+
+    def post_message(self, message):
+        self.messages.append(message)
+
+
+@pytest.mark.asyncio
+async def test_add_message_batches():
+    """Ensure that messages added in quick succession are written in a single
+    batch."""
+
+    app = FakeApp()
+    db = Database()
+    db.app = app  # type: ignore[assignment]
+
+    for idx in range(1, 101):
+        await db.add_message(
+            "session",
+            "2024-01-01T00:00:00",
+            "client",
+            dict(jsonrpc="2.0", id=idx, method="example", params=dict(idx=idx)),
+        )
+
+    await db.flush()
+
+    assert len(app.messages) == 1
+    assert app.messages[0].max_row == 100
+
+    messages = await db.get_messages(max_row=50)
+    assert [m.params["idx"] for _, m in messages] == list(range(51, 101))
+
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_add_message_while_writing():
+    """Ensure that messages added while a batch is being written are not lost."""
+
+    app = FakeApp()
+    db = Database()
+    db.app = app  # type: ignore[assignment]
+
+    db.queue_message("session", "2024-01-01T00:00:00", "client", dict(id=1))
+    writer = db._writer
+
+    # Let the writer start the first batch
+    while len(db._pending) > 0:
+        await asyncio.sleep(0)
+
+    db.queue_message("session", "2024-01-01T00:00:00", "client", dict(id=2))
+    assert db._writer is writer
+
+    await db.flush()
+
+    assert [m.max_row for m in app.messages] == [1, 2]
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_add_message_pairs_responses():
+    """Ensure that responses are paired with their requests."""
+
+    db = Database()
+    await db.add_message(
+        "session",
+        "2024-01-01T00:00:00+00:00",
+        "client",
+        dict(jsonrpc="2.0", id=1, method="initialize", params={}),
+    )
+    await db.flush()
+
+    await db.add_message(
+        "session",
+        "2024-01-01T00:00:00.500+00:00",
+        "server",
+        dict(jsonrpc="2.0", id=1, result={"capabilities": {}}),
+    )
+    await db.flush()
+
+    messages = await db.get_messages()
+    assert [m.method for _, m in messages] == ["initialize", "initialize"]
+
+    async with db.cursor() as cursor:
+        await cursor.execute("SELECT method, duration FROM requests")
+        assert await cursor.fetchall() == [("initialize", 500.0)]
+
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_add_message_write_error():
+    """Ensure that an error writing one batch does not prevent later batches from
+    being written."""
+
+    app = FakeApp()
+    db = Database()
+    db.app = app  # type: ignore[assignment]
+
+    pair = db._pairer.pair
+
+    def fail_once(rowid, rows):
+        db._pairer.pair = pair  # type: ignore[method-assign]
+        pair(rowid, rows)
+        raise RuntimeError("Unable to write messages")
+
+    db._pairer.pair = fail_once  # type: ignore[method-assign]
+
+    request = dict(id=1, method="a", params={})
+    db.queue_message("session", "2024-01-01T00:00:00", "client", request)
+    await db.flush()
+    assert db._writer is None
+    assert len(db._pairer.pending) == 0
+
+    db.queue_message("session", "2024-01-01T00:00:00", "client", dict(id=2))
+    await db.flush()
+
+    assert [m.max_row for m in app.messages] == [1]
+
+    messages = await db.get_messages()
+    assert [m.id for _, m in messages] == ["2"]
+
+    await db.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["columns", "raw", "compressed"])
+async def test_queue_raw_message(storage: str):
+    """Ensure that messages can be queued as they were received, in each of the
+    storage modes."""
+
+    db = Database(storage=storage)  # type: ignore[arg-type]
+
+    db.queue_raw_message(
+        "session",
+        "2024-01-01T00:00:00",
+        "client",
+        b'{"jsonrpc": "2.0", "params": {"x": [1]}, "method": "example", "id": 1}',
+        header_size=22,
+    )
+    db.queue_raw_message(
+        "session", "2024-01-01T00:00:01", "server", b'{"id": 1, "result": [2]}'
+    )
+    await db.flush()
+
+    messages = [message for _, message in await db.get_messages()]
+    assert [(m.id, m.method, m.params, m.result) for m in messages] == [
+        ("1", "example", {"x": [1]}, None),
+        ("1", "example", None, [2]),
+    ]
+    assert [(m.size, m.header_size, m.wire_size) for m in messages] == [
+        (70, 22, 92),
+        (24, None, None),
+    ]
+
+    async with db.cursor() as cursor:
+        await cursor.execute("SELECT body IS NULL, body_encoding FROM protocol")
+        rows = await cursor.fetchall()
+
+    expected = {"columns": (1, None), "raw": (0, None), "compressed": (0, "zlib")}
+    assert rows == [expected[storage]] * 2
+
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_latency_stats():
+    """Ensure that latency statistics are updated as responses are paired."""
+
+    db = Database()
+    for idx in range(3):
+        db.queue_message(
+            "session",
+            f"2024-01-01T00:00:0{idx}+00:00",
+            "client",
+            dict(jsonrpc="2.0", id=idx, method="textDocument/hover", params={}),
+        )
+
+    db.queue_message(
+        "session",
+        "2024-01-01T00:00:01.250+00:00",
+        "server",
+        dict(jsonrpc="2.0", id=0, result=None),
+    )
+    await db.flush()
+
+    assert db.in_flight() == {"textDocument/hover": 2}
+
+    latency = db.stats.methods["textDocument/hover"].latency
+    assert latency.count == 1
+    assert latency.max == 1250.0
+
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_search_text():
+    """Ensure that the search index is brought up to date before searching for
+    messages by their content."""
+
+    db = Database()
+    query = parse_query("hello")
+
+    for idx, text in enumerate(["hello", "world", "hello world"]):
+        await db.add_message(
+            "session",
+            "2024-01-01T00:00:00",
+            "client",
+            dict(jsonrpc="2.0", method="example", params=dict(idx=idx, text=text)),
+        )
+        await db.flush()
+
+        if idx == 1:
+            assert await db.get_rowids(query=query) == [1]
+
+    assert await db.get_rowids(query=query) == [1, 3]
+
+    messages = await db.get_messages(query=parse_query("world"))
+    assert [rowid for rowid, _ in messages] == [2, 3]
+
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_client_message_sizes():
+    """Ensure that messages recorded by the client include their size on the wire."""
+
+    db = Database()
+    handler = DatabaseLogHandler(db)
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    class Transport:
+        def __init__(self):
+            self.written: List[bytes] = []
+
+        def write(self, data: bytes):
+            self.written.append(data)
+
+    try:
+        client = LanguageClient()
+        transport = Transport()
+        client.protocol.connection_made(transport)  # type: ignore[arg-type]
+
+        client.protocol.notify(types.INITIALIZED, types.InitializedParams())
+
+        body = b'{"jsonrpc": "2.0", "method": "$/progress", "params": {"token": 1}}'
+        header = f"Content-Length: {len(body)}\r\n\r\n".encode()
+        client.protocol.data_received(header + body)
+    finally:
+        logger.removeHandler(handler)
+
+    await db.flush()
+    messages = [message for _, message in await db.get_messages()]
+
+    (sent,) = transport.written
+    sent_header_size = sent.index(b"\r\n\r\n") + 4
+
+    assert [(m.source, m.method, m.size, m.header_size) for m in messages] == [
+        ("client", "initialized", len(sent) - sent_header_size, sent_header_size),
+        ("server", "$/progress", len(body), len(header)),
+    ]
+
+    await db.close()
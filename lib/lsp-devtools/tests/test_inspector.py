@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+import typing
+
+import pytest
+from textual import on
+from textual.app import App
+from textual.widgets import DataTable
+
+from lsp_devtools.database import Database
+from lsp_devtools.inspector import FilterBar
+from lsp_devtools.inspector import MessagesTable
+from lsp_devtools.inspector import MessageViewer
+from lsp_devtools.inspector import StatsPanel
+
+if typing.TYPE_CHECKING:
+    from typing import List
+
+
+class TableApp(App):
+    """Used to test the messages table in isolation."""
+
+    def __init__(self, db: Database, **kwargs):
+        super().__init__()
+        self.db = db
+        self.viewer = MessageViewer("")
+        self.table = MessagesTable(db, self.viewer, **kwargs)
+
+    def compose(self):
+        yield FilterBar(delay=0.01)
+        yield self.table
+        yield self.viewer
+
+    @on(FilterBar.Search)
+    def search_table(self, event: FilterBar.Search):
+        self.table.set_search(event.search)
+
+    def on_mount(self):
+        self.table.focus()
+
+
+async def make_db(count: int) -> Database:
+    db = Database()
+
+    for idx in range(1, count + 1):
+        db.queue_message(
+            "session",
+            f"2024-01-01T00:00:{idx % 60:02}",
+            "client",
+            dict(jsonrpc="2.0", method="example", params=dict(idx=idx)),
+        )
+
+    await db.flush()
+    return db
+
+
+@pytest.mark.asyncio
+async def test_messages_table_pages():
+    """Ensure that the table only loads the messages it needs to display."""
+
+    db = await make_db(1000)
+    app = TableApp(db, page_size=50, max_pages=3)
+
+    async with app.run_test(size=(80, 24)) as pilot:
+        table = app.table
+        await table.update()
+        await pilot.pause()
+        await app.workers.wait_for_complete()
+        await pilot.pause()
+
+        assert table.row_count == 1000
+        assert table.cursor_row == 999
+        assert table.scroll_offset.y == table.max_scroll_y
+        assert list(table._pages)[-1] == 19
+        assert table.get_message(999).params == dict(idx=1000)  # type: ignore
+
+        await pilot.press("home")
+        await pilot.pause()
+        await app.workers.wait_for_complete()
+        await pilot.pause()
+
+        assert table.cursor_row == 0
+        assert 0 in table._pages
+        assert app.viewer.root.children[0].label.plain == "idx = 1"
+
+        # Visit more pages than the table is allowed to hold.
+        for row in [100, 200, 300, 400]:
+            table.move_cursor(row=row)
+            await pilot.pause()
+            await app.workers.wait_for_complete()
+
+        assert len(table._pages) == 3
+        assert list(table._pages)[-1] == 8
+
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_messages_table_update():
+    """Ensure that the table picks up new messages."""
+
+    db = await make_db(10)
+    app = TableApp(db, page_size=8)
+
+    async with app.run_test(size=(80, 24)) as pilot:
+        table = app.table
+        await table.update()
+        await app.workers.wait_for_complete()
+        await pilot.pause()
+        assert table.row_count == 10
+        assert 1 in table._pages
+
+        db.queue_message("session", "2024-01-01T00:01:00", "client", dict(method="b"))
+        await db.flush()
+        await table.update()
+        await app.workers.wait_for_complete()
+        await pilot.pause()
+
+        assert table.row_count == 11
+        assert table.get_message(10).method == "b"  # type: ignore
+
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_messages_table_request_update(monkeypatch: pytest.MonkeyPatch):
+    """Ensure that update requests are coalesced."""
+
+    db = await make_db(10)
+    app = TableApp(db, refresh_rate=5)
+
+    async with app.run_test(size=(80, 24)) as pilot:
+        table = app.table
+        calls = []
+        update = table.update
+
+        async def record_update():
+            calls.append(table.row_count)
+            await update()
+
+        monkeypatch.setattr(table, "update", record_update)
+
+        for _ in range(50):
+            table.request_update(10)
+
+        await pilot.pause(0.1)
+        assert len(calls) == 1
+        assert table.row_count == 10
+
+        # Nothing new has been written since the last update
+        table.request_update(10)
+        assert not table._update_pending
+
+        # The next update must wait until the next frame
+        db.queue_message(
+            "session", "2024-01-01T00:01:00", "client", dict(method="example")
+        )
+        await db.flush()
+        table.request_update(11)
+        table.request_update(11)
+        assert table._update_pending
+
+        await pilot.pause(0.3)
+        assert len(calls) == 2
+        assert table.row_count == 11
+
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_messages_table_search():
+    """Ensure that the table can be filtered using the filter bar."""
+
+    db = await make_db(200)
+    for idx in range(5):
+        db.queue_message(
+            "session",
+            f"2024-01-01T00:01:{idx:02}",
+            "server",
+            dict(method="window/logMessage", params=dict(message=f"needle {idx}")),
+        )
+
+    await db.flush()
+    app = TableApp(db, page_size=50)
+
+    async with app.run_test(size=(80, 24)) as pilot:
+        table = app.table
+        filter_bar = app.query_one(FilterBar)
+
+        await table.update()
+        assert table.row_count == 205
+
+        filter_bar.focus()
+        await pilot.press(*"source:server")
+        await pilot.pause(0.1)
+        await app.workers.wait_for_complete()
+        await pilot.pause()
+
+        assert list(table.rowids) == [201, 202, 203, 204, 205]
+        assert table.cursor_row == 4
+        assert table.get_message(4).method == "window/logMessage"  # type: ignore
+
+        filter_bar.value = "needle -type:request 3"
+        await pilot.press("enter")
+        await pilot.pause()
+
+        assert list(table.rowids) == [204]
+
+        # Invalid searches leave the table as it is.
+        filter_bar.value = "type:unknown"
+        await pilot.press("enter")
+        await pilot.pause()
+
+        assert filter_bar.has_class("-invalid")
+        assert list(table.rowids) == [204]
+
+        # New messages are only added to the table if they match the search.
+        for source in ["client", "server"]:
+            db.queue_message(
+                "session",
+                "2024-01-01T00:02:00",
+                source,
+                dict(method="window/logMessage", params=dict(message="needle 3")),
+            )
+
+        await db.flush()
+        table.request_update()
+        await pilot.pause(0.2)
+
+        assert list(table.rowids) == [204, 206, 207]
+
+        filter_bar.value = ""
+        await pilot.press("enter")
+        await pilot.pause()
+
+        assert not filter_bar.has_class("-invalid")
+        assert table.row_count == 207
+
+    await db.close()
+
+
+class ViewerApp(App):
+    """Used to test the message viewer in isolation."""
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.viewer = MessageViewer("", **kwargs)
+
+    def compose(self):
+        yield self.viewer
+
+
+def labels(node) -> List[str]:
+    return [child.label.plain for child in node.children]
+
+
+@pytest.mark.asyncio
+async def test_message_viewer_pages():
+    """Ensure that large objects are shown a page at a time."""
+
+    app = ViewerApp(page_size=100)
+    async with app.run_test() as pilot:
+        viewer = app.viewer
+        viewer.set_object("result", dict(data=list(range(50_000))))
+        await pilot.pause()
+
+        (data,) = viewer.root.children
+        assert data.label.plain == "data [50000 items]"
+        assert len(data.children) == 101
+        assert data.children[0].label.plain == "0 = 0"
+        assert data.children[-1].label.plain == "... show 100 more (49900 remaining)"
+
+        viewer.select_node(data.children[-1])
+        await pilot.pause()
+
+        assert len(data.children) == 201
+        assert data.children[100].label.plain == "100 = 100"
+        assert data.children[-1].label.plain == "... show 100 more (49800 remaining)"
+
+
+@pytest.mark.asyncio
+async def test_message_viewer_lazy():
+    """Ensure that nodes are only created for nested objects once they are
+    expanded."""
+
+    app = ViewerApp(expand_limit=5)
+    async with app.run_test() as pilot:
+        viewer = app.viewer
+        viewer.set_object(
+            "params",
+            dict(
+                small=dict(a=1, b=[]),
+                items=[
+                    dict(label=f"item{idx}", data=dict(idx=idx)) for idx in range(3)
+                ],
+            ),
+        )
+        await pilot.pause()
+
+        small, items = viewer.root.children
+        assert small.label.plain == "small {2 fields} {'a': 1, 'b': []}"
+        assert labels(small) == ["a = 1", "b = []"]
+
+        # The budget was used up before the nested objects were reached.
+        assert items.is_expanded
+        assert labels(items) == [
+            "0 {2 fields}",
+            "1 {2 fields}",
+            "2 {2 fields}",
+        ]
+        assert not items.children[2].is_expanded
+        assert len(items.children[2].children) == 0
+
+        items.children[2].expand()
+        await pilot.pause()
+
+        assert labels(items.children[2]) == [
+            "label = 'item2'",
+            "data {1 field} {'idx': 2}",
+        ]
+
+
+@pytest.mark.asyncio
+async def test_message_viewer_values():
+    """Ensure that values are summarised according to their size."""
+
+    app = ViewerApp(expand_limit=0, max_value_length=10, preview_length=20)
+    async with app.run_test() as pilot:
+        viewer = app.viewer
+        viewer.set_object(
+            "result",
+            dict(
+                short="abc",
+                long="x" * 100,
+                position=dict(line=1, character=2),
+                range=dict(start=dict(line=1), end=dict(line=2)),
+                empty={},
+                data=[1, 2, 3],
+            ),
+        )
+        await pilot.pause()
+
+        assert labels(viewer.root) == [
+            "short = 'abc'",
+            "long = 'xxxxxxxxxx'... (100 characters)",
+            "position {2 fields}",
+            "range {2 fields}",
+            "empty = {}",
+            "data [3 items] [1, 2, 3]",
+        ]
+
+        viewer.set_object("result", 42)
+        assert viewer.root.label.plain == "result = 42"
+        assert len(viewer.root.children) == 0
+
+
+@pytest.mark.asyncio
+async def test_stats_panel():
+    """Ensure that the stats panel shows the latest statistics."""
+
+    class StatsApp(App):
+        def compose(self):
+            yield StatsPanel(db)
+
+    db = Database()
+    for idx, method in enumerate(["a", "a", "b"]):
+        db.queue_message(
+            "session",
+            "2024-01-01T00:00:00+00:00",
+            "client",
+            dict(id=idx, method=method, params={}),
+        )
+
+    for idx in range(2):
+        db.queue_message(
+            "session",
+            f"2024-01-01T00:00:0{idx + 1}+00:00",
+            "server",
+            dict(id=idx, result=None),
+        )
+
+    await db.flush()
+
+    app = StatsApp()
+    async with app.run_test() as pilot:
+        panel = app.query_one(StatsPanel)
+        panel.update_stats()
+        await pilot.pause()
+
+        table = app.query_one(DataTable)
+        rows = [table.get_row_at(idx) for idx in range(table.row_count)]
+
+        # Percentiles are estimates, accurate to within 1%
+        assert rows == [
+            ["(all)", "2", "1002.4", "2000.0", "2000.0", "2000.0", "1"],
+            ["a", "2", "1002.4", "2000.0", "2000.0", "2000.0", "0"],
+            ["b", "0", "-", "-", "-", "-", "1"],
+        ]
+
+    await db.close()
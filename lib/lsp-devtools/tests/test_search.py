@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import typing
+from contextlib import closing
+
+import pytest
+
+from lsp_devtools.handlers.sql import INSERT_MESSAGE
+from lsp_devtools.handlers.sql import RequestPairer
+from lsp_devtools.handlers.sql import SqlHandler
+from lsp_devtools.handlers.sql import init_db
+from lsp_devtools.handlers.sql import message_row
+from lsp_devtools.handlers.sql import raw_message_row
+from lsp_devtools.search import MessageQuery
+from lsp_devtools.search import parse_query
+from lsp_devtools.search import update_search_index
+
+if typing.TYPE_CHECKING:
+    import pathlib
+    from typing import Any
+    from typing import Dict
+    from typing import Iterator
+    from typing import List
+    from typing import Tuple
+
+    Message = Tuple[str, str, str, Dict[str, Any]]
+
+
+MESSAGES: List[Message] = [
+    (
+        "a",
+        "2024-01-01T10:00:00+00:00",
+        "client",
+        dict(id=1, method="initialize", params=dict(rootUri="file:///project")),
+    ),
+    ("a", "2024-01-01T10:00:01+00:00", "server", dict(id=1, result=dict(ok=True))),
+    (
+        "a",
+        "2024-01-01T10:00:02+00:00",
+        "server",
+        dict(method="window/logMessage", params=dict(type=3, message="hello world")),
+    ),
+    (
+        "a",
+        "2024-01-01T10:00:03+00:00",
+        "client",
+        dict(id=2, method="textDocument/hover", params=dict(line=1)),
+    ),
+    (
+        "a",
+        "2024-01-01T10:00:04+00:00",
+        "server",
+        dict(id=2, error=dict(code=-32603, message="oops")),
+    ),
+    (
+        "b",
+        "2024-01-01T11:00:00+00:00",
+        "server",
+        dict(id=1, method="workspace/configuration", params=dict(items=[])),
+    ),
+    ("b", "2024-01-01T11:00:01+00:00", "client", dict(id=1, result=[dict(a=1)])),
+]
+
+
+@pytest.fixture(params=["columns", "raw", "compressed"])
+def storage(request) -> str:
+    """Each of the modes messages can be stored in."""
+    return request.param
+
+
+@pytest.fixture
+def conn(storage: str) -> Iterator[sqlite3.Connection]:
+    """A database containing :data:`MESSAGES`."""
+    with closing(sqlite3.connect(":memory:")) as conn:
+        init_db(conn)
+
+        rows = []
+        for session, timestamp, source, message in MESSAGES:
+            body = json.dumps(message).encode("utf8")
+            if storage == "columns":
+                rows.append(
+                    message_row(session, timestamp, source, message, size=len(body))
+                )
+            else:
+                rows.append(raw_message_row(session, timestamp, source, body, storage))
+
+        conn.executemany(INSERT_MESSAGE, RequestPairer().pair(1, rows))
+        conn.commit()
+
+        update_search_index(conn)
+        yield conn
+
+
+def search(conn: sqlite3.Connection, query: MessageQuery) -> List[int]:
+    where, parameters = query.where()
+    sql = " ".join(
+        ["SELECT rowid FROM protocol WHERE", " AND ".join(where), "ORDER BY rowid"]
+    )
+
+    return [row[0] for row in conn.execute(sql, parameters).fetchall()]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("source:client", [1, 4, 7]),
+        ("-source:client", [2, 3, 5, 6]),
+        ("type:request", [1, 4, 6]),
+        ("type:response", [2, 5, 7]),
+        ("type:result", [2, 7]),
+        ("type:error", [5]),
+        ("type:notification", [3]),
+        ("-type:notification,request", [2, 5, 7]),
+        ("method:initialize", [1, 2]),
+        ("method:initialize,textDocument/hover", [1, 2, 4, 5]),
+        ("-method:initialize", [3, 4, 5, 6, 7]),
+        ("session:b", [6, 7]),
+        ("-session:b", [1, 2, 3, 4, 5]),
+        ("since:2024-01-01T10:00:03", [4, 5, 6, 7]),
+        ("until:2024-01-01T10:00:01.5", [1, 2]),
+        ("since:2024-01-01T11:00:02+01:00 until:2024-01-01T12:00:02.5+02:00", [3]),
+        ("source:server type:request", [6]),
+        ("method:initialize type:result", [2]),
+        ("size:>64", [1, 3, 6]),
+        ("size:64", [1, 3, 4, 6]),
+        ("size:<55", [2, 7]),
+        ("size:<=33", [2, 7]),
+        ("size:>=55,<=71", [4, 5, 6]),
+        ("size:>70 source:client", [1]),
+    ],
+)
+def test_search(conn: sqlite3.Connection, text: str, expected: List[int]):
+    """Ensure that searches select the expected messages."""
+    assert search(conn, parse_query(text)) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("hello", [3]),
+        ("HELLO world", [3]),
+        ("hello project", []),
+        ("project", [1]),
+        ('"hello world"', [3]),
+        ("'hello world'", [3]),
+        ("ok", [2]),
+        ("oops", [5]),
+        ("oops type:result", []),
+        ('"AND" OR', []),
+    ],
+)
+def test_search_text(
+    conn: sqlite3.Connection, storage: str, text: str, expected: List[int]
+):
+    """Ensure that messages can be found by their content."""
+
+    # Compressed messages are not indexed.
+    if storage == "compressed":
+        expected = []
+
+    assert search(conn, parse_query(text)) == expected
+
+
+def test_search_time_sql_handler(tmp_path: pathlib.Path):
+    """Ensure that searching by time works with the timestamps written by the
+    :class:`SqlHandler`."""
+    dbpath = tmp_path / "sessions.db"
+    handler = SqlHandler(dbpath)
+
+    for session, timestamp, source, message in MESSAGES:
+        record = logging.LogRecord("example", logging.INFO, "", 0, "%s", message, None)
+        record.__dict__.update(
+            {
+                "Message-Session": session,
+                "Message-Timestamp": timestamp,
+                "Message-Source": source,
+            }
+        )
+        handler.handle(record)
+
+    handler.close()
+
+    with closing(sqlite3.connect(dbpath)) as conn:
+        (timestamp,) = conn.execute("SELECT timestamp FROM protocol").fetchone()
+        assert timestamp == "2024-01-01 10:00:00+00:00"
+
+        assert search(conn, parse_query("since:2024-01-01T10:00:03")) == [4, 5, 6, 7]
+        assert search(conn, parse_query("until:2024-01-01T10:00:01.5")) == [1, 2]
+        query = parse_query("since:2024-01-01T11:00:00+01:00")
+        assert search(conn, query) == list(range(1, 8))
+
+
+def test_update_search_index(monkeypatch: pytest.MonkeyPatch):
+    """Ensure that messages are only indexed once they are searched for, and that the
+    index is updated incrementally."""
+    monkeypatch.setattr("lsp_devtools.search.INDEX_BATCH_SIZE", 2)
+    query = parse_query("hello")
+
+    def insert(rowid: int, count: int):
+        rows = [
+            message_row("a", "2024-01-01T10:00:00", "server", dict(params="hello"))
+            for _ in range(count)
+        ]
+        conn.executemany(INSERT_MESSAGE, RequestPairer().pair(rowid, rows))
+        conn.commit()
+
+    with closing(sqlite3.connect(":memory:")) as conn:
+        init_db(conn)
+        insert(1, 3)
+
+        assert search(conn, query) == []
+
+        update_search_index(conn)
+        assert search(conn, query) == [1, 2, 3]
+
+        insert(4, 2)
+        update_search_index(conn)
+        assert search(conn, query) == [1, 2, 3, 4, 5]
+
+        status = conn.execute("SELECT indexed_rowid FROM protocol_fts_status")
+        assert status.fetchall() == [(5,)]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("", MessageQuery()),
+        (
+            "method:a,b -method:c type:response -type:error",
+            MessageQuery(
+                include_methods={"a", "b"},
+                exclude_methods={"c"},
+                include_message_types={"response"},
+                exclude_message_types={"error"},
+            ),
+        ),
+        ("source:client", MessageQuery(message_source="client")),
+        ("-source:client", MessageQuery(message_source="server")),
+        (
+            "session:a -session:b",
+            MessageQuery(include_sessions={"a"}, exclude_sessions={"b"}),
+        ),
+        (
+            "since:2024-01-01 until:2024-01-01T10:00:00Z",
+            MessageQuery(since="2024-01-01T00:00:00", until="2024-01-01T10:00:00"),
+        ),
+        ("size:10k", MessageQuery(min_size=10240)),
+        ("size:>1kb,<1.5M", MessageQuery(min_size=1025, max_size=1572863)),
+        ("size:<=512b", MessageQuery(max_size=512)),
+        (
+            'file:///a/b.py "a phrase" c',
+            MessageQuery(text=["file:///a/b.py", "a phrase", "c"]),
+        ),
+    ],
+)
+def test_parse_query(text: str, expected: MessageQuery):
+    """Ensure that search strings are parsed correctly."""
+    assert parse_query(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, message",
+    [
+        ("method:", "Missing value for 'method'"),
+        ("type:req", "Unknown message type"),
+        ("source:both", "Invalid source"),
+        ("since:yesterday", "Invalid time"),
+        ("-since:2024-01-01", "cannot be excluded"),
+        ("size:big", "Invalid size"),
+        ("size:>10x", "Invalid size"),
+        ("-size:10k", "cannot be excluded"),
+        ('"unclosed', "No closing quotation"),
+    ],
+)
+def test_parse_query_invalid(text: str, message: str):
+    """Ensure that invalid search strings are reported."""
+    with pytest.raises(ValueError, match=message):
+        parse_query(text)
+
+
+@pytest.mark.parametrize(
+    "text, index",
+    [
+        ("method:initialize", "protocol_method"),
+        ("session:a method:initialize", "protocol_session_method"),
+        ("since:2024-01-01", "protocol_julianday"),
+        ("size:>10k", "protocol_size"),
+        ("hello", "protocol_fts"),
+    ],
+)
+def test_search_plan(text: str, index: str):
+    """Ensure that searches are able to use the database's indexes."""
+    with closing(sqlite3.connect(":memory:")) as conn:
+        init_db(conn)
+
+        where, parameters = parse_query(text).where()
+        sql = " ".join(["SELECT rowid FROM protocol WHERE", " AND ".join(where)])
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+
+        assert any(index in row[3] for row in plan), plan
+        assert not any(row[3] == "SCAN protocol" for row in plan), plan
@@ -1,23 +1,47 @@
+from .benchmark import Benchmark
+from .benchmark import BenchmarkResult
 from .checks import LspSpecificationWarning
 from .client import LanguageClient
 from .client import __version__
 from .client import client_capabilities
 from .client import make_test_lsp_client
+from .load import LoadReport
+from .load import LoadTest
 from .plugin import ClientServerConfig
 from .plugin import fixture
+from .plugin import lsp_benchmark
+from .plugin import lsp_server_pools
 from .plugin import pytest_addoption
+from .plugin import pytest_configure
 from .plugin import pytest_runtest_makereport
+from .plugin import pytest_sessionfinish
+from .plugin import pytest_terminal_summary
+from .pool import PoolConfig
+from .pool import ServerPool
 from .protocol import LanguageClientProtocol
+from .protocol import MessageTiming
 
 __all__ = [
     "__version__",
+    "Benchmark",
+    "BenchmarkResult",
     "ClientServerConfig",
     "LanguageClient",
     "LanguageClientProtocol",
+    "LoadReport",
+    "LoadTest",
     "LspSpecificationWarning",
+    "MessageTiming",
+    "PoolConfig",
+    "ServerPool",
     "client_capabilities",
     "fixture",
+    "lsp_benchmark",
+    "lsp_server_pools",
     "make_test_lsp_client",
     "pytest_addoption",
+    "pytest_configure",
     "pytest_runtest_makereport",
+    "pytest_sessionfinish",
+    "pytest_terminal_summary",
 ]
@@ -0,0 +1,205 @@
+"""Time how long a server takes to respond to requests."""
+
+from __future__ import annotations
+
+import inspect
+import json
+import statistics
+import time
+import typing
+
+import attrs
+import pytest
+
+from pytest_lsp.load import process_usage
+from pytest_lsp.load import quantile
+
+if typing.TYPE_CHECKING:
+    import pathlib
+    from typing import Any
+    from typing import Callable
+
+    from pygls.client import JsonRPCClient
+
+
+@attrs.define
+class BenchmarkResult:
+    """The timings collected by a single benchmark."""
+
+    name: str
+    """The name of the benchmark."""
+
+    times_ms: list[float]
+    """The wall time taken by each iteration, in milliseconds."""
+
+    cpu_ms: float | None = attrs.field(default=None)
+    """The average CPU time used by the server per iteration, in milliseconds, if
+    known."""
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.times_ms)
+
+    def to_dict(self) -> dict[str, Any]:
+        times = sorted(self.times_ms)
+        return dict(
+            iterations=len(times),
+            min_ms=times[0],
+            max_ms=times[-1],
+            mean_ms=statistics.mean(times),
+            stdev_ms=statistics.stdev(times) if len(times) > 1 else 0.0,
+            median_ms=statistics.median(times),
+            p90_ms=quantile(times, 0.9),
+            cpu_ms=self.cpu_ms,
+        )
+
+
+def load_baseline(path: pathlib.Path) -> dict[str, dict[str, Any]]:
+    """Load the benchmark results saved in the given file."""
+    data = json.loads(path.read_text())
+    return data.get("benchmarks", {})
+
+
+def save_results(path: pathlib.Path, results: dict[str, BenchmarkResult]):
+    """Save the given benchmark results, so that they can be used as a baseline."""
+    benchmarks = {name: result.to_dict() for name, result in sorted(results.items())}
+    path.write_text(json.dumps(dict(benchmarks=benchmarks), indent=2) + "\n")
+
+
+def change(result: BenchmarkResult, baseline: dict[str, Any] | None) -> float | None:
+    """The change in the result's median time, as a percentage of the baseline."""
+    if baseline is None or not baseline.get("median_ms"):
+        return None
+
+    return (result.median - baseline["median_ms"]) / baseline["median_ms"] * 100
+
+
+class Benchmark:
+    """Repeatedly time a request made to the server under test.
+
+    Instances of this class are provided by the ``lsp_benchmark`` fixture.
+
+    .. code-block:: python
+
+       async def test_completion(client: LanguageClient, lsp_benchmark):
+           await lsp_benchmark(client, client.text_document_completion_async, params)
+
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        warmup: int = 3,
+        iterations: int = 20,
+        threshold: float = 10.0,
+        baseline: dict[str, dict[str, Any]] | None = None,
+        results: dict[str, BenchmarkResult] | None = None,
+    ):
+        if iterations < 1:
+            raise ValueError("A benchmark must run at least one iteration")
+
+        self.name = name
+        """The name of the benchmark, usually the test's node id."""
+
+        self.warmup = warmup
+        """The number of untimed iterations to run first."""
+
+        self.iterations = iterations
+        """The number of timed iterations to run."""
+
+        self.threshold = threshold
+        """The largest increase in median time (as a percentage of the baseline)
+        allowed before the benchmark fails."""
+
+        self.baseline = baseline
+        """The results to compare against, if any."""
+
+        self.results = results if results is not None else {}
+        """Where to store the results of each benchmark."""
+
+    async def __call__(
+        self,
+        client: JsonRPCClient,
+        fn: Callable[..., Any],
+        *args,
+        name: str | None = None,
+        **kwargs,
+    ) -> BenchmarkResult:
+        """Time how long it takes to call ``fn(*args, **kwargs)``.
+
+        Parameters
+        ----------
+        client
+           The client connected to the server under test, used to measure the CPU time
+           used by the server
+
+        fn
+           The function to time, typically one of the client's ``*_async`` methods
+
+        name
+           If given, the name to append to the benchmark's name. Required if the same
+           test runs more than one benchmark.
+
+        Raises
+        ------
+        pytest.fail.Exception
+           If the median time has increased beyond the allowed threshold, compared with
+           the baseline.
+
+        Returns
+        -------
+        BenchmarkResult
+           The result of the benchmark.
+        """
+        key = self.name if name is None else f"{self.name}::{name}"
+
+        for _ in range(self.warmup):
+            await _call(fn, *args, **kwargs)
+
+        server = getattr(client, "_server", None)
+        pid = server.pid if server is not None else None
+        before = process_usage(pid) if pid is not None else None
+
+        times = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            await _call(fn, *args, **kwargs)
+            times.append((time.perf_counter() - start) * 1000)
+
+        result = BenchmarkResult(key, times)
+
+        # CPU time is only updated every few milliseconds, so measure the total over
+        # all iterations rather than each one individually.
+        after = process_usage(pid) if pid is not None else None
+        if before is not None and after is not None:
+            result.cpu_ms = (after[1] - before[1]) * 1000 / len(times)
+
+        self.results[key] = result
+        self.check(result)
+
+        return result
+
+    def check(self, result: BenchmarkResult):
+        """Fail the test if the result regressed compared with the baseline."""
+        if self.baseline is None:
+            return
+
+        if (baseline := self.baseline.get(result.name)) is None:
+            return
+
+        if (delta := change(result, baseline)) is None or delta <= self.threshold:
+            return
+
+        pytest.fail(
+            f"Benchmark {result.name!r} regressed: median {result.median:.2f}ms vs "
+            f"{baseline['median_ms']:.2f}ms in the baseline "
+            f"(+{delta:.1f}%, threshold {self.threshold}%)",
+            pytrace=False,
+        )
+
+
+async def _call(fn: Callable[..., Any], *args, **kwargs):
+    result = fn(*args, **kwargs)
+    if inspect.isawaitable(result):
+        await result
@@ -16,11 +16,14 @@ from lsprotocol.converters import get_converter
 from packaging.version import parse as parse_version
 from pygls.exceptions import JsonRpcException
 from pygls.exceptions import PyglsError
+from pygls.io_ import run_async
 from pygls.lsp.client import BaseLanguageClient
 from pygls.protocol import default_converter
 
 from .checks import LspSpecificationWarning
 from .protocol import LanguageClientProtocol
+from .protocol import MessageTiming
+from .protocol import SizeReader
 
 if typing.TYPE_CHECKING:
     from typing import Any
@@ -80,8 +83,51 @@ class LanguageClient(BaseLanguageClient):
         self._stderr_forwarder: asyncio.Task | None = None
         """A task that forwards the server's stderr to the test process."""
 
+        self._last_timing_index = 0
+        """Used to keep track of which timings correspond with which test case."""
+
+    @property
+    def timings(self) -> list[MessageTiming]:
+        """The timeline of messages exchanged with the server."""
+        return self.protocol.timings
+
     async def start_io(self, cmd: str, *args, **kwargs):
-        await super().start_io(cmd, *args, **kwargs)
+        """Start the given server and communicate with it over stdio.
+
+        Unlike the base implementation, messages are read through a
+        :class:`~pytest_lsp.protocol.SizeReader`, so that the size of each message
+        received from the server is recorded.
+        """
+        logger.debug("Starting server process: %s", " ".join([cmd, *args]))
+        server = await asyncio.create_subprocess_exec(
+            cmd,
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stdin=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            **kwargs,
+        )
+
+        if server.stdout is None:
+            raise RuntimeError("Server process is missing a stdout stream")
+
+        if server.stdin is None:
+            raise RuntimeError("Server process is missing a stdin stream")
+
+        self.protocol.set_writer(server.stdin)
+        connection = asyncio.create_task(
+            run_async(
+                stop_event=self._stop_event,
+                reader=SizeReader(server.stdout, self.protocol),
+                protocol=self.protocol,
+                logger=logger,
+                error_handler=self.report_server_error,
+            )
+        )
+        notify_exit = asyncio.create_task(self._server_exit())
+
+        self._server = server
+        self._async_tasks.extend([connection, notify_exit])
 
         # Forward the server's stderr to this process' stderr
         if self._server and self._server.stderr:
@@ -109,14 +155,14 @@ class LanguageClient(BaseLanguageClient):
                 logger.debug("Cancelled pending request '%s': %s", id_, reason)
 
     def report_server_error(
-        self, error: Exception, source: PyglsError | JsonRpcException
+        self, error: Exception, source: type[PyglsError] | type[JsonRpcException]
     ):
         """Called when the server does something unexpected, e.g. sending malformed
         JSON."""
         self.error = error
         tb = "".join(traceback.format_exc())
 
-        message = f"{source.__name__}: {error}\n{tb}"  # type: ignore
+        message = f"{source.__name__}: {error}\n{tb}"
 
         loop = asyncio.get_running_loop()
         loop.call_soon(cancel_all_tasks, message)
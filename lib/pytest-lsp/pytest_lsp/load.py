@@ -0,0 +1,483 @@
+"""Drive many concurrent sessions against a language server, to see how it behaves
+under load."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+import attrs
+from lsprotocol import types
+
+if typing.TYPE_CHECKING:
+    from collections.abc import Awaitable
+    from typing import Any
+    from typing import Callable
+
+    from pytest_lsp.client import LanguageClient
+    from pytest_lsp.plugin import ClientServerConfig
+
+    Workload = Callable[[LanguageClient], Awaitable[Any]]
+
+
+logger = logging.getLogger(__name__)
+
+
+@attrs.define
+class RequestTiming:
+    """The time taken to respond to a single request."""
+
+    method: str
+    """The request's method."""
+
+    session: int
+    """The session that sent the request."""
+
+    end: float
+    """When the response was received, in seconds since the epoch."""
+
+    duration_ms: float
+    """The time taken to receive the response."""
+
+    error: bool = attrs.field(default=False)
+    """Indicates if the server responded with an error."""
+
+
+@attrs.define
+class ResourceSample:
+    """The resources used by a server process at a point in time."""
+
+    session: int
+    """The session the server belongs to."""
+
+    time: float
+    """When the sample was taken, in seconds since the epoch."""
+
+    rss: int
+    """The server's resident set size, in bytes."""
+
+    cpu: float
+    """The total CPU time used by the server so far, in seconds."""
+
+
+@attrs.define
+class WorkerResult:
+    """The results collected by a single worker process."""
+
+    requests: list[RequestTiming] = attrs.field(factory=list)
+    samples: list[ResourceSample] = attrs.field(factory=list)
+
+    iterations: int = attrs.field(default=0)
+    """The number of times the workload ran to completion."""
+
+    failures: list[str] = attrs.field(factory=list)
+    """Any exceptions raised by the workload or while starting a session."""
+
+
+@attrs.define
+class LoadTest:
+    """Run a workload in many concurrent sessions, each with its own server process.
+
+    Sessions are spread across a pool of worker processes so that the client side of
+    the test does not become the bottleneck. Each session starts a server using
+    ``config``, initializes it and then calls ``workload`` with the client, repeatedly
+    until either ``iterations`` or ``duration`` is reached.
+
+    As the workload is sent to other processes, it must be a function that can be
+    imported by name, i.e. defined at the top level of a module.
+    """
+
+    config: ClientServerConfig
+    """The configuration used to start each session."""
+
+    workload: Workload
+    """An ``async`` function to call with each session's client."""
+
+    clients: int = attrs.field(default=1)
+    """The number of concurrent sessions to run."""
+
+    processes: int = attrs.field(default=1)
+    """The number of worker processes to spread the sessions across."""
+
+    iterations: int | None = attrs.field(default=1)
+    """The number of times each session runs the workload, ``None`` for no limit."""
+
+    duration: float | None = attrs.field(default=None)
+    """The maximum time (in seconds) each session runs the workload for, ``None`` for
+    no limit."""
+
+    initialize_params: types.InitializeParams = attrs.field(
+        factory=lambda: types.InitializeParams(capabilities=types.ClientCapabilities()),
+    )
+    """The params sent with each session's ``initialize`` request."""
+
+    sample_interval: float = attrs.field(default=0.5)
+    """How often (in seconds) to sample each server's resource usage."""
+
+    def __attrs_post_init__(self):
+        if self.iterations is None and self.duration is None:
+            raise ValueError("At least one of 'iterations' or 'duration' must be set")
+
+        if self.clients < 1 or self.processes < 1:
+            raise ValueError("'clients' and 'processes' must be at least 1")
+
+    def run(self) -> LoadReport:
+        """Run the load test, returning the aggregated results."""
+        processes = min(self.processes, self.clients)
+        sessions = [range(idx, self.clients, processes) for idx in range(processes)]
+
+        # Forking a process with a running event loop is unsafe
+        context = multiprocessing.get_context("spawn")
+        start = time.time()
+
+        with ProcessPoolExecutor(processes, mp_context=context) as pool:
+            futures = [pool.submit(_run_worker, self, s) for s in sessions]
+            results = [future.result() for future in futures]
+
+        return LoadReport(results, start=start, end=time.time(), clients=self.clients)
+
+
+def _run_worker(load: LoadTest, sessions: range) -> WorkerResult:
+    """The entry point for each worker process."""
+    result = WorkerResult()
+    asyncio.run(_run_sessions(load, sessions, result))
+    return result
+
+
+async def _run_sessions(load: LoadTest, sessions: range, result: WorkerResult):
+    await asyncio.gather(*[_run_session(load, idx, result) for idx in sessions])
+
+
+async def _run_session(load: LoadTest, session: int, result: WorkerResult):
+    """Run the workload in a single session."""
+    try:
+        client = typing.cast("LanguageClient", await load.config.start())
+    except Exception as exc:
+        result.failures.append(f"Unable to start session {session}: {exc!r}")
+        return
+
+    sampler = None
+    try:
+        await client.initialize_session(attrs.evolve(load.initialize_params))
+
+        if (server := client._server) is not None:
+            sampler = asyncio.create_task(
+                _sample_resources(server.pid, session, load.sample_interval, result)
+            )
+
+        deadline = None
+        if load.duration is not None:
+            deadline = time.monotonic() + load.duration
+
+        iteration = 0
+        while load.iterations is None or iteration < load.iterations:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+
+            iteration += 1
+            try:
+                await load.workload(client)
+                result.iterations += 1
+            except Exception as exc:
+                result.failures.append(f"Session {session}: {exc!r}")
+
+    except Exception as exc:
+        result.failures.append(f"Session {session}: {exc!r}")
+
+    finally:
+        if sampler is not None:
+            sampler.cancel()
+
+        try:
+            await client.shutdown_session()
+        except Exception:
+            logger.debug("Unable to shutdown session %d", session, exc_info=True)
+
+        await client.stop()
+        result.requests.extend(_request_timings(client, session))
+
+
+def _request_timings(client: LanguageClient, session: int) -> list[RequestTiming]:
+    """Return the time taken to respond to each request sent by the given client."""
+    # Message timings come from ``time.perf_counter``, convert them to wall clock time
+    # so they can be compared with timings from other processes.
+    offset = time.time() - time.perf_counter()
+    return [
+        RequestTiming(
+            t.method, session, offset + t.received, t.duration_ms, error=t.error
+        )
+        for t in getattr(client, "timings", [])
+        if t.source == "client" and t.kind == "request" and t.received is not None
+    ]
+
+
+async def _sample_resources(
+    pid: int, session: int, interval: float, result: WorkerResult
+):
+    """Periodically sample the resources used by the given process."""
+    while True:
+        if (usage := process_usage(pid)) is None:
+            return
+
+        rss, cpu = usage
+        result.samples.append(ResourceSample(session, time.time(), rss, cpu))
+        await asyncio.sleep(interval)
+
+
+def process_usage(pid: int) -> tuple[int, float] | None:
+    """Return the resident set size (in bytes) and total CPU time (in seconds) used by
+    the given process.
+
+    Uses ``psutil`` if available, otherwise falls back to reading ``/proc``. Returns
+    ``None`` if the process' usage cannot be determined.
+    """
+    try:
+        import psutil  # type: ignore[import-untyped]
+    except ImportError:
+        return _proc_usage(pid)
+
+    try:
+        process = psutil.Process(pid)
+        with process.oneshot():
+            cpu = process.cpu_times()
+            return process.memory_info().rss, cpu.user + cpu.system
+    except psutil.Error:
+        return None
+
+
+def _proc_usage(pid: int) -> tuple[int, float] | None:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+
+        with open(f"/proc/{pid}/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    # The process name may contain spaces, so only split what comes after it
+    fields = stat[stat.rfind(")") + 2 :].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu = (int(fields[11]) + int(fields[12])) / ticks
+
+    return pages * os.sysconf("SC_PAGE_SIZE"), cpu
+
+
+def quantile(values: list[float], q: float) -> float | None:
+    """Return the given quantile of the (sorted) values, using the nearest rank."""
+    if len(values) == 0:
+        return None
+
+    idx = min(len(values) - 1, max(0, int(q * len(values) + 0.5) - 1))
+    return values[idx]
+
+
+@attrs.define
+class MethodStats:
+    """Aggregate latency statistics for a single method."""
+
+    method: str
+    durations: list[float] = attrs.field(factory=list)
+    errors: int = attrs.field(default=0)
+
+    def to_dict(self) -> dict[str, Any]:
+        durations = sorted(self.durations)
+        return dict(
+            method=self.method,
+            requests=len(durations),
+            errors=self.errors,
+            p50_ms=quantile(durations, 0.5),
+            p90_ms=quantile(durations, 0.9),
+            p99_ms=quantile(durations, 0.99),
+            max_ms=durations[-1] if durations else None,
+        )
+
+
+class LoadReport:
+    """The aggregated results of a :class:`LoadTest`."""
+
+    def __init__(
+        self, results: list[WorkerResult], *, start: float, end: float, clients: int
+    ):
+        self.start = start
+        self.end = end
+        self.clients = clients
+
+        self.requests = sorted(
+            (r for result in results for r in result.requests), key=lambda r: r.end
+        )
+        self.samples = sorted(
+            (s for result in results for s in result.samples), key=lambda s: s.time
+        )
+        self.iterations = sum(result.iterations for result in results)
+        self.failures = [f for result in results for f in result.failures]
+
+        self.methods: dict[str, MethodStats] = {}
+        for request in self.requests:
+            stats = self.methods.setdefault(request.method, MethodStats(request.method))
+            stats.durations.append(request.duration_ms)
+            stats.errors += request.error
+
+    @property
+    def duration(self) -> float:
+        """The time taken to run the load test, in seconds."""
+        return self.end - self.start
+
+    @property
+    def throughput(self) -> float:
+        """The number of requests responded to per second."""
+        return len(self.requests) / self.duration if self.duration > 0 else 0.0
+
+    def timeline(self, interval: float = 1.0) -> list[dict[str, Any]]:
+        """Return the throughput, tail latency and server resource usage over time.
+
+        Parameters
+        ----------
+        interval
+           The width (in seconds) of each time slice.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+           The statistics for each time slice. Server memory is the total across all
+           servers, while CPU is the total percentage of a single core used.
+        """
+        count = max(1, math.ceil(self.duration / interval))
+        durations: list[list[float]] = [[] for _ in range(count)]
+        errors = [0] * count
+
+        for request in self.requests:
+            idx = min(count - 1, int((request.end - self.start) / interval))
+            durations[idx].append(request.duration_ms)
+            errors[idx] += request.error
+
+        # Each server's latest sample in each time slice.
+        latest: list[dict[int, ResourceSample]] = [{} for _ in range(count)]
+        for sample in self.samples:
+            idx = min(count - 1, int((sample.time - self.start) / interval))
+            latest[idx][sample.session] = sample
+
+        timeline = []
+        previous: dict[int, ResourceSample] = {}
+        for idx in range(count):
+            rss, cpu = None, None
+            if latest[idx]:
+                previous.update(latest[idx])
+                rss = sum(s.rss for s in previous.values())
+                cpu = self._cpu_percent(idx, interval, latest)
+
+            values = sorted(durations[idx])
+            timeline.append(
+                dict(
+                    time=idx * interval,
+                    requests=len(values),
+                    errors=errors[idx],
+                    throughput=len(values) / interval,
+                    p99_ms=quantile(values, 0.99),
+                    rss=rss,
+                    cpu_percent=cpu,
+                )
+            )
+
+        return timeline
+
+    def _cpu_percent(
+        self, idx: int, interval: float, latest: list[dict[int, ResourceSample]]
+    ) -> float | None:
+        """The CPU used by all servers during the given time slice, compared with the
+        most recent earlier sample of each server."""
+        used = 0.0
+        elapsed = 0.0
+
+        for session, sample in latest[idx].items():
+            earlier = next(
+                (
+                    latest[i][session]
+                    for i in range(idx - 1, -1, -1)
+                    if session in latest[i]
+                ),
+                None,
+            )
+            if earlier is None or sample.time <= earlier.time:
+                continue
+
+            used += sample.cpu - earlier.cpu
+            elapsed = max(elapsed, sample.time - earlier.time)
+
+        if elapsed == 0:
+            return None
+
+        return used / elapsed * 100
+
+    def to_dict(self, interval: float = 1.0) -> dict[str, Any]:
+        methods = sorted(
+            self.methods.values(), key=lambda m: len(m.durations), reverse=True
+        )
+        total = MethodStats(
+            "",
+            durations=[r.duration_ms for r in self.requests],
+            errors=sum(r.error for r in self.requests),
+        )
+
+        return dict(
+            clients=self.clients,
+            duration_s=self.duration,
+            iterations=self.iterations,
+            throughput=self.throughput,
+            failures=self.failures,
+            total=total.to_dict(),
+            methods=[m.to_dict() for m in methods],
+            timeline=self.timeline(interval),
+        )
+
+    def format(self, interval: float = 1.0) -> str:
+        """Format the report as plain text."""
+        report = self.to_dict(interval)
+        lines = [
+            f"{report['clients']} clients, {report['iterations']} iterations, "
+            f"{len(self.requests)} requests in {report['duration_s']:.1f}s "
+            f"({report['throughput']:.1f} req/s)",
+            "",
+            f"{'Method':<40} {'Count':>7} {'Err':>5} {'p50':>9} {'p90':>9} "
+            f"{'p99':>9} {'Max':>9}",
+        ]
+
+        for method in [*report["methods"], dict(report["total"], method="(all)")]:
+            lines.append(
+                f"{method['method']:<40} {method['requests']:>7} {method['errors']:>5} "
+                + " ".join(
+                    _format(method[k], ".1f", 9)
+                    for k in ["p50_ms", "p90_ms", "p99_ms", "max_ms"]
+                )
+            )
+
+        lines.extend(
+            [
+                "",
+                f"{'Time (s)':>8} {'Req/s':>8} {'Err':>5} {'p99 (ms)':>9} "
+                f"{'RSS (MiB)':>10} {'CPU %':>7}",
+            ]
+        )
+        for row in report["timeline"]:
+            rss = None if row["rss"] is None else row["rss"] / 2**20
+            lines.append(
+                f"{row['time']:>8.1f} {row['throughput']:>8.1f} {row['errors']:>5} "
+                f"{_format(row['p99_ms'], '.1f', 9)} {_format(rss, '.1f', 10)} "
+                f"{_format(row['cpu_percent'], '.0f', 7)}"
+            )
+
+        if self.failures:
+            lines.extend(["", f"{len(self.failures)} failure(s):"])
+            lines.extend(f"  {failure}" for failure in self.failures)
+
+        return "\n".join(lines)
+
+
+def _format(value: float | None, spec: str, width: int) -> str:
+    return f"{'-' if value is None else format(value, spec):>{width}}"
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 import inspect
 import logging
+import pathlib
 import sys
 import textwrap
 import typing
@@ -11,16 +13,38 @@ import pytest
 import pytest_asyncio
 from pygls.client import JsonRPCClient
 
+from pytest_lsp.benchmark import Benchmark
+from pytest_lsp.benchmark import BenchmarkResult
+from pytest_lsp.benchmark import change
+from pytest_lsp.benchmark import load_baseline
+from pytest_lsp.benchmark import save_results
 from pytest_lsp.client import LanguageClient
 from pytest_lsp.client import make_test_lsp_client
+from pytest_lsp.load import quantile
+from pytest_lsp.pool import PoolConfig
+from pytest_lsp.pool import ServerPool
 
 if typing.TYPE_CHECKING:
     from typing import Any
     from typing import Callable
 
+    from pytest_lsp.protocol import MessageTiming
+
 
 logger = logging.getLogger("client")
 
+BENCHMARK_RESULTS = pytest.StashKey[dict[str, BenchmarkResult]]()
+"""Holds the results of each benchmark run in the session."""
+
+TIMINGS = pytest.StashKey["list[MessageTiming]"]()
+"""Holds the timings of all messages exchanged in the session, if requested."""
+
+SLOWEST_REQUESTS = 5
+"""The number of slowest requests to include in each test's report."""
+
+BENCHMARK_BASELINE = pytest.StashKey["dict[str, dict[str, Any]] | None"]()
+"""Holds the baseline benchmark results to compare against, if any."""
+
 
 @attrs.define
 class ClientServerConfig:
@@ -95,10 +119,208 @@ def pytest_addoption(parser):
         const="localhost:8765",
         help="Enable lsp-devtools integration.",
     )
+    group.addoption(
+        "--lsp-pool-size",
+        dest="lsp_pool_size",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Override the number of servers kept ready by each server pool. "
+        "When running under pytest-xdist, this applies to each worker.",
+    )
+    group.addoption(
+        "--lsp-timings",
+        dest="lsp_timings",
+        action="store_true",
+        default=False,
+        help="Summarise the time taken to respond to each request, by method.",
+    )
+    group.addoption(
+        "--lsp-benchmark-warmup",
+        dest="lsp_benchmark_warmup",
+        type=int,
+        default=3,
+        metavar="N",
+        help="The number of untimed iterations to run before each benchmark.",
+    )
+    group.addoption(
+        "--lsp-benchmark-iterations",
+        dest="lsp_benchmark_iterations",
+        type=int,
+        default=20,
+        metavar="N",
+        help="The number of timed iterations to run in each benchmark.",
+    )
+    group.addoption(
+        "--lsp-benchmark-save",
+        dest="lsp_benchmark_save",
+        type=pathlib.Path,
+        default=None,
+        metavar="PATH",
+        help="Save the benchmark results to the given file.",
+    )
+    group.addoption(
+        "--lsp-benchmark-compare",
+        dest="lsp_benchmark_compare",
+        type=pathlib.Path,
+        default=None,
+        metavar="PATH",
+        help="Compare the benchmark results with those saved in the given file.",
+    )
+    group.addoption(
+        "--lsp-benchmark-threshold",
+        dest="lsp_benchmark_threshold",
+        type=float,
+        default=10.0,
+        metavar="PCT",
+        help="Fail benchmarks whose median time increases by more than the given "
+        "percentage, compared with the baseline. (default: 10)",
+    )
+
+
+def pytest_configure(config: pytest.Config):
+    config.addinivalue_line(
+        "markers",
+        "lsp_benchmark(warmup=None, iterations=None, threshold=None): "
+        "override the lsp_benchmark fixture's settings for a test.",
+    )
+
+    baseline = None
+    if (path := config.getoption("lsp_benchmark_compare", None)) is not None:
+        try:
+            baseline = load_baseline(path)
+        except (OSError, ValueError) as exc:
+            raise pytest.UsageError(
+                f"Unable to load benchmark baseline: {exc}"
+            ) from exc
+
+    config.stash[BENCHMARK_BASELINE] = baseline
+    config.stash[BENCHMARK_RESULTS] = {}
+    config.stash[TIMINGS] = []
+
+
+@pytest.fixture
+def lsp_benchmark(request: pytest.FixtureRequest) -> Benchmark:
+    """Time how long the server under test takes to respond to a request.
+
+    See :class:`~pytest_lsp.Benchmark` for details.
+    """
+    config = request.config
+    marker = request.node.get_closest_marker("lsp_benchmark")
+    settings = marker.kwargs if marker is not None else {}
+
+    return Benchmark(
+        request.node.nodeid,
+        warmup=settings.get("warmup", config.getoption("lsp_benchmark_warmup")),
+        iterations=settings.get(
+            "iterations", config.getoption("lsp_benchmark_iterations")
+        ),
+        threshold=settings.get(
+            "threshold", config.getoption("lsp_benchmark_threshold")
+        ),
+        baseline=config.stash[BENCHMARK_BASELINE],
+        results=config.stash[BENCHMARK_RESULTS],
+    )
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def lsp_server_pools():
+    """Holds the server pools used by fixtures in this session.
+
+    Each pytest-xdist worker runs its own session, and therefore its own pools.
+    """
+    pools: dict[Callable, ServerPool] = {}
+    yield pools
+
+    await asyncio.gather(*[pool.stop() for pool in pools.values()])
+
+
+def pytest_sessionfinish(session: pytest.Session):
+    """Save any benchmark results, if requested."""
+    config = session.config
+    results = config.stash.get(BENCHMARK_RESULTS, None)
+
+    if not results or (path := config.getoption("lsp_benchmark_save")) is None:
+        return
+
+    save_results(path, results)
+
+
+def pytest_terminal_summary(terminalreporter, config: pytest.Config):
+    if config.getoption("lsp_timings"):
+        summarise_timings(terminalreporter, config.stash.get(TIMINGS, []))
+
+    summarise_benchmarks(terminalreporter, config)
+
+
+def summarise_timings(terminalreporter, timings: list[MessageTiming]):
+    """Summarise the time taken to respond to requests, by method."""
+    methods: dict[str, list[MessageTiming]] = {}
+    for timing in timings:
+        if timing.source == "client" and timing.kind == "request":
+            methods.setdefault(timing.method, []).append(timing)
+
+    terminalreporter.section("lsp timings")
+    if len(methods) == 0:
+        terminalreporter.write_line("No requests sent")
+        return
+
+    terminalreporter.write_line(
+        f"{'Count':>7} {'Err':>5} {'p50':>10} {'p90':>10} {'Max':>10} "
+        f"{'Req':>9} {'Resp':>9}  Method"
+    )
+
+    for method, requests in sorted(methods.items()):
+        durations = sorted(d for r in requests if (d := r.duration_ms) is not None)
+        cells = [
+            f"{len(requests):>7}",
+            f"{sum(r.error for r in requests):>5}",
+            *(_format_ms(quantile(durations, q)) for q in [0.5, 0.9, 1.0]),
+            _format_size(_mean([r.size for r in requests])),
+            _format_size(_mean([r.response_size for r in requests])),
+        ]
+        terminalreporter.write_line(f"{' '.join(cells)}  {method}")
+
+
+def _mean(values: list[int | None]) -> float | None:
+    known = [v for v in values if v is not None]
+    return sum(known) / len(known) if known else None
+
+
+def _format_ms(value: float | None) -> str:
+    return f"{'-':>10}" if value is None else f"{value:>8.2f}ms"
+
+
+def _format_size(value: float | None) -> str:
+    return f"{'-':>9}" if value is None else f"{value:>8.0f}B"
+
+
+def summarise_benchmarks(terminalreporter, config: pytest.Config):
+    """Summarise the results of any benchmarks."""
+    if not (results := config.stash.get(BENCHMARK_RESULTS, None)):
+        return
+
+    baseline = config.stash[BENCHMARK_BASELINE] or {}
+
+    terminalreporter.section("lsp benchmarks")
+    terminalreporter.write_line(
+        f"{'Median':>10} {'Mean':>10} {'Stdev':>10} {'CPU':>10} {'Change':>8}  Name"
+    )
+
+    for name, result in sorted(results.items()):
+        stats = result.to_dict()
+        delta = change(result, baseline.get(name))
+        cells = [
+            *(f"{stats[k]:>8.2f}ms" for k in ["median_ms", "mean_ms", "stdev_ms"]),
+            f"{'-':>10}" if result.cpu_ms is None else f"{result.cpu_ms:>8.2f}ms",
+            f"{'-':>8}" if delta is None else f"{delta:>+7.1f}%",
+        ]
+        terminalreporter.write_line(f"{' '.join(cells)}  {name}")
 
 
 def pytest_runtest_makereport(item: pytest.Item, call: pytest.CallInfo):
-    """Add any captured log messages to the report."""
+    """Add any captured log messages, and the slowest requests of failed tests to the
+    report."""
     client: LanguageClient | None = None
 
     if not hasattr(item, "funcargs"):
@@ -128,6 +350,28 @@ def pytest_runtest_makereport(item: pytest.Item, call: pytest.CallInfo):
     if len(messages) > 0:
         item.add_report_section(call.when, "window/logMessages", "\n".join(messages))
 
+    timings = client.timings[client._last_timing_index :]
+    client._last_timing_index = len(client.timings)
+
+    if item.config.getoption("lsp_timings"):
+        item.config.stash[TIMINGS].extend(timings)
+
+    # Only worth showing when trying to work out why a test failed.
+    failed = call.excinfo is not None and not call.excinfo.errisinstance(
+        pytest.skip.Exception
+    )
+
+    requests = [t for t in timings if t.duration_ms is not None]
+    if failed and len(requests) > 0:
+        slowest = sorted(requests, key=lambda t: t.duration_ms, reverse=True)  # type: ignore
+        lines = [
+            f"{t.duration_ms:>10.2f}ms  {t.method}"
+            f"{'' if t.size is None else f' ({t.size}B -> {t.response_size}B)'}"
+            f"{' ERROR' if t.error else ''}"
+            for t in slowest[:SLOWEST_REQUESTS]
+        ]
+        item.add_report_section(call.when, "lsp timings", "\n".join(lines))
+
 
 # anext() was added in 3.10
 if sys.version_info < (3, 10):
@@ -180,10 +424,23 @@ def get_fixture_arguments(
     return kwargs
 
 
+def get_test_loop_scope(item: pytest.Item) -> str:
+    """Return the scope of the event loop the given test will run in."""
+    marker = item.get_closest_marker("asyncio")
+    if marker is not None and "loop_scope" in marker.kwargs:
+        return marker.kwargs["loop_scope"]
+
+    try:
+        return item.config.getini("asyncio_default_test_loop_scope") or "function"
+    except ValueError:
+        return "function"
+
+
 def fixture(
     fixture_function=None,
     *,
     config: ClientServerConfig,
+    pool: PoolConfig | None = None,
     **kwargs,
 ):
     """Define a fixture that returns a client connected to a server running in a
@@ -193,6 +450,11 @@ def fixture(
     ----------
     config
        Configuration for the client and server.
+
+    pool
+       If set, take an initialized server from a pool of servers shared between tests,
+       rather than starting a new one for each test.
+       Tests using the fixture must run in the ``session`` scoped event loop.
     """
 
     def wrapper(fn):
@@ -201,6 +463,9 @@ def fixture(
         if "scope" in kwargs:
             kwargs["loop_scope"] = kwargs["scope"]
 
+        if pool is not None:
+            return pooled_fixture(fn, config, pool, **kwargs)
+
         @pytest_asyncio.fixture(**kwargs)
         async def the_fixture(request):
             devtools = request.config.getoption("devtools")
@@ -230,3 +495,66 @@ def fixture(
         return wrapper(fixture_function)
 
     return wrapper
+
+
+def pooled_fixture(
+    fn: Callable,
+    config: ClientServerConfig,
+    pool: PoolConfig,
+    **kwargs,
+):
+    """Define a fixture that returns a client connected to a server taken from a
+    pool."""
+
+    # The pool's servers are tied to the event loop they were started in.
+    kwargs["loop_scope"] = "session"
+
+    @pytest_asyncio.fixture(**kwargs)
+    async def the_fixture(request, lsp_server_pools):
+        if (scope := get_test_loop_scope(request.node)) != "session":
+            raise pytest.UsageError(
+                f"{request.node.nodeid} uses a server pool, so it must run in the "
+                f"'session' scoped event loop, not the {scope!r} scoped loop. "
+                "Try marking it with @pytest.mark.asyncio(loop_scope='session')"
+            )
+
+        if (server_pool := lsp_server_pools.get(fn)) is None:
+            options = request.config
+            if (size := options.getoption("lsp_pool_size")) is not None:
+                pool_config = attrs.evolve(pool, size=size)
+            else:
+                pool_config = pool
+
+            server_pool = ServerPool(
+                config, pool_config, devtools=options.getoption("devtools")
+            )
+            server_pool.start()
+            lsp_server_pools[fn] = server_pool
+
+        client = await server_pool.acquire()
+
+        try:
+            kwargs = get_fixture_arguments(fn, client, request)
+            result = fn(**kwargs)
+            if inspect.isasyncgen(result):
+                try:
+                    await anext(result)
+                except StopAsyncIteration:
+                    pass
+        except BaseException:
+            # There is no telling what state the server was left in.
+            server_pool._retire(client)
+            raise
+
+        try:
+            yield client
+
+            if inspect.isasyncgen(result):
+                try:
+                    await anext(result)
+                except StopAsyncIteration:
+                    pass
+        finally:
+            server_pool.release(client)
+
+    return the_fixture
@@ -0,0 +1,253 @@
+"""Keep servers started and initialized in the background, so that tests do not have
+to wait for them."""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import typing
+
+import attrs
+from lsprotocol import types
+
+if typing.TYPE_CHECKING:
+    from typing import Any
+    from typing import Union
+
+    from pytest_lsp.client import LanguageClient
+    from pytest_lsp.plugin import ClientServerConfig
+
+    PoolItem = Union[LanguageClient, Exception]
+
+
+logger = logging.getLogger(__name__)
+
+
+@attrs.define
+class PoolConfig:
+    """Configuration for a pool of servers shared between tests."""
+
+    size: int = attrs.field(default=2)
+    """The number of servers to keep ready in the background."""
+
+    initialize_params: types.InitializeParams = attrs.field(
+        factory=lambda: types.InitializeParams(capabilities=types.ClientCapabilities()),
+    )
+    """The params sent with each server's ``initialize`` request."""
+
+    reset_method: str | None = attrs.field(default=None)
+    """If set, the request to send to reset a server's state once a test is finished
+    with it, so that it can be used by another test.
+
+    If not set, each server is only used by a single test."""
+
+    reset_params: Any = attrs.field(default=None)
+    """The params to send with the reset request."""
+
+    max_uses: int | None = attrs.field(default=None)
+    """The number of tests a server can be used by before it is replaced."""
+
+    timeout: float = attrs.field(default=10.0)
+    """How long (in seconds) to wait for a server to reset or shut down."""
+
+    def __attrs_post_init__(self):
+        if self.size < 1:
+            raise ValueError("A server pool must contain at least one server")
+
+        if self.max_uses is not None and self.max_uses < 1:
+            raise ValueError("Servers must be used at least once")
+
+
+class ServerPool:
+    """A pool of initialized servers, shared between tests.
+
+    Servers are started in the background, as soon as the pool is started. Once a test
+    is finished with a server, it is either reset using the configured request and
+    returned to the pool, or shut down and replaced with a new one.
+    """
+
+    def __init__(
+        self,
+        config: ClientServerConfig,
+        pool: PoolConfig,
+        *,
+        devtools: str | None = None,
+    ):
+        self.config = config
+        """The configuration used to start each server."""
+
+        self.pool = pool
+        """The configuration of the pool itself."""
+
+        self.devtools = devtools
+        """If set, the ``lsp-devtools`` server to connect each server to."""
+
+        self._ready: asyncio.Queue[PoolItem] | None = None
+        """Servers that are ready to be used, or the errors raised starting them."""
+
+        self._clients: set[LanguageClient] = set()
+        """All of the servers currently managed by the pool."""
+
+        self._uses: dict[LanguageClient, int] = {}
+        """The number of tests that have used each server."""
+
+        self._configuration: dict[LanguageClient, dict[str, dict[str, Any]]] = {}
+        """Each client's initial configuration, restored before each test."""
+
+        self._tasks: set[asyncio.Task] = set()
+        """Background tasks starting, resetting or shutting down servers."""
+
+    def start(self):
+        """Start filling the pool with servers."""
+        if self._ready is not None:
+            return
+
+        self._ready = asyncio.Queue()
+        for _ in range(self.pool.size):
+            self._spawn()
+
+    async def acquire(self) -> LanguageClient:
+        """Wait for a server to become available, and return the client connected
+        to it.
+
+        Raises
+        ------
+        RuntimeError
+           If the server could not be started.
+
+        Returns
+        -------
+        LanguageClient
+           A client connected to an initialized server.
+        """
+        self.start()
+        ready = typing.cast("asyncio.Queue[PoolItem]", self._ready)
+
+        while True:
+            item = await ready.get()
+            if isinstance(item, Exception):
+                # Try again for the next test.
+                self._spawn()
+                message = f"Unable to start server: {item!r}"
+                raise RuntimeError(message) from item  # noqa: TRY004
+
+            if (server := item._server) is not None and server.returncode is None:
+                break
+
+            logger.debug("Replacing server that exited while in the pool")
+            self._retire(item)
+
+        self._forget_history(item)
+        return item
+
+    def release(self, client: LanguageClient):
+        """Return a server to the pool, once a test has finished with it."""
+        self._uses[client] = uses = self._uses.get(client, 0) + 1
+
+        reusable = (
+            self.pool.reset_method is not None
+            and client.error is None
+            and (server := client._server) is not None
+            and server.returncode is None
+            and (self.pool.max_uses is None or uses < self.pool.max_uses)
+        )
+
+        if reusable:
+            self._create_task(self._reset(client))
+        else:
+            self._retire(client)
+
+    async def stop(self):
+        """Shut down all of the servers in the pool."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        await asyncio.gather(
+            *[self._shutdown(client) for client in list(self._clients)],
+            return_exceptions=True,
+        )
+        self._ready = None
+
+    def _create_task(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _spawn(self):
+        self._create_task(self._start_server())
+
+    def _retire(self, client: LanguageClient):
+        """Shut down the given server and start a replacement."""
+        self._create_task(self._shutdown(client))
+        self._spawn()
+
+    def _put(self, item: PoolItem):
+        if self._ready is not None:
+            self._ready.put_nowait(item)
+
+    async def _start_server(self):
+        try:
+            client = typing.cast(
+                "LanguageClient", await self.config.start(devtools=self.devtools)
+            )
+        except Exception as exc:
+            self._put(exc)
+            return
+
+        self._clients.add(client)
+        self._configuration[client] = copy.deepcopy(client._configuration)
+
+        try:
+            await client.initialize_session(attrs.evolve(self.pool.initialize_params))
+        except Exception as exc:
+            await self._shutdown(client)
+            self._put(exc)
+            return
+
+        self._put(client)
+
+    async def _reset(self, client: LanguageClient):
+        try:
+            await asyncio.wait_for(
+                client.protocol.send_request_async(
+                    self.pool.reset_method, self.pool.reset_params
+                ),
+                self.pool.timeout,
+            )
+        except Exception:
+            logger.debug("Unable to reset server, replacing it", exc_info=True)
+            self._retire(client)
+            return
+
+        self._put(client)
+
+    async def _shutdown(self, client: LanguageClient):
+        try:
+            await asyncio.wait_for(client.shutdown_session(), self.pool.timeout)
+        except Exception:
+            logger.debug("Unable to shut down server cleanly", exc_info=True)
+
+        if (server := client._server) is not None and server.returncode is None:
+            server.kill()
+
+        await client.stop()
+
+        self._clients.discard(client)
+        self._uses.pop(client, None)
+        self._configuration.pop(client, None)
+
+    def _forget_history(self, client: LanguageClient):
+        """Forget anything the client recorded while used by previous tests."""
+        client.shown_documents.clear()
+        client.messages.clear()
+        client.log_messages.clear()
+        client.diagnostics.clear()
+        client.progress_reports.clear()
+        client._configuration = copy.deepcopy(self._configuration[client])
+
+        client._setup_log_index = 0
+        client._last_log_index = 0
+        client.timings.clear()
+        client.protocol._pending_timings.clear()
+        client._last_timing_index = 0
@@ -2,21 +2,106 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 import typing
+import uuid
 from concurrent.futures import Future
 
+import attrs
 from pygls.protocol import LanguageServerProtocol
 
 from .checks import check_params_against_client_capabilities
 from .checks import check_result_against_client_capabilities
 
 if typing.TYPE_CHECKING:
+    from typing import Any
+    from typing import Literal
+
     from .client import LanguageClient
 
 
 logger = logging.getLogger(__name__)
 
 
+@attrs.define
+class MessageTiming:
+    """When a message was exchanged between client and server, and its size."""
+
+    method: str
+    """The message's method."""
+
+    kind: Literal["request", "notification"]
+    """The kind of message."""
+
+    source: Literal["client", "server"]
+    """Who sent the message."""
+
+    sent: float
+    """When the message was sent (or received, for messages sent by the server), as
+    given by :func:`time.perf_counter`."""
+
+    size: int | None = attrs.field(default=None)
+    """The size of the message body in bytes, if known."""
+
+    received: float | None = attrs.field(default=None)
+    """For requests sent by the client, when the response was received (as given by
+    :func:`time.perf_counter`), if it has been."""
+
+    response_size: int | None = attrs.field(default=None)
+    """For requests sent by the client, the size of the response body in bytes, if
+    known."""
+
+    error: bool = attrs.field(default=False)
+    """For requests sent by the client, indicates if the server responded with an
+    error."""
+
+    @property
+    def duration_ms(self) -> float | None:
+        """For requests sent by the client, the time taken to receive a response."""
+        if self.received is None:
+            return None
+
+        return (self.received - self.sent) * 1000
+
+
+class SizeRecorder:
+    """Wraps the protocol's writer, recording the size of each message written."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.last_size: int | None = None
+
+    def write(self, data: bytes):
+        # Only count the message body, not the headers
+        start = data.find(b"\r\n\r\n")
+        self.last_size = len(data) - (start + 4 if start >= 0 else 0)
+        return self.writer.write(data)
+
+    def __getattr__(self, name: str):
+        return getattr(self.writer, name)
+
+
+class SizeReader:
+    """Wraps the reader messages are read from, recording the size of each message
+    body on the given protocol.
+
+    Message bodies are read in a single call to ``readexactly``, immediately before
+    being handled.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, protocol: LanguageClientProtocol):
+        self.reader = reader
+        self.protocol = protocol
+
+    async def readline(self) -> bytes:
+        return await self.reader.readline()
+
+    async def readexactly(self, n: int) -> bytes:
+        data = await self.reader.readexactly(n)
+        self.protocol._received_size = len(data)
+        return data
+
+
 class LanguageClientProtocol(LanguageServerProtocol):
     """An extended protocol class adding functionality useful for testing."""
 
@@ -27,13 +112,45 @@ class LanguageClientProtocol(LanguageServerProtocol):
 
         self._notification_futures = {}
 
+        self.timings: list[MessageTiming] = []
+        """The timeline of messages exchanged with the server."""
+
+        self._pending_timings: dict[Any, MessageTiming] = {}
+        """Timings of requests still waiting for a response, by id."""
+
+        self._received_size: int | None = None
+        """The size of the message currently being handled."""
+
+    def set_writer(self, writer, *args, **kwargs):
+        super().set_writer(SizeRecorder(writer), *args, **kwargs)
+
+    def _sent_size(self) -> int | None:
+        if isinstance(self.writer, SizeRecorder):
+            return self.writer.last_size
+
+        return None
+
+    def _record_received(self, kind, method_name):
+        self.timings.append(
+            MessageTiming(
+                method_name,
+                kind,
+                "server",
+                time.perf_counter(),
+                size=self._received_size,
+            )
+        )
+
     def _handle_request(self, msg_id, method_name, params):
         """Wrap pygls' handle_request implementation. This will
 
         - Check if the request from the server is compatible with the client's stated
           capabilities.
 
+        - Record when the request was received.
+
         """
+        self._record_received("request", method_name)
         check_params_against_client_capabilities(
             self._server.capabilities, method_name, params
         )
@@ -47,13 +164,61 @@ class LanguageClientProtocol(LanguageServerProtocol):
         - Check the params to see if they are compatible with the client's stated
           capabilities.
 
+        - Record when the notification was received.
+
         """
+        self._record_received("notification", method_name)
+
         future = self._notification_futures.pop(method_name, None)
         if future:
             future.set_result(params)
 
         super()._handle_notification(method_name, params)
 
+    def _handle_response(self, msg_id, result=None, error=None):
+        """Wrap pygls' handle_response implementation. This will
+
+        - Record when the response was received.
+
+        """
+        if (timing := self._pending_timings.pop(msg_id, None)) is not None:
+            timing.received = time.perf_counter()
+            timing.response_size = self._received_size
+            timing.error = error is not None
+
+        super()._handle_response(msg_id, result, error)
+
+    def notify(self, method: str, params: Any | None = None):
+        """Wrap pygls' ``notify`` implementation. This will
+
+        - Record when the notification was sent.
+
+        """
+        sent = time.perf_counter()
+        super().notify(method, params)
+
+        timing = MessageTiming(method, "notification", "client", sent)
+        timing.size = self._sent_size()
+        self.timings.append(timing)
+
+    def send_request(self, method, params=None, callback=None, msg_id=None):
+        """Wrap pygls' ``send_request`` implementation. This will
+
+        - Record when the request was sent.
+
+        """
+        if msg_id is None:
+            msg_id = str(uuid.uuid4())
+
+        timing = MessageTiming(method, "request", "client", time.perf_counter())
+        self._pending_timings[msg_id] = timing
+        self.timings.append(timing)
+
+        future = super().send_request(method, params, callback, msg_id)
+        timing.size = self._sent_size()
+
+        return future
+
     async def send_request_async(self, method, params=None):
         """Wrap pygls' ``send_request_async`` implementation. This will
 
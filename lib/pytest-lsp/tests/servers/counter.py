@@ -0,0 +1,32 @@
+# A server that counts the documents opened in it, until it is reset.
+import os
+
+from lsprotocol import types
+from pygls.lsp.server import LanguageServer
+
+server = LanguageServer(name="counter-server", version="v1.0")
+server.opened = 0  # type: ignore[attr-defined]
+
+
+@server.feature(types.TEXT_DOCUMENT_DID_OPEN)
+def did_open(ls: LanguageServer, params: types.DidOpenTextDocumentParams):
+    ls.opened += 1  # type: ignore[attr-defined]
+    ls.window_log_message(
+        types.LogMessageParams(
+            type=types.MessageType.Info, message=f"Opened {params.text_document.uri}"
+        )
+    )
+
+
+@server.feature(types.TEXT_DOCUMENT_HOVER)
+def on_hover(ls: LanguageServer, params: types.HoverParams):
+    return types.Hover(contents=f"{os.getpid()}:{ls.opened}")  # type: ignore
+
+
+@server.feature("counter/reset")
+def reset(ls: LanguageServer, params):
+    ls.opened = 0  # type: ignore[attr-defined]
+
+
+if __name__ == "__main__":
+    server.start_io()
@@ -0,0 +1,20 @@
+# A server that responds to hover requests, after a short delay.
+import time
+
+from lsprotocol import types
+from pygls.lsp.server import LanguageServer
+
+server = LanguageServer(name="hover-server", version="v1.0")
+
+
+@server.feature(types.TEXT_DOCUMENT_HOVER)
+def on_hover(ls: LanguageServer, params: types.HoverParams):
+    if params.text_document.uri.endswith("error.txt"):
+        raise ValueError("Unable to hover")
+
+    time.sleep(0.01)
+    return types.Hover(contents=f"Line {params.position.line}")
+
+
+if __name__ == "__main__":
+    server.start_io()
@@ -0,0 +1,70 @@
+import pathlib
+
+import pytest
+
+from pytest_lsp.benchmark import Benchmark
+from pytest_lsp.benchmark import BenchmarkResult
+from pytest_lsp.benchmark import load_baseline
+from pytest_lsp.benchmark import save_results
+
+
+class Client:
+    """A stand-in for a client, with no server process."""
+
+    _server = None
+
+
+async def test_benchmark_iterations():
+    """Ensure that the function is called the expected number of times."""
+    calls = []
+
+    async def fn(value):
+        calls.append(value)
+
+    results = {}
+    benchmark = Benchmark("test", warmup=2, iterations=3, results=results)
+
+    result = await benchmark(Client(), fn, 1)
+    assert calls == [1] * 5
+    assert len(result.times_ms) == 3
+    assert result.cpu_ms is None
+
+    await benchmark(Client(), fn, 2, name="second")
+    assert list(results) == ["test", "test::second"]
+
+
+async def test_benchmark_regression():
+    """Ensure that benchmarks fail when they regress beyond the threshold."""
+
+    async def fn():
+        pass
+
+    baseline = {"test": {"median_ms": 1e-9}, "other": {"median_ms": 1e-9}}
+    benchmark = Benchmark("test", warmup=0, iterations=1, baseline=baseline)
+
+    with pytest.raises(pytest.fail.Exception, match="'test' regressed"):
+        await benchmark(Client(), fn)
+
+    # Benchmarks not in the baseline are not checked
+    await benchmark(Client(), fn, name="new")
+
+    benchmark.threshold = float("inf")
+    await benchmark(Client(), fn)
+
+
+def test_save_results(tmp_path: pathlib.Path):
+    """Ensure that saved results can be used as a baseline."""
+    path = tmp_path / "baseline.json"
+    save_results(path, {"a": BenchmarkResult("a", [3.0, 1.0, 2.0], cpu_ms=0.5)})
+
+    baseline = load_baseline(path)
+    assert baseline["a"]["median_ms"] == 2.0
+    assert baseline["a"]["min_ms"] == 1.0
+    assert baseline["a"]["stdev_ms"] == 1.0
+    assert baseline["a"]["cpu_ms"] == 0.5
+
+
+def test_benchmark_invalid():
+    """Ensure that benchmarks must run at least once."""
+    with pytest.raises(ValueError, match="at least one iteration"):
+        Benchmark("test", iterations=0)
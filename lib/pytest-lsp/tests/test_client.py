@@ -8,6 +8,8 @@ from typing import Optional
 
 import pygls.uris as uri
 import pytest
+from lsprotocol import types
+from pygls.exceptions import JsonRpcException
 
 import pytest_lsp
 from pytest_lsp import LanguageClient
@@ -253,3 +255,42 @@ def test_set_configuration_equivalent_methods():
         },
     }
     assert client_one._configuration == expected == client_two._configuration
+
+
+async def test_timings():
+    """Ensure that the client records the messages it exchanges with the server."""
+    server = pathlib.Path(__file__).parent / "servers" / "hover.py"
+    config = pytest_lsp.ClientServerConfig(server_command=[sys.executable, str(server)])
+
+    client = await config.start()
+    await client.initialize_session(
+        types.InitializeParams(capabilities=types.ClientCapabilities())
+    )
+
+    for name in ["a.txt", "error.txt"]:
+        params = types.HoverParams(
+            text_document=types.TextDocumentIdentifier(uri=f"file:///{name}"),
+            position=types.Position(line=1, character=0),
+        )
+        try:
+            await client.text_document_hover_async(params)
+        except JsonRpcException:
+            pass
+
+    await client.shutdown_session()
+    await client.stop()
+
+    sent = [(t.method, t.kind, t.error) for t in client.timings if t.source == "client"]
+    assert sent == [
+        ("initialize", "request", False),
+        ("initialized", "notification", False),
+        ("textDocument/hover", "request", False),
+        ("textDocument/hover", "request", True),
+        ("shutdown", "request", False),
+        ("exit", "notification", False),
+    ]
+
+    hover = client.timings[2]
+    assert hover.duration_ms >= 10
+    assert hover.size > len('"textDocument/hover"')
+    assert hover.response_size > len('"Line 1"')
@@ -0,0 +1,138 @@
+import pathlib
+import sys
+
+import pytest
+from lsprotocol import types
+
+from pytest_lsp import ClientServerConfig
+from pytest_lsp import LanguageClient
+from pytest_lsp import LoadTest
+from pytest_lsp.load import LoadReport
+from pytest_lsp.load import RequestTiming
+from pytest_lsp.load import ResourceSample
+from pytest_lsp.load import WorkerResult
+from pytest_lsp.load import process_usage
+
+SERVER = pathlib.Path(__file__).parent / "servers" / "hover.py"
+
+
+async def hover(client: LanguageClient):
+    """A workload that sends a few hover requests, one of which fails."""
+    for name in ["a.txt", "b.txt", "error.txt"]:
+        params = types.HoverParams(
+            text_document=types.TextDocumentIdentifier(uri=f"file:///{name}"),
+            position=types.Position(line=1, character=0),
+        )
+
+        try:
+            await client.text_document_hover_async(params)
+        except Exception:
+            if name != "error.txt":
+                raise
+
+
+def test_load_test():
+    """Ensure that a workload can be run across multiple sessions and processes."""
+
+    load = LoadTest(
+        config=ClientServerConfig(server_command=[sys.executable, str(SERVER)]),
+        workload=hover,
+        clients=3,
+        processes=2,
+        iterations=2,
+        sample_interval=0.05,
+    )
+    report = load.run()
+
+    assert report.failures == []
+    assert report.iterations == 6
+    assert report.throughput > 0
+
+    summary = report.to_dict()
+    methods = {m["method"]: m for m in summary["methods"]}
+    assert set(methods) == {"initialize", "shutdown", "textDocument/hover"}
+
+    hovers = methods["textDocument/hover"]
+    assert (hovers["requests"], hovers["errors"]) == (18, 6)
+    assert hovers["p50_ms"] >= 10
+
+    timeline = summary["timeline"]
+    assert sum(row["requests"] for row in timeline) == len(report.requests)
+    assert "textDocument/hover" in report.format()
+
+
+def test_load_test_failures():
+    """Ensure that sessions that cannot be started are reported."""
+
+    load = LoadTest(
+        config=ClientServerConfig(server_command=["not-a-real-server"]),
+        workload=hover,
+        clients=2,
+    )
+    report = load.run()
+
+    assert len(report.failures) == 2
+    assert report.iterations == 0
+    assert "2 failure(s)" in report.format()
+
+
+def test_load_test_limits():
+    """Ensure that the load test must be bounded."""
+    config = ClientServerConfig(server_command=["server"])
+
+    with pytest.raises(ValueError, match="'iterations' or 'duration'"):
+        LoadTest(config=config, workload=hover, iterations=None)
+
+    with pytest.raises(ValueError, match="at least 1"):
+        LoadTest(config=config, workload=hover, clients=0)
+
+
+def test_load_report_timeline():
+    """Ensure that results are aggregated over time."""
+
+    start = 1000.0
+    results = [
+        WorkerResult(
+            requests=[
+                RequestTiming("a", 0, start + 0.5, 10.0),
+                RequestTiming("a", 0, start + 1.5, 30.0, error=True),
+            ],
+            samples=[
+                ResourceSample(0, start + 0.1, 100, 1.0),
+                ResourceSample(0, start + 1.1, 200, 1.5),
+            ],
+            iterations=1,
+        ),
+        WorkerResult(
+            requests=[RequestTiming("b", 1, start + 1.2, 20.0)],
+            samples=[
+                ResourceSample(1, start + 0.2, 50, 0.0),
+                ResourceSample(1, start + 1.2, 50, 0.25),
+            ],
+            iterations=1,
+        ),
+    ]
+    report = LoadReport(results, start=start, end=start + 2.0, clients=2)
+
+    assert report.throughput == 1.5
+    assert [(r["requests"], r["errors"], r["p99_ms"]) for r in report.timeline()] == [
+        (1, 0, 10.0),
+        (2, 1, 30.0),
+    ]
+
+    timeline = report.timeline()
+    assert [r["rss"] for r in timeline] == [150, 250]
+    assert timeline[0]["cpu_percent"] is None
+    assert timeline[1]["cpu_percent"] == pytest.approx(75)
+
+
+def test_process_usage():
+    """Ensure that the resources used by a process can be determined."""
+    import os
+
+    if (usage := process_usage(os.getpid())) is None:
+        pytest.skip("Resource usage not available on this platform")
+
+    rss, cpu = usage
+    assert rss > 0
+    assert cpu > 0
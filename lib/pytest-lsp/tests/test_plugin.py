@@ -1,3 +1,4 @@
+import json
 import pathlib
 import sys
 from typing import Any
@@ -223,3 +224,272 @@ async def test_capabilities(client):
         message = "E*asyncio.exceptions.CancelledError: JsonRpcInternalError: *"
 
     results.stdout.fnmatch_lines(message)
+
+
+BENCHMARK_TEST = """\
+import pytest
+from lsprotocol.types import HoverParams
+from lsprotocol.types import Position
+from lsprotocol.types import TextDocumentIdentifier
+
+
+@pytest.mark.lsp_benchmark(iterations=5)
+async def test_hover(client, lsp_benchmark):
+    params = HoverParams(
+        text_document=TextDocumentIdentifier(uri="file:///test.txt"),
+        position=Position(line=0, character=0),
+    )
+    result = await lsp_benchmark(client, client.text_document_hover_async, params)
+
+    assert len(result.times_ms) == 5
+    assert min(result.times_ms) >= 10
+"""
+
+
+def test_benchmark_save(pytester: pytest.Pytester):
+    """Ensure that requests can be benchmarked, and the results saved."""
+
+    setup_test(pytester, "hover.py", BENCHMARK_TEST)
+    results = pytester.runpytest("--lsp-benchmark-save", "baseline.json")
+
+    results.assert_outcomes(passed=1)
+    results.stdout.fnmatch_lines(
+        ["*lsp benchmarks*", "*ms*test_benchmark_save.py::test_hover"]
+    )
+
+    baseline = json.loads((pytester.path / "baseline.json").read_text())
+    hover = baseline["benchmarks"]["test_benchmark_save.py::test_hover"]
+    assert hover["iterations"] == 5
+    assert hover["median_ms"] >= 10
+
+
+@pytest.mark.parametrize("median, outcome", [(1000.0, "passed"), (1.0, "failed")])
+def test_benchmark_compare(pytester: pytest.Pytester, median: float, outcome: str):
+    """Ensure that benchmarks fail if they regress compared with the baseline."""
+
+    setup_test(pytester, "hover.py", BENCHMARK_TEST)
+    name = "test_benchmark_compare.py::test_hover"
+    baseline = {"benchmarks": {name: {"median_ms": median}}}
+    (pytester.path / "baseline.json").write_text(json.dumps(baseline))
+
+    results = pytester.runpytest("--lsp-benchmark-compare", "baseline.json")
+    results.assert_outcomes(**{outcome: 1})
+
+    if outcome == "failed":
+        results.stdout.fnmatch_lines(f"*Benchmark '{name}' regressed*")
+
+
+def test_timings(pytester: pytest.Pytester):
+    """Ensure that the slowest requests are reported for each failed test, and
+    summarised for the session when requested."""
+
+    test_code = """\
+import pytest
+from lsprotocol.types import HoverParams
+from lsprotocol.types import Position
+from lsprotocol.types import TextDocumentIdentifier
+
+
+@pytest.mark.parametrize("passes", [True, False])
+async def test_hover(client, passes):
+    params = HoverParams(
+        text_document=TextDocumentIdentifier(uri="file:///test.txt"),
+        position=Position(line=0, character=0),
+    )
+    await client.text_document_hover_async(params)
+    assert passes
+"""
+
+    setup_test(pytester, "hover.py", test_code)
+    results = pytester.runpytest("--lsp-timings", "-rA")
+
+    results.assert_outcomes(passed=1, failed=1)
+    results.stdout.fnmatch_lines(
+        [
+            "*Captured lsp timings call*",
+            "*ms  textDocument/hover (*B -> *B)",
+            "*lsp timings*",
+            "*Count*Method",
+            "*2*0*ms*ms*ms*B*B  initialize",
+            "*2*0*ms*ms*ms*B*B  textDocument/hover",
+        ]
+    )
+
+    # Passing tests should not include the timings in their report
+    assert results.stdout.str().count("Captured lsp timings call") == 1
+
+
+def setup_pool_test(pytester: pytest.Pytester, test_code: str):
+    """Boilerplate for setting up a test using a server pool."""
+
+    python = sys.executable
+    server = pathlib.Path(__file__).parent / "servers" / "counter.py"
+
+    pytester.makeini(
+        """\
+[pytest]
+asyncio_mode = auto
+asyncio_default_fixture_loop_scope = function
+"""
+    )
+
+    pytester.makeconftest(
+        f"""
+import pytest_lsp
+from pytest_lsp import ClientServerConfig
+from pytest_lsp import LanguageClient
+from pytest_lsp import PoolConfig
+
+
+@pytest_lsp.fixture(
+    config=ClientServerConfig(server_command=[r"{python}", r"{server}"]),
+    pool=PoolConfig(size=2, reset_method="counter/reset"),
+)
+async def client(lsp_client: LanguageClient):
+    yield
+"""
+    )
+
+    pytester.makepyfile(test_code)
+
+
+def test_server_pool(pytester: pytest.Pytester):
+    """Ensure that tests can share servers taken from a pool."""
+
+    test_code = """\
+import pytest
+from lsprotocol import types
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+PIDS = set()
+
+
+@pytest.mark.parametrize("n", range(4))
+async def test_open(client, n):
+    assert client.capabilities is not None
+
+    client.text_document_did_open(
+        types.DidOpenTextDocumentParams(
+            text_document=types.TextDocumentItem(
+                uri="file:///a.txt", language_id="plaintext", version=1, text=""
+            )
+        )
+    )
+    result = await client.text_document_hover_async(
+        types.HoverParams(
+            text_document=types.TextDocumentIdentifier(uri="file:///a.txt"),
+            position=types.Position(line=0, character=0),
+        )
+    )
+
+    pid, opened = result.contents.split(":")
+    assert opened == "1"
+
+    PIDS.add(pid)
+
+
+def test_pids():
+    assert 1 <= len(PIDS) <= 2
+"""
+
+    setup_pool_test(pytester, test_code)
+    results = pytester.runpytest()
+
+    results.assert_outcomes(passed=5)
+
+
+def test_server_pool_size(pytester: pytest.Pytester):
+    """Ensure that the size of each pool can be overridden from the command line."""
+
+    test_code = """\
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def test_size(client, lsp_server_pools):
+    (pool,) = lsp_server_pools.values()
+    assert pool.pool.size == 1
+"""
+
+    setup_pool_test(pytester, test_code)
+    results = pytester.runpytest("--lsp-pool-size", "1")
+
+    results.assert_outcomes(passed=1)
+
+
+def test_server_pool_setup_error(pytester: pytest.Pytester):
+    """Ensure that servers are replaced, if the fixture fails during setup."""
+
+    python = sys.executable
+    server = pathlib.Path(__file__).parent / "servers" / "counter.py"
+
+    pytester.makeini(
+        """\
+[pytest]
+asyncio_mode = auto
+asyncio_default_fixture_loop_scope = function
+"""
+    )
+
+    pytester.makeconftest(
+        f"""
+import pytest_lsp
+from pytest_lsp import ClientServerConfig
+from pytest_lsp import LanguageClient
+from pytest_lsp import PoolConfig
+
+PIDS = []
+
+
+@pytest_lsp.fixture(
+    config=ClientServerConfig(server_command=[r"{python}", r"{server}"]),
+    pool=PoolConfig(size=1, reset_method="counter/reset"),
+)
+async def client(request, lsp_client: LanguageClient):
+    PIDS.append(lsp_client._server.pid)
+    if request.node.name == "test_error":
+        raise RuntimeError("Setup failed")
+
+    yield
+"""
+    )
+
+    test_code = """\
+import pytest
+from conftest import PIDS
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def test_error(client):
+    pass
+
+
+async def test_replaced(client):
+    first, second = PIDS
+    assert first != second
+"""
+
+    pytester.makepyfile(test_code)
+    results = pytester.runpytest()
+
+    results.assert_outcomes(passed=1, errors=1)
+    results.stdout.fnmatch_lines(["*RuntimeError: Setup failed*"])
+
+
+def test_server_pool_loop_scope(pytester: pytest.Pytester):
+    """Ensure that tests using a server pool must run in the session's event loop."""
+
+    test_code = """\
+async def test_open(client):
+    pass
+"""
+
+    setup_pool_test(pytester, test_code)
+    results = pytester.runpytest()
+
+    results.assert_outcomes(errors=1)
+    results.stdout.fnmatch_lines(
+        ["*must run in the 'session' scoped event loop, not the 'function'*"]
+    )
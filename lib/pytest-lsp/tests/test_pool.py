@@ -0,0 +1,141 @@
+import pathlib
+import sys
+
+import pytest
+from lsprotocol import types
+
+from pytest_lsp import ClientServerConfig
+from pytest_lsp import LanguageClient
+from pytest_lsp import PoolConfig
+from pytest_lsp import ServerPool
+
+SERVER = pathlib.Path(__file__).parent / "servers" / "counter.py"
+CONFIG = ClientServerConfig(server_command=[sys.executable, str(SERVER)])
+
+
+async def open_document(client: LanguageClient) -> str:
+    """Open a document, returning the server's pid and number of open documents."""
+    client.text_document_did_open(
+        types.DidOpenTextDocumentParams(
+            text_document=types.TextDocumentItem(
+                uri="file:///a.txt", language_id="plaintext", version=1, text=""
+            )
+        )
+    )
+
+    await client.wait_for_notification(types.WINDOW_LOG_MESSAGE)
+
+    result = await client.text_document_hover_async(
+        types.HoverParams(
+            text_document=types.TextDocumentIdentifier(uri="file:///a.txt"),
+            position=types.Position(line=0, character=0),
+        )
+    )
+    assert result is not None
+    return str(result.contents)
+
+
+async def test_pool_reset():
+    """Ensure that servers are reset and reused, if a reset request is given."""
+
+    pool = ServerPool(CONFIG, PoolConfig(size=1, reset_method="counter/reset"))
+
+    try:
+        client = await pool.acquire()
+        assert client.capabilities is not None
+
+        pid, opened = (await open_document(client)).split(":")
+        assert opened == "1"
+        assert len(client.log_messages) == 1
+
+        client.set_configuration({"a": 1}, section="example")
+        pool.release(client)
+
+        client = await pool.acquire()
+        assert client.timings == []
+
+        assert await open_document(client) == f"{pid}:1"
+        assert len(client.log_messages) == 1
+        assert client.get_configuration(section="example") is None
+
+        pool.release(client)
+    finally:
+        await pool.stop()
+
+    assert client._server is not None
+    assert client._server.returncode is not None
+
+
+@pytest.mark.parametrize(
+    "pool_config",
+    [
+        PoolConfig(size=1),
+        PoolConfig(size=1, reset_method="counter/reset", max_uses=1),
+        PoolConfig(size=1, reset_method="not/a/method"),
+    ],
+)
+async def test_pool_replace(pool_config: PoolConfig):
+    """Ensure that servers are replaced when they cannot be reused."""
+
+    pool = ServerPool(CONFIG, pool_config)
+
+    try:
+        client = await pool.acquire()
+        first = await open_document(client)
+        pool.release(client)
+
+        client = await pool.acquire()
+        second = await open_document(client)
+        pool.release(client)
+    finally:
+        await pool.stop()
+
+    assert first != second
+    assert second.endswith(":1")
+
+
+async def test_pool_replace_exited():
+    """Ensure that servers which exit while in the pool are replaced."""
+
+    pool = ServerPool(CONFIG, PoolConfig(size=1, reset_method="counter/reset"))
+
+    try:
+        client = await pool.acquire()
+        pool.release(client)
+
+        assert client._server is not None
+        client._server.kill()
+        await client._server.wait()
+
+        replacement = await pool.acquire()
+        assert replacement is not client
+        await open_document(replacement)
+        pool.release(replacement)
+    finally:
+        await pool.stop()
+
+
+async def test_pool_start_error():
+    """Ensure that errors starting a server are reported to the test."""
+
+    config = ClientServerConfig(server_command=["not-a-real-server"])
+    pool = ServerPool(config, PoolConfig(size=1))
+
+    try:
+        with pytest.raises(RuntimeError, match="Unable to start server"):
+            await pool.acquire()
+
+        with pytest.raises(RuntimeError, match="Unable to start server"):
+            await pool.acquire()
+    finally:
+        await pool.stop()
+
+
+def test_pool_config():
+    """Ensure that the pool's configuration is validated."""
+
+    with pytest.raises(ValueError, match="at least one server"):
+        PoolConfig(size=0)
+
+    with pytest.raises(ValueError, match="at least once"):
+        PoolConfig(max_uses=0)
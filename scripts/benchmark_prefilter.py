@@ -0,0 +1,159 @@
+"""Measure the cost of ``lsp-devtools record``'s prefilter.
+
+Compares logging a sample of messages when every message is decoded, against using
+the prefilter to skip decoding any messages the record filters would exclude.
+
+Usage::
+
+   python scripts/benchmark_prefilter.py [--json-backend NAME] [--number N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import random
+import timeit
+
+from lsp_devtools import codec
+from lsp_devtools.record import log_message
+from lsp_devtools.record.filters import LSPFilter
+
+
+class NullHandler(logging.Handler):
+    """Apply the handler's filters, but discard everything that passes them."""
+
+    def emit(self, record):
+        pass
+
+
+def frame(source: str, message: dict) -> bytes:
+    # Serialize fields in the same order as pygls does.
+    body = json.dumps(message).encode("utf8")
+    headers = f"Message-Source: {source}\r\nContent-Length: {len(body)}\r\n\r\n"
+    return headers.encode("utf8") + body
+
+
+def make_messages() -> list[bytes]:
+    rng = random.Random(0)  # noqa: S311
+    position = {"line": 10, "character": 4}
+    document = {"uri": "file:///path/to/file.py"}
+
+    items = [
+        {
+            "label": f"item_{i}",
+            "kind": 6,
+            "detail": f"def item_{i}(a: int, b: str) -> list[dict[str, int]]",
+            "documentation": {"kind": "markdown", "value": "Some *docs* [link]()"},
+            "sortText": f"{i:06}",
+            "textEdit": {
+                "range": {"start": position, "end": position},
+                "newText": f"item_{i}",
+            },
+        }
+        for i in range(8_000)
+    ]
+    tokens = [rng.randrange(100) for _ in range(250_000)]
+    diagnostics = [
+        {
+            "range": {"start": position, "end": position},
+            "message": f"Unused variable 'x{i}'",
+            "severity": 2,
+            "source": "linter",
+        }
+        for i in range(200)
+    ]
+
+    return [
+        frame(
+            "client",
+            {
+                "id": 1,
+                "params": {"textDocument": document, "position": position},
+                "method": "textDocument/completion",
+                "jsonrpc": "2.0",
+            },
+        ),
+        frame(
+            "server",
+            {
+                "id": 1,
+                "result": {"isIncomplete": False, "items": items},
+                "jsonrpc": "2.0",
+            },
+        ),
+        frame(
+            "client",
+            {
+                "id": 2,
+                "params": {"textDocument": document},
+                "method": "textDocument/semanticTokens/full",
+                "jsonrpc": "2.0",
+            },
+        ),
+        frame("server", {"id": 2, "result": {"data": tokens}, "jsonrpc": "2.0"}),
+        frame(
+            "server",
+            {
+                "params": {"uri": document["uri"], "diagnostics": diagnostics},
+                "method": "textDocument/publishDiagnostics",
+                "jsonrpc": "2.0",
+            },
+        ),
+    ]
+
+
+def run(messages: list[bytes], options: dict, use_prefilter: bool) -> None:
+    logger = logging.getLogger("benchmark")
+    logger.handlers.clear()
+    logger.propagate = False
+
+    lsp_filter = LSPFilter(**options)
+    handler = NullHandler()
+    handler.addFilter(lsp_filter)
+    logger.addHandler(handler)
+
+    prefilter = lsp_filter if use_prefilter else None
+    for message in messages:
+        log_message(logger, message, prefilter=prefilter)
+
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument(
+        "--json-backend", default="auto", choices=["auto", *codec.BACKENDS]
+    )
+    cli.add_argument("--number", type=int, default=20)
+    args = cli.parse_args()
+
+    codec.set_backend(args.json_backend)
+    messages = make_messages()
+    total = sum(len(m) for m in messages)
+    print(f"{codec.get_backend().name}: {len(messages)} messages, {total:,} bytes")
+
+    scenarios = {
+        "nothing excluded": {},
+        "exclude completion": {"exclude_methods": ["textDocument/completion"]},
+        "exclude responses": {"exclude_message_types": ["result", "error"]},
+        "only diagnostics": {"include_methods": ["textDocument/publishDiagnostics"]},
+    }
+
+    for name, options in scenarios.items():
+        timings = []
+        for use_prefilter in [False, True]:
+            seconds = timeit.timeit(
+                lambda: run(messages, options, use_prefilter),  # noqa: B023
+                number=args.number,
+            )
+            timings.append(seconds / args.number * 1000)
+
+        decode, prefilter = timings
+        print(
+            f"  {name:<20} decode all: {decode:8.2f}ms"
+            f"  prefilter: {prefilter:8.2f}ms  ({decode / prefilter:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()